@@ -59,8 +59,9 @@ export class LocationDetectionStack extends cdk.Stack {
     // Lambda function
     const roomDetectionFunction = new lambda.DockerImageFunction(this, 'RoomDetectionFunction', {
       functionName: 'location-detection-opencv',
-      code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, '../../lambda'), {
-        file: 'Dockerfile',
+      // Built from backend/ so the image can include the modules in backend/shared
+      code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, '../..'), {
+        file: 'lambda/Dockerfile',
       }),
       memorySize: 3008, // Maximum memory for faster processing
       timeout: cdk.Duration.seconds(30),
@@ -79,7 +80,10 @@ export class LocationDetectionStack extends cdk.Stack {
     const api = new apigateway.RestApi(this, 'LocationDetectionApi', {
       restApiName: 'Location Detection API',
       description: 'API for detecting room boundaries in blueprints',
-      binaryMediaTypes: ['multipart/form-data', 'image/*'], // Treat these as binary
+      binaryMediaTypes: [
+        'multipart/form-data', 'image/*', 'application/pdf', 'application/zip',
+        'application/vnd.room-detection.rooms', // Compact room results (backend/lambda/room_encoding.py)
+      ], // Treat these as binary
       deployOptions: {
         stageName: 'prod',
         loggingLevel: apigateway.MethodLoggingLevel.INFO,
@@ -111,6 +115,12 @@ export class LocationDetectionStack extends cdk.Stack {
       apiKeyRequired: false, // Add API key in production
     });
 
+    // /detect/batch endpoint (many images or a ZIP in one call; same function)
+    const detectBatchResource = detectResource.addResource('batch');
+    detectBatchResource.addMethod('POST', detectIntegration, {
+      apiKeyRequired: false, // Add API key in production
+    });
+
     // Pre-signed URL endpoint for S3 uploads
     const uploadFunction = new lambda.Function(this, 'UploadUrlFunction', {
       functionName: 'location-detection-upload-url',
@@ -71,9 +71,11 @@ export class YoloEcsStack extends cdk.Stack {
 
     // ===== Container Definition =====
     const container = taskDefinition.addContainer('YoloContainer', {
+      // Built from backend/ so the image can include the modules in backend/shared
       image: ecs.ContainerImage.fromAsset(
-        path.join(__dirname, '../../yolo-service'),
+        path.join(__dirname, '../..'),
         {
+          file: 'yolo-service/Dockerfile',
           platform: cdk.aws_ecr_assets.Platform.LINUX_AMD64,
         }
       ),
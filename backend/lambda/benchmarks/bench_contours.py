@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark: room contour extraction strategies
+
+find_room_contours traces every contour with RETR_TREE and keeps the
+room-sized ones. This compares ways of skipping work on contours that can
+never be rooms:
+
+- tree: find_room_contours, every contour's area measured one by one
+- walk: the same trace, walking the hierarchy and skipping the children of
+  any contour already below the minimum room area
+- components: connectedComponentsWithStats on the inverted edges, the area
+  filter applied to the stats table in bulk, and only the surviving regions
+  traced (RETR_CCOMP outer borders of a mask of kept labels)
+
+Each strategy runs detect_rooms_in_image over dataset images, enlarged
+copies (high-DPI scans) and a synthetic text-heavy plan. Reports the time
+spent in the contours stage (fastest of --repeat runs), contours found and kept, and on the dataset
+images P/R at IoU 0.5 and AP50 against the labels.
+
+Usage:
+    python benchmarks/bench_contours.py --limit 100 --upscale 4
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import room_detector  # noqa: E402
+from room_detector import (  # noqa: E402
+    DetectionStats, detect_rooms_in_image, extract_contour_features, load_grayscale, room_area_limits,
+)
+from bench_dataset import DATASET_DIR, score  # noqa: E402
+
+Extractor = Callable[..., Tuple[List[np.ndarray], np.ndarray]]
+
+
+def approximate(contours: List[np.ndarray]) -> List[np.ndarray]:
+    """Reduce room contours to polygons the way find_room_contours does"""
+    return [cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True) for contour in contours]
+
+
+def walk_room_contours(
+    edges: np.ndarray,
+    original_shape: Tuple[int, int],
+    area_limits: Optional[Tuple[float, float]] = None,
+    stats: Optional[DetectionStats] = None
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """RETR_TREE trace, pruning subtrees under the minimum area (children never exceed their parent)"""
+    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    min_area, max_area = area_limits or room_area_limits(original_shape)
+    kept = []
+    if hierarchy is not None:
+        next_sibling, first_child = hierarchy[0][:, 0].tolist(), hierarchy[0][:, 2].tolist()
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            while index != -1:
+                area = cv2.contourArea(contours[index])
+                if area > min_area:
+                    if area < max_area:
+                        kept.append(index)
+                    if first_child[index] != -1:
+                        pending.append(first_child[index])
+                index = next_sibling[index]
+    rooms = approximate([contours[index] for index in sorted(kept)])
+    if stats is not None:
+        stats.count('contours_found', len(contours))
+        stats.count('contours_kept', len(rooms))
+    return rooms, extract_contour_features(rooms)
+
+
+def component_room_contours(
+    edges: np.ndarray,
+    original_shape: Tuple[int, int],
+    area_limits: Optional[Tuple[float, float]] = None,
+    stats: Optional[DetectionStats] = None
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Regions between edges from connected-component stats, area-filtered before any tracing"""
+    count, labels, component_stats, _ = cv2.connectedComponentsWithStats(cv2.bitwise_not(edges), connectivity=4)
+    min_area, max_area = area_limits or room_area_limits(original_shape)
+    areas = component_stats[:, cv2.CC_STAT_AREA]
+    keep = (areas > min_area) & (areas < max_area)
+    keep[0] = False  # Label 0 is the edge pixels themselves
+    rooms = []
+    if keep.any():
+        mask = keep.astype(np.uint8)[labels]
+        contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        rooms = approximate([contour for contour, link in zip(contours, hierarchy[0]) if link[3] == -1])
+    if stats is not None:
+        stats.count('contours_found', count - 1)
+        stats.count('contours_kept', len(rooms))
+    return rooms, extract_contour_features(rooms)
+
+
+STRATEGIES: Dict[str, Extractor] = {
+    'tree': room_detector.find_room_contours,
+    'walk': walk_room_contours,
+    'components': component_room_contours,
+}
+
+
+def text_heavy_plan(side: int, rng: np.random.Generator) -> np.ndarray:
+    """A grid of rooms covered in labels, where glyphs dominate the contour count"""
+    plan = np.full((side, side), 255, dtype=np.uint8)
+    for offset in range(0, side, side // 6):
+        cv2.line(plan, (offset, 0), (offset, side - 1), 0, 8)
+        cv2.line(plan, (0, offset), (side - 1, offset), 0, 8)
+    for _ in range(side * 2):
+        origin = (int(rng.integers(0, side - 100)), int(rng.integers(20, side - 10)))
+        cv2.putText(plan, 'ROOM 12', origin, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 1)
+    return plan
+
+
+def measure(extractor: Extractor, images: List[Tuple[str, np.ndarray]]) -> Tuple[Dict[str, float], Dict]:
+    """Detect rooms in every image with one extractor swapped in; returns (totals, predictions)"""
+    room_detector.find_room_contours = extractor
+    try:
+        stats = DetectionStats()
+        predictions = {}
+        for name, image in images:
+            rooms = detect_rooms_in_image(image, stats=stats)['rooms']
+            predictions[name] = [[*room['bounding_box'], room['confidence']] for room in rooms]
+    finally:
+        room_detector.find_room_contours = STRATEGIES['tree']
+
+    totals = {
+        'ms': stats.timings_ms.get('contours', 0.0) / max(len(images), 1),
+        'found': stats.counters.get('contours_found', 0),
+        'kept': stats.counters.get('contours_kept', 0),
+    }
+    return totals, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark room contour extraction strategies')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=100, help='Max dataset images to process')
+    parser.add_argument('--upscale', type=float, default=4.0, help='Enlargement for the large set')
+    parser.add_argument('--large-limit', type=int, default=20, help='Max images to enlarge')
+    parser.add_argument('--text-side', type=int, default=3000, help='Side of the text-heavy plan')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per strategy, the fastest is reported')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    cv2.setNumThreads(1)
+    rng = np.random.default_rng(0)
+
+    paths = sorted((DATASET_DIR / args.split / 'images').glob('*.jpg'))[:args.limit]
+    dataset = [(path.stem, load_grayscale(path.read_bytes())) for path in paths]
+    sets = {
+        'dataset': dataset,
+        'large': [
+            (name, cv2.resize(gray, None, fx=args.upscale, fy=args.upscale, interpolation=cv2.INTER_CUBIC))
+            for name, gray in dataset[:args.large_limit]
+        ],
+        'text': [('text', text_heavy_plan(args.text_side, rng))],
+    }
+
+    print(f"{len(dataset)} images from '{args.split}', contours stage in ms per image")
+    print(f"{'set':<8} {'strategy':<11} {'ms':>8} {'found':>8} {'kept':>6} {'P':>7} {'R':>7} {'AP50':>7}")
+    for set_name, images in sets.items():
+        for strategy, extractor in STRATEGIES.items():
+            measure(extractor, images[:1])  # Warm up
+            start = time.perf_counter()
+            runs = [measure(extractor, images) for _ in range(args.repeat)]
+            totals, predictions = min(runs, key=lambda run: run[0]['ms'])
+            accuracy = ''
+            if set_name == 'dataset':
+                metrics = score(predictions, args.split)
+                accuracy = f" {metrics['precision']:>7.3f} {metrics['recall']:>7.3f} {metrics['ap50']:>7.3f}"
+            print(f"{set_name:<8} {strategy:<11} {totals['ms']:>8.2f} {totals['found']:>8} {totals['kept']:>6}"
+                  f"{accuracy}    (wall {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
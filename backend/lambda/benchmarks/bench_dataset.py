@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Benchmark and accuracy suite over the bundled Roboflow OBB dataset
+
+Runs a detector over dataset splits and reports, per backend and split:
+
+- latency p50 / p99 per image (file bytes in, rooms out, decode included)
+- throughput per core (OpenCV and onnxruntime are pinned to one thread)
+- peak RSS of the benchmark process
+- precision and recall at IoU 0.5, AP50 and mAP50-95 against the labels
+
+Backends:
+
+- opencv: detect_rooms with the Lambda's detection_params()
+  (ROOM_DETECTOR_* environment variables apply)
+- onnx: the YOLO service's local OnnxBackend (needs onnxruntime and --model)
+
+The labels are oriented boxes; they are scored as their axis-aligned
+bounding boxes in the same 0-1000 space the detectors return.
+
+Each backend and split runs in a fresh process, so peak memory is not
+shared between runs. --save-baseline writes the summary to JSON and
+--baseline compares a run with a saved one; regressions beyond the
+tolerances are flagged and make the script exit with status 1.
+
+Usage:
+    python benchmarks/bench_dataset.py --splits valid test
+    python benchmarks/bench_dataset.py --save-baseline benchmarks/baseline_dataset.json
+    python benchmarks/bench_dataset.py --baseline benchmarks/baseline_dataset.json
+    python benchmarks/bench_dataset.py --backends opencv onnx --model best.onnx --limit 100
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+LAMBDA_DIR = Path(__file__).resolve().parent.parent
+YOLO_SERVICE_DIR = LAMBDA_DIR.parent / 'yolo-service'
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+NORMALIZED_RANGE = 1000
+MATCH_IOU = 0.5
+MAP_IOUS = np.arange(0.5, 0.96, 0.05)  # COCO-style thresholds for mAP50-95
+
+# Regression tolerances for --baseline
+LATENCY_TOLERANCE = 0.10  # Relative increase in p50 / p99 latency
+ACCURACY_TOLERANCE = 0.005  # Absolute drop in precision / recall / AP
+MEMORY_TOLERANCE = 0.10  # Relative increase in peak RSS
+
+
+def load_labels(label_path: Path) -> List[List[float]]:
+    """
+    Read a YOLOv8-OBB label file as axis-aligned boxes
+
+    Args:
+        label_path: Label file (class x1 y1 ... x4 y4, normalized 0-1)
+
+    Returns:
+        Boxes as [x1, y1, x2, y2] in the 0-1000 space
+    """
+    boxes = []
+    if label_path.exists():
+        for line in label_path.read_text().splitlines():
+            values = line.split()
+            if len(values) < 9:
+                continue
+            points = np.array(values[1:9], dtype=float).reshape(4, 2) * NORMALIZED_RANGE
+            boxes.append([*points.min(axis=0), *points.max(axis=0)])
+    return boxes
+
+
+def memory_mb(field: str) -> float:
+    """VmRSS (current) or VmHWM (peak since exec) of this process, in MB"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return float('nan')  # Not Linux
+
+
+def make_detector(backend: str, model: str) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build a detector for one backend
+
+    Returns:
+        Tuple of (function mapping image bytes to [x1, y1, x2, y2, confidence]
+        rows in the 0-1000 space, parameters that identify the configuration)
+    """
+    if backend == 'opencv':
+        import cv2
+
+        sys.path.insert(0, str(LAMBDA_DIR))
+        from room_detector import MODEL_VERSION, detect_rooms, detection_params
+
+        cv2.setNumThreads(1)
+        params = detection_params()
+
+        def detect(image_bytes: bytes) -> List[List[float]]:
+            rooms = detect_rooms(image_bytes, **params)['rooms']
+            return [[*room['bounding_box'], room['confidence']] for room in rooms]
+
+        return detect, {'model_version': MODEL_VERSION, **params}
+
+    sys.path.insert(0, str(YOLO_SERVICE_DIR))
+    os.environ.setdefault('ONNX_THREADS', '1')
+    from onnx_backend import OnnxBackend
+
+    onnx_model = OnnxBackend(model)
+
+    def detect(image_bytes: bytes) -> List[List[float]]:
+        predictions, width, height = onnx_model.predict(image_bytes)
+        return [
+            [
+                (pred['x'] - pred['width'] / 2) / width * NORMALIZED_RANGE,
+                (pred['y'] - pred['height'] / 2) / height * NORMALIZED_RANGE,
+                (pred['x'] + pred['width'] / 2) / width * NORMALIZED_RANGE,
+                (pred['y'] + pred['height'] / 2) / height * NORMALIZED_RANGE,
+                pred['confidence'],
+            ]
+            for pred in predictions
+        ]
+
+    return detect, {'model_version': onnx_model.model_version}
+
+
+def worker(backend: str, split: str, limit: int, model: str) -> None:
+    """Detect every image of a split in this fresh process and print the raw results as JSON"""
+    logging.disable(logging.INFO)
+    detect, params = make_detector(backend, model)
+    paths = sorted((DATASET_DIR / split / 'images').glob('*.jpg'))[:limit]
+    images = [(path.stem, path.read_bytes()) for path in paths]
+    if images:
+        detect(images[0][1])  # Warm up lazy imports and caches
+
+    latencies, predictions = [], {}
+    for name, image_bytes in images:
+        start = time.perf_counter()
+        predictions[name] = detect(image_bytes)
+        latencies.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        'params': params,
+        'latencies': latencies,
+        'predictions': predictions,
+        'peak_rss_mb': memory_mb('VmHWM'),
+    }))
+
+
+def iou_matrix(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two (N, 4) and (M, 4) corner-format box arrays"""
+    x1 = np.maximum(boxes[:, None, 0], others[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], others[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], others[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], others[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    other_area = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+    union = area[:, None] + other_area[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def match_detections(predictions: np.ndarray, labels: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Greedily match predictions to labels, most confident first
+
+    Args:
+        predictions: (N, 5) rows of x1, y1, x2, y2, confidence
+        labels: (M, 4) label boxes
+        threshold: Minimum IoU for a match
+
+    Returns:
+        Boolean array, True where a prediction matched a label not matched before
+    """
+    matched = np.zeros(len(predictions), dtype=bool)
+    if not len(predictions) or not len(labels):
+        return matched
+    order = np.argsort(-predictions[:, 4], kind='stable')
+    ious = iou_matrix(predictions[order, :4], labels)
+    taken = np.zeros(len(labels), dtype=bool)
+    for rank, index in enumerate(order):
+        candidates = np.where(taken, -1.0, ious[rank])
+        best = int(candidates.argmax())
+        if candidates[best] >= threshold:
+            taken[best] = True
+            matched[index] = True
+    return matched
+
+
+def average_precision(confidences: np.ndarray, matched: np.ndarray, label_count: int) -> float:
+    """All-point interpolated area under the precision-recall curve"""
+    if label_count == 0 or not len(confidences):
+        return 0.0
+    order = np.argsort(-confidences, kind='stable')
+    true_positives = np.cumsum(matched[order])
+    recall = true_positives / label_count
+    precision = true_positives / np.arange(1, len(order) + 1)
+    recall = np.concatenate([[0.0], recall, [1.0]])
+    precision = np.concatenate([[1.0], precision, [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]  # Precision envelope
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+def score(predictions: Dict[str, List[List[float]]], split: str) -> Dict[str, float]:
+    """Precision and recall at IoU 0.5, AP50 and mAP50-95 for a split"""
+    label_dir = DATASET_DIR / split / 'labels'
+    per_image = [
+        (np.array(rows, dtype=float).reshape(-1, 5), np.array(load_labels(label_dir / f'{name}.txt')).reshape(-1, 4))
+        for name, rows in predictions.items()
+    ]
+    label_count = sum(len(labels) for _, labels in per_image)
+    confidences = np.concatenate([rows[:, 4] for rows, _ in per_image] or [np.zeros(0)])
+
+    def matches(threshold: float) -> np.ndarray:
+        return np.concatenate(
+            [match_detections(rows, labels, threshold) for rows, labels in per_image] or [np.zeros(0, dtype=bool)]
+        )
+
+    matched = matches(MATCH_IOU)
+    true_positives = int(matched.sum())
+    average_precisions = [
+        average_precision(confidences, matches(threshold), label_count) for threshold in MAP_IOUS
+    ]
+
+    return {
+        'labels': label_count,
+        'detections': len(confidences),
+        'precision': true_positives / len(confidences) if len(confidences) else 0.0,
+        'recall': true_positives / label_count if label_count else 0.0,
+        'ap50': average_precision(confidences, matched, label_count),
+        'map50_95': float(np.mean(average_precisions)),
+    }
+
+
+def run(backend: str, split: str, limit: int, model: str) -> Dict[str, Any]:
+    """Benchmark one backend on one split in a fresh process"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', backend, split, str(limit), model or ''],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    raw = json.loads(output.strip().splitlines()[-1])
+
+    latencies = np.array(raw['latencies']) * 1000
+    return {
+        'params': raw['params'],
+        'images': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'images_per_s_per_core': float(len(latencies) / latencies.sum() * 1000),
+        'peak_rss_mb': raw['peak_rss_mb'],
+        **score(raw['predictions'], split),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Diff a run against a baseline
+
+    Returns:
+        Regression messages (empty when everything is within tolerance)
+    """
+    regressions = []
+    print(f"\nvs. baseline from {baseline['created']} ({baseline['machine']})")
+    print(f"{'run':<14} {'metric':<22} {'baseline':>10} {'current':>10} {'change':>9}")
+    for key, result in current['runs'].items():
+        reference = baseline['runs'].get(key)
+        if reference is None:
+            print(f"{key:<14} (not in baseline)")
+            continue
+        if reference['params'] != result['params']:
+            print(f"{key:<14} parameters differ: {reference['params']} -> {result['params']}")
+
+        for metric, higher_is_better, tolerance, relative in [
+            ('p50_ms', False, LATENCY_TOLERANCE, True),
+            ('p99_ms', False, LATENCY_TOLERANCE, True),
+            ('images_per_s_per_core', True, LATENCY_TOLERANCE, True),
+            ('peak_rss_mb', False, MEMORY_TOLERANCE, True),
+            ('precision', True, ACCURACY_TOLERANCE, False),
+            ('recall', True, ACCURACY_TOLERANCE, False),
+            ('ap50', True, ACCURACY_TOLERANCE, False),
+            ('map50_95', True, ACCURACY_TOLERANCE, False),
+        ]:
+            before, after = reference[metric], result[metric]
+            change = (after - before) / before if relative and before else after - before
+            worse = -change if higher_is_better else change
+            flag = ' REGRESSION' if worse > tolerance else ''
+            shown = f"{change:+.1%}" if relative else f"{change:+.4f}"
+            print(f"{key:<14} {metric:<22} {before:>10.3f} {after:>10.3f} {shown:>9}{flag}")
+            if flag:
+                regressions.append(f"{key} {metric}: {before:.3f} -> {after:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark speed and accuracy on the OBB dataset')
+    parser.add_argument('--backends', nargs='+', choices=['opencv', 'onnx'], default=['opencv'])
+    parser.add_argument('--splits', nargs='+', choices=['train', 'valid', 'test'], default=['valid', 'test'])
+    parser.add_argument('--limit', type=int, default=0, help='Max images per split (0: all)')
+    parser.add_argument('--model', default=None, help='ONNX model for the onnx backend')
+    parser.add_argument('--save-baseline', type=Path, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=Path, default=None, help='Compare with a saved baseline')
+    parser.add_argument('--worker', nargs=4, metavar=('BACKEND', 'SPLIT', 'LIMIT', 'MODEL'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend, split, limit, model = args.worker
+        worker(backend, split, int(limit) or None, model)
+        return
+    if 'onnx' in args.backends and not args.model:
+        parser.error('the onnx backend needs --model')
+
+    results = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': f"{platform.machine()}, {platform.python_implementation()} {platform.python_version()}",
+        'runs': {},
+    }
+    print(f"{'run':<14} {'images':>6} {'p50 ms':>8} {'p99 ms':>8} {'img/s/core':>10} {'peak MB':>8} "
+          f"{'P':>6} {'R':>6} {'AP50':>6} {'mAP':>6}")
+    for backend in args.backends:
+        for split in args.splits:
+            key = f'{backend}/{split}'
+            result = results['runs'][key] = run(backend, split, args.limit, args.model)
+            print(f"{key:<14} {result['images']:>6} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['images_per_s_per_core']:>10.1f} {result['peak_rss_mb']:>8.0f} "
+                  f"{result['precision']:>6.3f} {result['recall']:>6.3f} {result['ap50']:>6.3f} "
+                  f"{result['map50_95']:>6.3f}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + '\n')
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()))
+        if regressions:
+            print(f"\n{len(regressions)} regressions")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
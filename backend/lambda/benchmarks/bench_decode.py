@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: grayscale / reduced decode vs. the original RGB decode
+
+Enlarges a dataset image to the size of a real blueprint scan, saves it as
+JPEG and PNG, and decodes each file in a fresh process with:
+
+- legacy: Image.open + np.array (full RGB) + cv2.cvtColor, as detect_rooms used to
+- gray: load_grayscale at full resolution
+- reduced N: load_grayscale(max_side=N)
+
+Reports decode time and the peak RSS added by decoding (VmHWM after
+decoding minus VmRSS once the file bytes are loaded). Linux only.
+
+Usage:
+    python benchmarks/bench_decode.py --upscale 16 --max-sides 4000 2000
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import load_grayscale  # noqa: E402
+
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+
+
+def legacy_decode(image_bytes: bytes) -> np.ndarray:
+    """Original detect_rooms loading: full-colour array, then gray"""
+    image_array = np.array(Image.open(BytesIO(image_bytes)))
+    return cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
+
+
+def memory_mb(field: str) -> float:
+    """VmRSS (current) or VmHWM (peak since exec) of this process, in MB"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+
+def worker(method: str, path: str, max_side: int) -> None:
+    """Decode one file and print timing and memory as JSON"""
+    logging.disable(logging.INFO)
+    image_bytes = Path(path).read_bytes()
+    before = memory_mb('VmRSS')
+
+    start = time.perf_counter()
+    if method == 'legacy':
+        gray = legacy_decode(image_bytes)
+    else:
+        gray = load_grayscale(image_bytes, max_side)
+    elapsed = time.perf_counter() - start
+
+    peak = memory_mb('VmHWM')
+    print(json.dumps({'ms': elapsed * 1000, 'rss_mb': peak - before, 'shape': list(gray.shape)}))
+
+
+def make_scan(source: Path, upscale: float, directory: Path):
+    """Write an enlarged copy of a dataset image as JPEG and PNG"""
+    image = cv2.imread(str(source))
+    image = cv2.resize(image, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+    files = []
+    for ext in ('.jpg', '.png'):
+        path = directory / f'scan{ext}'
+        cv2.imwrite(str(path), image)
+        files.append(path)
+    return image.shape, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark blueprint image decoding')
+    parser.add_argument('--image', type=Path, default=None,
+                        help='Source image (default: first valid dataset image)')
+    parser.add_argument('--upscale', type=float, default=16.0,
+                        help='Enlarge the source by this factor to build the scan')
+    parser.add_argument('--max-sides', type=int, nargs='+', default=[4000, 2000],
+                        help='max_side values for reduced decoding')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Processes per measurement (best time, lowest RSS reported)')
+    parser.add_argument('--worker', nargs=3, metavar=('METHOD', 'PATH', 'MAX_SIDE'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        method, path, max_side = args.worker
+        worker(method, path, int(max_side))
+        return
+
+    source = args.image or sorted((DATASET_DIR / 'valid' / 'images').glob('*.jpg'))[0]
+    methods = [('legacy', 'legacy', 0), ('gray', 'gray', 0)]
+    methods += [(f'reduced {side}', 'gray', side) for side in args.max_sides]
+
+    with tempfile.TemporaryDirectory() as directory:
+        shape, files = make_scan(source, args.upscale, Path(directory))
+        print(f"Scan {shape[1]}x{shape[0]} from {source.name}")
+        print(f"{'file':<6} {'method':<14} {'output':>12} {'decode ms':>10} {'peak RSS MB':>12}")
+
+        for path in files:
+            for name, method, max_side in methods:
+                runs = []
+                for _ in range(args.repeat):
+                    output = subprocess.run(
+                        [sys.executable, __file__, '--worker', method, str(path), str(max_side)],
+                        check=True, capture_output=True, text=True,
+                    ).stdout
+                    runs.append(json.loads(output.strip().splitlines()[-1]))
+
+                height, width = runs[0]['shape']
+                print(f"{path.suffix[1:]:<6} {name:<14} {f'{width}x{height}':>12} "
+                      f"{min(run['ms'] for run in runs):>10.1f} {min(run['rss_mb'] for run in runs):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: adaptive vs. fixed edge detection
+
+Runs detect_rooms_in_image with fixed (Canny 50/150, 5x5 kernel) and
+adaptive edges (thresholds from the median intensity, kernel from the
+resolution, blank pages skipped) over dataset images and degraded copies
+of them:
+
+- clean: the images as exported
+- faint: contrast squeezed towards the paper, like a light pencil scan
+- noisy: Gaussian sensor noise, like a dark photocopy
+- large: enlarged, like a high-DPI scan
+- inverted: light lines on a dark sheet, like a negative or inverted print
+- blank: an empty sheet
+
+Reports the contours findContours generated (and how many the adaptive
+stage avoided), rooms found, and the edges + contours time per image.
+Accuracy against the labels is measured by bench_dataset.py.
+
+Usage:
+    python benchmarks/bench_edges.py --limit 50 --upscale 4
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import DetectionStats, detect_rooms_in_image, load_grayscale  # noqa: E402
+
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+
+
+def variants(gray: np.ndarray, upscale: float, rng: np.random.Generator):
+    """Yield (variant name, image) degraded copies of a dataset image"""
+    yield 'clean', gray
+    yield 'faint', (255 - (255 - gray.astype(np.float32)) * 0.25).astype(np.uint8)
+    noise = rng.normal(0, 25, gray.shape)
+    yield 'noisy', np.clip(gray.astype(np.float32) * 0.8 + noise, 0, 255).astype(np.uint8)
+    yield 'large', cv2.resize(gray, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+    yield 'inverted', 255 - gray
+    yield 'blank', np.full_like(gray, 250)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark adaptive vs. fixed edge detection')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=50, help='Max images to process')
+    parser.add_argument('--upscale', type=float, default=4.0, help='Enlargement for the large variant')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    cv2.setNumThreads(1)
+    rng = np.random.default_rng(0)
+
+    paths = sorted((DATASET_DIR / args.split / 'images').glob('*.jpg'))[:args.limit]
+    totals = {}
+    for path in paths:
+        gray = load_grayscale(path.read_bytes())
+        for name, image in variants(gray, args.upscale, rng):
+            for adaptive in (False, True):
+                stats = DetectionStats()
+                result = detect_rooms_in_image(image, adaptive_edges=adaptive, stats=stats)
+                total = totals.setdefault((name, adaptive), {'contours': 0, 'rooms': 0, 'ms': 0.0})
+                total['contours'] += stats.counters.get('contours_found', 0)
+                total['rooms'] += len(result['rooms'])
+                total['ms'] += sum(stats.timings_ms.get(stage, 0.0) for stage in ('preprocess', 'edges', 'contours'))
+
+    print(f"{len(paths)} images from '{args.split}', per-variant totals (ms per image)")
+    print(f"{'variant':<8} {'contours fixed':>15} {'adaptive':>10} {'avoided':>9} "
+          f"{'rooms fixed':>12} {'adaptive':>9} {'ms fixed':>9} {'adaptive':>9}")
+    for name in ('clean', 'faint', 'noisy', 'large', 'inverted', 'blank'):
+        fixed, adaptive = totals[(name, False)], totals[(name, True)]
+        avoided = fixed['contours'] - adaptive['contours']
+        print(f"{name:<8} {fixed['contours']:>15} {adaptive['contours']:>10} {avoided:>9} "
+              f"{fixed['rooms']:>12} {adaptive['rooms']:>9} "
+              f"{fixed['ms'] / len(paths):>9.1f} {adaptive['ms'] / len(paths):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
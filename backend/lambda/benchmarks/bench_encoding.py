@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: JSON vs. binary room encoding
+
+Encodes detection results with json.dumps (the default response) and with
+room_encoding.encode_rooms (Accept: application/vnd.room-detection.rooms)
+for growing room counts, in box and polygon geometry. Reports:
+
+- encode and decode time per response
+- bytes on the wire: raw, gzip (a compressing proxy or CDN) and base64
+  (the Lambda proxy response body, which API Gateway decodes for binary types)
+
+Rooms are synthetic but shaped like real results: ids from the detection
+order, 0-1000 coordinates, two-decimal confidences, few distinct classes.
+
+Usage:
+    python benchmarks/bench_encoding.py --rooms 10 100 1000 10000
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'shared'))
+from room_encoding import decode_rooms, encode_rooms  # noqa: E402
+
+
+def synthetic_result(count: int, polygons: bool, rng: random.Random) -> Dict[str, Any]:
+    """A detection result with count rooms, optionally with 4-12 vertex outlines"""
+    rooms = []
+    for index in range(count):
+        x, y = rng.randint(0, 900), rng.randint(0, 900)
+        room = {
+            'id': f'room_{index:03d}',
+            'bounding_box': [x, y, x + rng.randint(20, 100), y + rng.randint(20, 100)],
+            'confidence': round(rng.uniform(0.5, 0.95), 2),
+            'name_hint': rng.choice([None, 'room', 'corridor']),
+        }
+        if polygons:
+            room['polygon'] = [rng.randint(0, 1000) for _ in range(2 * rng.randint(4, 12))]
+        rooms.append(room)
+    rng.shuffle(rooms)  # Merging and sorting leave ids out of order
+    return {'rooms': rooms, 'processing_time_ms': 42, 'model_version': 'phase_1_opencv', 'cache_hit': False}
+
+
+def best_time(function: Callable[[], Any], repeat: int) -> float:
+    """Fastest of repeat calls, in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON vs. binary room encoding')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement, the fastest is reported')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'rooms':>6} {'geometry':<8} {'format':<7} {'encode ms':>10} {'decode ms':>10} "
+          f"{'bytes':>9} {'gzip':>9} {'base64':>9}")
+    for count in args.rooms:
+        for polygons in (False, True):
+            result = synthetic_result(count, polygons, rng)
+            formats = {
+                'json': (lambda: json.dumps(result).encode('utf-8'), json.loads),
+                'binary': (lambda: encode_rooms(result), decode_rooms),
+            }
+            for name, (encode, decode) in formats.items():
+                payload = encode()
+                assert decode(payload) == result
+                print(f"{count:>6} {'polygon' if polygons else 'box':<8} {name:<7} "
+                      f"{best_time(encode, args.repeat):>10.3f} "
+                      f"{best_time(lambda: decode(payload), args.repeat):>10.3f} "
+                      f"{len(payload):>9} {len(gzip.compress(payload)):>9} {len(base64.b64encode(payload)):>9}")
+
+
+if __name__ == '__main__':
+    main()
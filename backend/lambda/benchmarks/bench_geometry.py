@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: box vs. oriented-box vs. polygon room geometry
+
+Two measurements:
+
+- pipeline: detect_rooms_in_image over dataset images in each geometry,
+  reporting scoring + merge time per image and shape accuracy against the
+  dataset's oriented-box labels. Every mode is scored with polygon IoU
+  against the label polygons (a box counts as its four corners), so the
+  numbers show how much area each outline gets right, not just its extent.
+- merge: suppress_overlapping_boxes on synthetic rotated and L-shaped rooms,
+  boxes only vs. polygon IoU, in rooms merged per second.
+
+Usage:
+    python benchmarks/bench_geometry.py --limit 100 --rooms 200 1000 5000
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import (  # noqa: E402
+    GEOMETRY_MODES, NORMALIZED_RANGE, DetectionStats, detect_rooms_in_image, load_grayscale,
+    polygon_iou, suppress_overlapping_boxes,
+)
+from bench_dataset import DATASET_DIR, MATCH_IOU, average_precision  # noqa: E402
+
+
+def load_label_polygons(label_path: Path) -> List[np.ndarray]:
+    """Label polygons (class x1 y1 ... x4 y4, normalized 0-1) in the 0-1000 space"""
+    if not label_path.exists():
+        return []
+    polygons = []
+    for line in label_path.read_text().splitlines():
+        values = [float(value) for value in line.split()[1:]]
+        if len(values) >= 6:
+            polygons.append(np.array(values).reshape(-1, 2) * NORMALIZED_RANGE)
+    return polygons
+
+
+def room_outline(room: Dict) -> np.ndarray:
+    """A detected room's polygon, or its bounding box corners in box mode"""
+    if 'polygon' in room:
+        return np.array(room['polygon'], dtype=np.float64).reshape(-1, 2)
+    x1, y1, x2, y2 = room['bounding_box']
+    return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float64)
+
+
+def match_outlines(rooms: List[Dict], labels: List[np.ndarray]) -> np.ndarray:
+    """Greedy most-confident-first matching by polygon IoU (rooms are sorted by size, not score)"""
+    matched = np.zeros(len(rooms), dtype=bool)
+    taken = np.zeros(len(labels), dtype=bool)
+    order = np.argsort([-room['confidence'] for room in rooms], kind='stable')
+    for index in order:
+        outline = room_outline(rooms[index])
+        ious = [-1.0 if taken[k] else polygon_iou(outline, label) for k, label in enumerate(labels)]
+        if ious and max(ious) >= MATCH_IOU:
+            taken[int(np.argmax(ious))] = True
+            matched[index] = True
+    return matched
+
+
+def synthetic_rooms(count: int, rng: np.random.Generator):
+    """Rotated rectangles and L-shapes scattered over the 0-1000 space, as (boxes, scores, polygons)"""
+    polygons = []
+    for index in range(count):
+        center = rng.uniform(50, NORMALIZED_RANGE - 50, 2)
+        size = rng.uniform(20, 80, 2)
+        if index % 2:
+            corners = cv2.boxPoints(((*center, ), (*size, ), float(rng.uniform(0, 90))))
+        else:
+            w, h = size
+            notch = rng.uniform(0.3, 0.7, 2) * size
+            corners = np.array([[0, 0], [w, 0], [w, notch[1]], [notch[0], notch[1]], [notch[0], h], [0, h]]) + center
+        polygons.append(np.asarray(corners, dtype=np.float64))
+    boxes = np.array([np.r_[polygon.min(axis=0), polygon.max(axis=0)] for polygon in polygons])
+    return boxes, rng.uniform(0.5, 0.95, count), polygons
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark box vs. oriented-box vs. polygon room geometry')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=100, help='Max dataset images to process')
+    parser.add_argument('--rooms', type=int, nargs='+', default=[200, 1000, 5000],
+                        help='Synthetic room counts for the merge benchmark')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    cv2.setNumThreads(1)
+
+    paths = sorted((DATASET_DIR / args.split / 'images').glob('*.jpg'))[:args.limit]
+    images = [(path.stem, load_grayscale(path.read_bytes())) for path in paths]
+    labels = {name: load_label_polygons(DATASET_DIR / args.split / 'labels' / f'{name}.txt') for name, _ in images}
+    label_count = sum(len(polygons) for polygons in labels.values())
+
+    print(f"Pipeline: {len(images)} images from '{args.split}', {label_count} labels, polygon IoU {MATCH_IOU}")
+    print(f"{'geometry':<9} {'scoring ms':>11} {'merge ms':>9} {'total ms':>9} {'rooms':>6} "
+          f"{'P':>7} {'R':>7} {'AP50':>7}")
+    for geometry in GEOMETRY_MODES:
+        stats = DetectionStats()
+        confidences, matched = [], []
+        start = time.perf_counter()
+        for name, gray in images:
+            rooms = detect_rooms_in_image(gray, geometry=geometry, stats=stats)['rooms']
+            confidences.extend(room['confidence'] for room in rooms)
+            matched.extend(match_outlines(rooms, labels[name]))
+        total_ms = (time.perf_counter() - start) * 1000 / len(images)
+        confidences, matched = np.array(confidences), np.array(matched, dtype=bool)
+        true_positives = int(matched.sum())
+        print(f"{geometry:<9} {stats.timings_ms.get('scoring', 0.0) / len(images):>11.2f} "
+              f"{stats.timings_ms.get('merge', 0.0) / len(images):>9.2f} {total_ms:>9.1f} {len(matched):>6} "
+              f"{true_positives / max(len(matched), 1):>7.3f} {true_positives / max(label_count, 1):>7.3f} "
+              f"{average_precision(confidences, matched, label_count):>7.3f}")
+
+    print("\nMerge: synthetic rotated and L-shaped rooms, rooms per second")
+    print(f"{'rooms':>6} {'box':>12} {'polygon':>12} {'kept box':>9} {'polygon':>8}")
+    rng = np.random.default_rng(0)
+    for count in args.rooms:
+        boxes, scores, polygons = synthetic_rooms(count, rng)
+        timings, kept = {}, {}
+        for mode, outlines in (('box', None), ('polygon', polygons)):
+            start = time.perf_counter()
+            kept[mode] = len(suppress_overlapping_boxes(boxes, scores, polygons=outlines))
+            timings[mode] = time.perf_counter() - start
+        print(f"{count:>6} {count / timings['box']:>12.0f} {count / timings['polygon']:>12.0f} "
+              f"{kept['box']:>9} {kept['polygon']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental re-detection of edited sheets
+
+Takes dataset images enlarged to sheet size, detects them once, then
+applies an edit (a new partition wall and a text label, like an
+annotation or patch) covering a growing share of the sheet and re-detects:
+
+- full: detect_rooms_in_image on the edited sheet
+- dirty: detect_rooms_incremental with the edited rectangle given
+- diff: detect_rooms_incremental finding the edit by diffing against the
+  earlier sheet
+
+Reports mean latency per edit size and how closely the incremental rooms
+agree with full re-detection (share of full rooms matched at IoU 0.5), plus
+how often the affected region grew past INCREMENTAL_MAX_FRACTION and fell
+back to full detection.
+
+Usage:
+    python benchmarks/bench_incremental.py --limit 20 --upscale 4
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import (  # noqa: E402
+    NORMALIZED_RANGE, detect_rooms_in_image, detect_rooms_incremental, load_grayscale,
+)
+from bench_dataset import DATASET_DIR, iou_matrix  # noqa: E402
+
+
+def apply_edit(gray: np.ndarray, fraction: float, rng: np.random.Generator) -> Tuple[np.ndarray, Tuple]:
+    """Draw a wall and a label in a random square covering fraction of the sheet; returns (image, dirty rect)"""
+    height, width = gray.shape
+    side = int(np.sqrt(fraction * height * width))
+    x0, y0 = int(rng.integers(0, width - side)), int(rng.integers(0, height - side))
+    edited = gray.copy()
+    thickness = max(2, side // 100)
+    cv2.line(edited, (x0 + side // 2, y0), (x0 + side // 2, y0 + side - 1), 0, thickness)
+    cv2.putText(edited, 'A1', (x0 + side // 8, y0 + side // 2), cv2.FONT_HERSHEY_SIMPLEX, side / 400, 0, thickness)
+    dirty = (
+        x0 * NORMALIZED_RANGE // width, y0 * NORMALIZED_RANGE // height,
+        -(-(x0 + side) * NORMALIZED_RANGE // width), -(-(y0 + side) * NORMALIZED_RANGE // height),
+    )
+    return edited, dirty
+
+
+def agreement(rooms: List[Dict], reference: List[Dict]) -> Tuple[int, int]:
+    """(reference rooms matched at IoU 0.5 by some room, reference rooms)"""
+    if not reference:
+        return 0, 0
+    if not rooms:
+        return 0, len(reference)
+    boxes = np.array([room['bounding_box'] for room in rooms], dtype=float)
+    reference_boxes = np.array([room['bounding_box'] for room in reference], dtype=float)
+    return int((iou_matrix(reference_boxes, boxes).max(axis=1) >= 0.5).sum()), len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incremental re-detection of edited sheets')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=20, help='Max images to process')
+    parser.add_argument('--upscale', type=float, default=4.0, help='Enlargement to sheet size')
+    parser.add_argument('--edits', type=float, nargs='+', default=[0.005, 0.02, 0.08, 0.2],
+                        help='Edited share of the sheet')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    cv2.setNumThreads(1)
+    rng = np.random.default_rng(0)
+
+    paths = sorted((DATASET_DIR / args.split / 'images').glob('*.jpg'))[:args.limit]
+    totals = {}
+    for path in paths:
+        gray = load_grayscale(path.read_bytes())
+        sheet = cv2.resize(gray, None, fx=args.upscale, fy=args.upscale, interpolation=cv2.INTER_CUBIC)
+        prior_rooms = detect_rooms_in_image(sheet)['rooms']
+
+        for fraction in args.edits:
+            edited, dirty = apply_edit(sheet, fraction, rng)
+            runs = {
+                'full': lambda: detect_rooms_in_image(edited),
+                'dirty': lambda: detect_rooms_incremental(edited, prior_rooms, dirty_rect=dirty),
+                'diff': lambda: detect_rooms_incremental(edited, prior_rooms, prior_gray=sheet),
+            }
+            results = {}
+            for mode, run in runs.items():
+                start = time.perf_counter()
+                results[mode] = run()
+                total = totals.setdefault((fraction, mode), {'ms': 0.0, 'matched': 0, 'rooms': 0, 'fallbacks': 0})
+                total['ms'] += (time.perf_counter() - start) * 1000
+                total['fallbacks'] += mode != 'full' and 'incremental' not in results[mode]
+            for mode in ('dirty', 'diff'):
+                matched, count = agreement(results[mode]['rooms'], results['full']['rooms'])
+                totals[(fraction, mode)]['matched'] += matched
+                totals[(fraction, mode)]['rooms'] += count
+
+    print(f"{len(paths)} sheets from '{args.split}' at {args.upscale}x, mean ms per edit")
+    print(f"{'edit':>6} {'full ms':>9} {'dirty ms':>9} {'diff ms':>9} {'agree dirty':>12} {'diff':>6} {'fallbacks':>10}")
+    for fraction in args.edits:
+        full, dirty, diff = (totals[(fraction, mode)] for mode in ('full', 'dirty', 'diff'))
+        print(f"{fraction:>6.1%} {full['ms'] / len(paths):>9.1f} {dirty['ms'] / len(paths):>9.1f} "
+              f"{diff['ms'] / len(paths):>9.1f} {dirty['matched'] / max(dirty['rooms'], 1):>12.1%} "
+              f"{diff['matched'] / max(diff['rooms'], 1):>6.1%} {dirty['fallbacks'] + diff['fallbacks']:>10}")
+
+
+if __name__ == '__main__':
+    main()
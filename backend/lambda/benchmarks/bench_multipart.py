@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: bytes multipart parsing vs. the original latin-1 string path
+
+Builds base64-encoded API Gateway bodies carrying one large file part,
+checks that both paths extract the same bytes, and reports parse time and
+peak traced memory (on top of the event body itself) for each.
+
+Usage:
+    python benchmarks/bench_multipart.py --sizes-mb 1 5 20
+"""
+
+import argparse
+import base64
+import binascii
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import parse_multipart  # noqa: E402
+
+BOUNDARY = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+
+
+def reference_parse_multipart(body: str, content_type: str) -> bytes:
+    """Original str.split implementation, kept here as the correctness oracle"""
+    boundary = None
+    for part in content_type.split(';'):
+        part = part.strip()
+        if part.startswith('boundary='):
+            boundary = part.split('=', 1)[1].strip('"')
+            break
+
+    for part in body.split(f'--{boundary}'):
+        if not part or part.strip() == '--':
+            continue
+
+        if '\r\n\r\n' in part:
+            headers, content = part.split('\r\n\r\n', 1)
+        elif '\n\n' in part:
+            headers, content = part.split('\n\n', 1)
+        else:
+            continue
+
+        if 'Content-Disposition' in headers and 'filename' in headers:
+            content = content.split(f'--{boundary}')[0]
+            content = content.rstrip('\r\n-')
+            return content.encode('latin-1')
+
+    raise ValueError("No file found in multipart data")
+
+
+def make_event_body(size: int) -> str:
+    """Base64 multipart body with an options field and one binary file part"""
+    payload = os.urandom(size - 1) + b'\xd9'  # Like a JPEG EOI; not stripped by the reference rstrip
+    body = b''.join([
+        f'--{BOUNDARY}\r\n'.encode(),
+        b'Content-Disposition: form-data; name="options"\r\n\r\n{"min_area": 5000}\r\n',
+        f'--{BOUNDARY}\r\n'.encode(),
+        b'Content-Disposition: form-data; name="file"; filename="plan.jpg"\r\n',
+        b'Content-Type: image/jpeg\r\n\r\n',
+        payload,
+        f'\r\n--{BOUNDARY}--\r\n'.encode(),
+    ])
+    return base64.b64encode(body).decode('ascii')
+
+
+def legacy_path(event_body: str) -> bytes:
+    """What lambda_handler used to do: decode to str, split, re-encode"""
+    body = base64.b64decode(event_body).decode('latin-1')
+    return reference_parse_multipart(body, CONTENT_TYPE)
+
+
+def binary_path(event_body: str):
+    """Current lambda_handler path: decode to bytes and take a view of the file part"""
+    return parse_multipart(binascii.a2b_base64(event_body), CONTENT_TYPE)
+
+
+def measure(fn, event_body: str, repeat: int):
+    """Best wall time in ms, peak traced allocation in MB, and the result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(event_body)
+        best = min(best, time.perf_counter() - start)
+        del result
+
+    tracemalloc.start()
+    result = fn(event_body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 2**20, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multipart request parsing')
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 5, 20],
+                        help='File part sizes in MB')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Repetitions per timing (best time is reported)')
+    args = parser.parse_args()
+
+    print(f"{'file MB':>8} {'legacy ms':>10} {'legacy peak MB':>15} "
+          f"{'bytes ms':>9} {'bytes peak MB':>14} {'speedup':>8}")
+    for size_mb in args.sizes_mb:
+        event_body = make_event_body(int(size_mb * 2**20))
+
+        legacy_ms, legacy_peak, expected = measure(legacy_path, event_body, args.repeat)
+        new_ms, new_peak, actual = measure(binary_path, event_body, args.repeat)
+
+        if actual != expected:
+            raise SystemExit(f"Mismatch at {size_mb} MB")
+
+        print(f"{size_mb:>8g} {legacy_ms:>10.1f} {legacy_peak:>15.1f} "
+              f"{new_ms:>9.1f} {new_peak:>14.1f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
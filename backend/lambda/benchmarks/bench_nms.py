@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: array-backed NMS vs. the original pairwise Python loop
+
+Generates clustered random room boxes in the 0-1000 normalized space,
+checks that both implementations keep the same rooms in the same order,
+and reports the time taken by each.
+
+Usage:
+    python benchmarks/bench_nms.py --sizes 100 1000 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import NORMALIZED_RANGE, merge_overlapping_boxes  # noqa: E402
+
+
+def reference_merge_overlapping_boxes(
+    boxes: List[Dict[str, Any]],
+    iou_threshold: float = 0.3
+) -> List[Dict[str, Any]]:
+    """Original O(n²) implementation, kept here as the correctness oracle"""
+    if len(boxes) <= 1:
+        return boxes
+
+    boxes = sorted(boxes, key=lambda x: x['confidence'], reverse=True)
+
+    merged = []
+    used = set()
+
+    for i, box1 in enumerate(boxes):
+        if i in used:
+            continue
+
+        for j in range(i + 1, len(boxes)):
+            if j in used:
+                continue
+
+            box2 = boxes[j]
+            x1_min, y1_min, x1_max, y1_max = box1['bounding_box']
+            x2_min, y2_min, x2_max, y2_max = box2['bounding_box']
+
+            x_inter_min = max(x1_min, x2_min)
+            y_inter_min = max(y1_min, y2_min)
+            x_inter_max = min(x1_max, x2_max)
+            y_inter_max = min(y1_max, y2_max)
+
+            if x_inter_max > x_inter_min and y_inter_max > y_inter_min:
+                inter_area = (x_inter_max - x_inter_min) * (y_inter_max - y_inter_min)
+                box1_area = (x1_max - x1_min) * (y1_max - y1_min)
+                box2_area = (x2_max - x2_min) * (y2_max - y2_min)
+                union_area = box1_area + box2_area - inter_area
+
+                iou = inter_area / union_area if union_area > 0 else 0
+
+                if iou > iou_threshold:
+                    used.add(j)
+
+        merged.append(box1)
+
+    return merged
+
+
+def make_rooms(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Random rooms clustered around a grid of centres, like duplicate contours"""
+    rng = np.random.default_rng(seed)
+    centres = rng.integers(0, NORMALIZED_RANGE, size=(max(count // 4, 1), 2))
+    picks = centres[rng.integers(0, len(centres), size=count)]
+    jitter = rng.integers(-8, 9, size=(count, 2))
+    sizes = rng.integers(10, 60, size=(count, 2))
+
+    x_min = np.clip(picks[:, 0] + jitter[:, 0], 0, NORMALIZED_RANGE - 1)
+    y_min = np.clip(picks[:, 1] + jitter[:, 1], 0, NORMALIZED_RANGE - 1)
+    x_max = np.clip(x_min + sizes[:, 0], 0, NORMALIZED_RANGE)
+    y_max = np.clip(y_min + sizes[:, 1], 0, NORMALIZED_RANGE)
+    confidence = np.round(rng.uniform(0.5, 0.95, size=count), 2)
+
+    return [
+        {
+            'id': f'room_{idx:03d}',
+            'bounding_box': [int(x_min[idx]), int(y_min[idx]), int(x_max[idx]), int(y_max[idx])],
+            'confidence': float(confidence[idx]),
+            'name_hint': None,
+        }
+        for idx in range(count)
+    ]
+
+
+def time_call(fn, *args, repeat: int = 1):
+    """Best wall time of fn(*args) in milliseconds, plus its result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark room box suppression')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Number of boxes per run')
+    parser.add_argument('--iou-threshold', type=float, default=0.3,
+                        help='IoU threshold passed to both implementations')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Repetitions per measurement (best time is reported)')
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8} {'kept':>8} {'reference ms':>14} {'vectorized ms':>15} {'speedup':>9}")
+    for count in args.sizes:
+        rooms = make_rooms(count)
+
+        # The reference loop is quadratic, so only time it once on big inputs
+        ref_repeat = 1 if count > 1000 else args.repeat
+        ref_ms, expected = time_call(reference_merge_overlapping_boxes, rooms, args.iou_threshold,
+                                     repeat=ref_repeat)
+        new_ms, actual = time_call(merge_overlapping_boxes, rooms, args.iou_threshold, repeat=args.repeat)
+
+        if [r['id'] for r in expected] != [r['id'] for r in actual]:
+            raise SystemExit(f"Mismatch at {count} boxes")
+
+        print(f"{count:>8} {len(actual):>8} {ref_ms:>14.1f} {new_ms:>15.1f} {ref_ms / new_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coarse-to-fine pyramid mode vs. full-resolution detect_rooms
+
+Runs the detector over the bundled Roboflow OBB dataset split at full
+resolution and at each pyramid scale, and reports mean latency, speedup
+and how many full-resolution rooms the pyramid result still finds
+(box IoU >= 0.5 in the normalized 0-1000 space).
+
+The dataset images are 640x640 exports; --upscale enlarges them first to
+approximate the size of real blueprint scans.
+
+Usage:
+    python benchmarks/bench_pyramid.py --split valid --scales 0.5 0.25 --upscale 4
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from room_detector import box_iou, detect_rooms  # noqa: E402
+
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+
+
+def load_images(split: str, limit: int, upscale: float):
+    """Encode dataset images as PNG bytes, optionally enlarged"""
+    paths = sorted((DATASET_DIR / split / 'images').glob('*.jpg'))[:limit]
+    for path in paths:
+        image = cv2.imread(str(path))
+        if upscale != 1:
+            image = cv2.resize(image, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        yield path.name, cv2.imencode('.png', image)[1].tobytes()
+
+
+def matched(reference, candidate, threshold: float = 0.5) -> int:
+    """Count reference rooms that have a candidate room with IoU >= threshold"""
+    return sum(
+        any(box_iou(ref['bounding_box'], room['bounding_box']) >= threshold for room in candidate)
+        for ref in reference
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pyramid mode on the OBB dataset')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=50, help='Max images to process')
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.5, 0.25])
+    parser.add_argument('--upscale', type=float, default=1.0,
+                        help='Enlarge images by this factor before detection')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    modes = [('full', 0.0, True)]
+    for scale in args.scales:
+        modes.append((f'pyramid {scale}', scale, True))
+        modes.append((f'pyramid {scale} coarse', scale, False))
+
+    totals = {name: 0.0 for name, _, _ in modes}
+    found = {name: 0 for name, _, _ in modes}
+    reference_rooms = 0
+    images = 0
+
+    for _, image_bytes in load_images(args.split, args.limit, args.upscale):
+        images += 1
+        reference = None
+        for name, scale, refine in modes:
+            start = time.perf_counter()
+            result = detect_rooms(image_bytes, pyramid_scale=scale, pyramid_refine=refine)
+            totals[name] += time.perf_counter() - start
+
+            if reference is None:
+                reference = result['rooms']
+                reference_rooms += len(reference)
+            found[name] += matched(reference, result['rooms'])
+
+    if not images:
+        raise SystemExit(f"No images found under {DATASET_DIR / args.split}")
+
+    print(f"{images} images from '{args.split}' at {args.upscale}x, {reference_rooms} full-resolution rooms")
+    print(f"{'mode':<22} {'mean ms':>9} {'speedup':>9} {'rooms kept':>11}")
+    full_time = totals['full']
+    for name, _, _ in modes:
+        kept = found[name] / reference_rooms if reference_rooms else 1.0
+        print(f"{name:<22} {totals[name] / images * 1000:>9.1f} "
+              f"{full_time / totals[name]:>8.2f}x {kept:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Lambda cold start, eager vs. lazy initialization
+
+Two modes:
+
+- docker: builds the function image and, per iteration, starts a fresh
+  container under the Lambda Runtime Interface Emulator (bundled with the
+  AWS base image) and invokes it once. Reports the emulator's Init Duration,
+  the first invocation's round trip and the X-Init-Timings breakdown.
+- local: starts a fresh Python process per iteration that imports
+  room_detector and handles one request. No Docker needed, but the numbers
+  only show the relative cost of the import and first-request phases.
+
+Each mode runs with ROOM_DETECTOR_LAZY_INIT=0 (eager) and =1 (lazy).
+
+Usage:
+    python benchmarks/cold_start.py --mode local --iterations 10
+    python benchmarks/cold_start.py --mode docker --iterations 5
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+LAMBDA_DIR = Path(__file__).resolve().parent.parent
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+IMAGE_TAG = 'room-detector:cold-start'
+RIE_PORT = 9000
+INVOKE_URL = f'http://localhost:{RIE_PORT}/2015-03-31/functions/function/invocations'
+INIT_DURATION = re.compile(r'Init Duration: ([\d.]+) ms')
+MODES = [('eager', '0'), ('lazy', '1')]
+
+
+def make_event(image: Path) -> dict:
+    """API Gateway proxy event posting one image"""
+    return {
+        'body': base64.b64encode(image.read_bytes()).decode(),
+        'isBase64Encoded': True,
+        'headers': {'Content-Type': 'image/jpeg'},
+        'path': '/detect',
+    }
+
+
+def worker(event_path: str) -> None:
+    """Import the handler and serve one request in this fresh process, printing timings as JSON"""
+    import logging
+
+    logging.disable(logging.INFO)
+    sys.path.insert(0, str(LAMBDA_DIR))
+    event = json.loads(Path(event_path).read_text())
+
+    start = time.perf_counter()
+    import room_detector
+    imported = time.perf_counter()
+    response = room_detector.lambda_handler(event, None)
+    handled = time.perf_counter()
+
+    print(json.dumps({
+        'init_ms': (imported - start) * 1000,
+        'first_request_ms': (handled - imported) * 1000,
+        'status': response['statusCode'],
+        'breakdown': json.loads(response['headers'].get('X-Init-Timings', '{}')),
+    }))
+
+
+def run_local(event_path: Path, lazy: str) -> dict:
+    """One cold start in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', str(event_path)],
+        check=True, capture_output=True, text=True,
+        env={**os.environ, 'ROOM_DETECTOR_LAZY_INIT': lazy},
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def wait_for_emulator(timeout: float = 30.0) -> None:
+    """Block until the emulator accepts connections"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://localhost:{RIE_PORT}/', timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return  # Listening; the root path just is not an API
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    raise TimeoutError('Runtime Interface Emulator did not start')
+
+
+def run_docker(event: dict, lazy: str) -> dict:
+    """One cold start in a fresh container"""
+    container = subprocess.run(
+        ['docker', 'run', '-d', '--rm', '-p', f'{RIE_PORT}:8080',
+         '-e', f'ROOM_DETECTOR_LAZY_INIT={lazy}', '-e', 'RESULT_CACHE_BACKEND=none', IMAGE_TAG],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    try:
+        wait_for_emulator()
+        request = urllib.request.Request(INVOKE_URL, data=json.dumps(event).encode())
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=120) as reply:
+            response = json.load(reply)
+        first_request_ms = (time.perf_counter() - start) * 1000
+
+        # The emulator logs a REPORT line like Lambda's, with Init Duration on cold starts
+        logs = subprocess.run(['docker', 'logs', container], capture_output=True, text=True)
+        match = INIT_DURATION.search(logs.stdout + logs.stderr)
+        return {
+            'init_ms': float(match.group(1)) if match else float('nan'),
+            'first_request_ms': first_request_ms,
+            'status': response['statusCode'],
+            'breakdown': json.loads(response['headers'].get('X-Init-Timings', '{}')),
+        }
+    finally:
+        subprocess.run(['docker', 'stop', container], capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Lambda cold starts')
+    parser.add_argument('--mode', choices=['local', 'docker'], default='local')
+    parser.add_argument('--image', type=Path, default=None,
+                        help='Request image (default: first valid dataset image)')
+    parser.add_argument('--iterations', type=int, default=10, help='Cold starts per configuration')
+    parser.add_argument('--no-build', action='store_true', help='Reuse an existing docker image')
+    parser.add_argument('--worker', metavar='EVENT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    image = args.image or sorted((DATASET_DIR / 'valid' / 'images').glob('*.jpg'))[0]
+    event = make_event(image)
+    event_path = Path('/tmp/cold_start_event.json')
+    event_path.write_text(json.dumps(event))
+
+    if args.mode == 'docker' and not args.no_build:
+        subprocess.run(['docker', 'build', '-t', IMAGE_TAG, str(LAMBDA_DIR)], check=True)
+
+    print(f"{args.mode} cold starts, {args.iterations} per configuration, request {image.name}")
+    print(f"{'init':<6} {'init ms p50':>12} {'first req ms p50':>17} {'total ms p50':>13}  breakdown (last run)")
+    for name, lazy in MODES:
+        runs = []
+        for _ in range(args.iterations):
+            run = run_local(event_path, lazy) if args.mode == 'local' else run_docker(event, lazy)
+            if run['status'] != 200:
+                raise RuntimeError(f"Handler returned {run['status']}")
+            runs.append(run)
+
+        init_ms = statistics.median(run['init_ms'] for run in runs)
+        first_ms = statistics.median(run['first_request_ms'] for run in runs)
+        total_ms = statistics.median(run['init_ms'] + run['first_request_ms'] for run in runs)
+        print(f"{name:<6} {init_ms:>12.1f} {first_ms:>17.1f} {total_ms:>13.1f}  {json.dumps(runs[-1]['breakdown'])}")
+
+
+if __name__ == '__main__':
+    main()
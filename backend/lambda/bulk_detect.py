@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Bulk room detection over a directory tree or manifest of blueprints
+Runs detect_rooms (or detect_pdf_pages for PDFs) in a process pool and
+appends one record per file to JSONL or Parquet as results come in.
+
+Re-running with the same output resumes: files that already have a
+successful record for the current detector version and parameters are
+skipped, failed ones are retried.
+
+Usage:
+    python bulk_detect.py /data/blueprints --output results.jsonl
+    python bulk_detect.py --manifest sheets.txt --output results.parquet --format parquet --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import cv2
+
+from room_detector import MODEL_VERSION, detect_pdf_pages, detect_rooms, detection_params
+from pdf_pages import is_pdf
+from zip_uploads import IMAGE_EXTENSIONS
+
+logger = logging.getLogger('bulk_detect')
+
+PARQUET_ROW_GROUP = 256  # Records buffered per Parquet row group
+PROGRESS_EVERY = 100  # Files between progress log lines
+
+
+def iter_directory(root: Path) -> Iterator[Tuple[str, Path]]:
+    """
+    Walk a directory tree for blueprint files in a stable order
+
+    Args:
+        root: Directory to walk
+
+    Yields:
+        Tuple of (path relative to root, absolute path)
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.startswith('.') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = Path(directory) / name
+            yield path.relative_to(root).as_posix(), path
+
+
+def iter_manifest(manifest: Path) -> Iterator[Tuple[str, Path]]:
+    """
+    Read blueprint paths from a manifest, one per line
+
+    Relative paths are resolved against the manifest's directory; blank
+    lines and lines starting with # are ignored.
+
+    Args:
+        manifest: Manifest file
+
+    Yields:
+        Tuple of (path as listed, absolute path)
+    """
+    with open(manifest) as lines:
+        for line in lines:
+            entry = line.strip()
+            if entry and not entry.startswith('#'):
+                yield entry, manifest.parent / entry
+
+
+def init_worker() -> None:
+    """Quiet, single-threaded detector processes; the parent handles Ctrl-C"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.disable(logging.INFO)
+    cv2.setNumThreads(1)  # Parallelism comes from the pool
+
+
+def process_file(key: str, path: str) -> Dict[str, Any]:
+    """
+    Detect rooms in one file (runs in a worker process)
+
+    Args:
+        key: Path as recorded in the output
+        path: File to read
+
+    Returns:
+        Output record; failures carry error and message instead of rooms
+    """
+    start_time = time.time()
+    record = {'path': key, 'model_version': MODEL_VERSION, 'params': detection_params()}
+    try:
+        data = Path(path).read_bytes()
+        if is_pdf(data):
+            record['pages'] = list(detect_pdf_pages(data, workers=1, **record['params']))
+            failed = [page['page'] for page in record['pages'] if 'error' in page]
+            if failed:
+                record.update({'error': 'Processing failed', 'message': f"Pages {failed} failed"})
+        else:
+            record['rooms'] = detect_rooms(data, **record['params'])['rooms']
+    except Exception as e:
+        record.update({'error': 'Processing failed', 'message': str(e)})
+    record['processing_time_ms'] = int((time.time() - start_time) * 1000)
+    return record
+
+
+class JsonlWriter:
+    """Appends records to a JSON Lines file, one flushed line each"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def completed(self) -> Iterator[Dict[str, Any]]:
+        """Records already in the file; a line cut off by an interruption is ignored"""
+        if not self.path.exists():
+            return
+        with open(self.path) as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def open(self) -> None:
+        needs_newline = self.path.exists() and self.path.stat().st_size > 0
+        if needs_newline:
+            with open(self.path, 'rb') as existing:
+                existing.seek(-1, os.SEEK_END)
+                needs_newline = existing.read(1) != b'\n'
+        self._file = open(self.path, 'a')
+        if needs_newline:
+            self._file.write('\n')  # Terminate a partial last line
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes records as Parquet part files in an output directory
+
+    Each run adds a new part file, written in row groups so finished work
+    reaches disk as the run goes. Requires pyarrow.
+    """
+
+    def __init__(self, path: Path, row_group: int = PARQUET_ROW_GROUP):
+        import pyarrow as pa  # Only needed for Parquet output
+
+        self.path = path
+        self.row_group = row_group
+        self.schema = pa.schema([
+            ('path', pa.string()),
+            ('model_version', pa.string()),
+            ('params', pa.string()),         # JSON
+            ('room_count', pa.int32()),
+            ('rooms', pa.string()),          # JSON list (per-page lists for PDFs)
+            ('processing_time_ms', pa.int64()),
+            ('error', pa.string()),
+            ('message', pa.string()),
+        ])
+        self._buffer: List[Dict[str, Any]] = []
+
+    def completed(self) -> Iterator[Dict[str, Any]]:
+        """Records in earlier part files; a part left unfinished by an interruption is ignored"""
+        import pyarrow.parquet as pq
+
+        for part in sorted(self.path.glob('part-*.parquet')):
+            try:
+                rows = pq.read_table(part, columns=['path', 'model_version', 'params', 'error']).to_pylist()
+            except Exception as e:
+                logger.warning(f"Skipping unreadable {part.name}: {str(e)}")
+                continue
+            for row in rows:
+                row['params'] = json.loads(row['params'])
+                if row['error'] is None:
+                    del row['error']
+                yield row
+
+    def open(self) -> None:
+        import pyarrow.parquet as pq
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        part = self.path / f"part-{len(list(self.path.glob('part-*.parquet'))):05d}.parquet"
+        self._writer = pq.ParquetWriter(str(part), self.schema)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if 'pages' in record:
+            rooms = [page.get('rooms', []) for page in record['pages']]
+            room_count = sum(len(page) for page in rooms)
+        else:
+            rooms = record.get('rooms', [])
+            room_count = len(rooms)
+        self._buffer.append({
+            'path': record['path'],
+            'model_version': record['model_version'],
+            'params': json.dumps(record['params'], sort_keys=True),
+            'room_count': room_count if 'error' not in record else None,
+            'rooms': json.dumps(rooms) if 'error' not in record else None,
+            'processing_time_ms': record['processing_time_ms'],
+            'error': record.get('error'),
+            'message': record.get('message'),
+        })
+        if len(self._buffer) >= self.row_group:
+            self._flush()
+
+    def _flush(self) -> None:
+        import pyarrow as pa
+
+        if self._buffer:
+            self._writer.write_table(pa.Table.from_pylist(self._buffer, schema=self.schema))
+            self._buffer = []
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+def already_done(writer: Any) -> Set[str]:
+    """
+    Paths with a successful record for the current detector
+
+    Args:
+        writer: Output writer
+
+    Returns:
+        Set of recorded paths to skip
+    """
+    params = detection_params()
+    return {
+        record['path'] for record in writer.completed()
+        if 'error' not in record
+        and record.get('model_version') == MODEL_VERSION
+        and record.get('params') == params
+    }
+
+
+def run(
+    files: Iterator[Tuple[str, Path]],
+    writer: Any,
+    workers: int,
+    max_in_flight: int,
+    skip: Set[str]
+) -> Dict[str, int]:
+    """
+    Process files in a pool, keeping at most max_in_flight submitted at once
+
+    Args:
+        files: (recorded path, file path) pairs
+        writer: Opened output writer
+        workers: Worker processes
+        max_in_flight: Files submitted but not yet written
+        skip: Recorded paths to skip
+
+    Returns:
+        Counts of processed, failed and skipped files
+    """
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0}
+    start_time = time.time()
+    in_flight = set()
+
+    def collect(done) -> None:
+        for future in done:
+            record = future.result()
+            writer.write(record)
+            counts['processed'] += 1
+            if 'error' in record:
+                counts['failed'] += 1
+                logger.warning(f"{record['path']}: {record['message']}")
+            if counts['processed'] % PROGRESS_EVERY == 0:
+                rate = counts['processed'] / (time.time() - start_time)
+                logger.info(f"{counts['processed']} files ({counts['failed']} failed), {rate:.1f} files/s")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        try:
+            for key, path in files:
+                if key in skip:
+                    counts['skipped'] += 1
+                    continue
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(process_file, key, str(path)))
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        except KeyboardInterrupt:
+            # Keep what finished; the next run resumes from there
+            for future in in_flight:
+                future.cancel()
+            raise
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the OpenCV room detector over many blueprints')
+    parser.add_argument('input', nargs='?', type=Path, help='Directory to walk')
+    parser.add_argument('--manifest', type=Path, help='File listing one blueprint path per line')
+    parser.add_argument('--output', type=Path, required=True,
+                        help='JSONL file, or directory of Parquet part files')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=None,
+                        help='Output format (default: from the output suffix)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='Files queued at once (default: 2 per worker)')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Process every file even if the output already has it')
+    args = parser.parse_args()
+
+    if (args.input is None) == (args.manifest is None):
+        parser.error('give either an input directory or --manifest')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.INFO)
+
+    output_format = args.format or ('parquet' if args.output.suffix == '.parquet' else 'jsonl')
+    writer = ParquetWriter(args.output) if output_format == 'parquet' else JsonlWriter(args.output)
+
+    skip = set() if args.no_resume else already_done(writer)
+    if skip:
+        logger.info(f"Resuming: {len(skip)} files already done")
+
+    files = iter_directory(args.input) if args.input else iter_manifest(args.manifest)
+    max_in_flight = args.max_in_flight or args.workers * 2
+
+    writer.open()
+    start_time = time.time()
+    try:
+        counts = run(files, writer, args.workers, max_in_flight, skip)
+    except KeyboardInterrupt:
+        logger.warning('Interrupted; re-run the same command to resume')
+        sys.exit(130)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start_time
+    logger.info(f"Done in {elapsed:.1f}s: {counts['processed']} processed, {counts['failed']} failed, "
+                f"{counts['skipped']} skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,440 +2,2117 @@
 Room detection Lambda function - Phase 1: OpenCV-based detection
 Detects room boundaries from architectural blueprints using traditional computer vision
 """
+from __future__ import annotations  # Annotations stay strings, so np.ndarray needs no import
+
+import time
+_module_start = time.perf_counter()
+
+import os
+import sys
 import json
-import base64
+import binascii
 import logging
-from typing import List, Tuple, Dict, Any
-import cv2
-import numpy as np
+import math
+import random
+import importlib
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional, Iterator, Callable
 from io import BytesIO
-from PIL import Image
+
+# Modules shared with the YOLO service live in backend/shared; the image copies them next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+
+from pdf_pages import PdfPages, PDF_DPI, PDF_MAX_SIDE, NDJSON_MEDIA_TYPE, is_pdf
+from result_cache import MemoryTier, cache_from_env, make_cache_key
+from room_encoding import ROOMS_MEDIA_TYPE, accepts_binary, encode_rooms
+from zip_uploads import BATCH_MAX_IMAGES, is_zip, open_zip_images
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+# Container init breakdown in ms, logged once and returned as X-Init-Timings on the first response
+INIT_TIMINGS: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access"""
+    
+    def __init__(self, name: str, alias: str):
+        """
+        Args:
+            name: Module to import
+            alias: Global name in this module; rebound to the real module once loaded
+        """
+        self._name = name
+        self._alias = alias
+        self._module = None
+    
+    def load(self) -> Any:
+        """Import the module (once) and record how long it took"""
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            INIT_TIMINGS[f'import_{self._alias}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            globals()[self._alias] = self._module  # Later lookups skip the proxy
+        return self._module
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+
+cv2 = LazyModule('cv2', 'cv2')
+np = LazyModule('numpy', 'np')
+Image = LazyModule('PIL.Image', 'Image')
 
 # Constants
+MODEL_VERSION = 'phase_1_opencv'  # Part of result cache keys; bump when output changes
 NORMALIZED_RANGE = 1000
 MIN_ROOM_AREA = 5000  # Minimum area in pixels to be considered a room
 MAX_ROOM_AREA = 500000  # Maximum area to filter out full-blueprint detections
 CONFIDENCE_BASE = 0.7  # Base confidence for OpenCV detections
+IOU_MERGE_THRESHOLD = 0.3  # IoU above which overlapping rooms are merged
+NMS_PAIR_CHUNK = 1_000_000  # Max candidate box pairs scored per NumPy batch
+CLAHE_TILE_GRID = (8, 8)  # CLAHE grid (columns, rows) over the whole image
+CLAHE_CLIP_LIMIT = 2.0
+MORPH_KERNEL_SIZE = 5  # Square structuring element side for closing edge gaps
+FIXED_CANNY_THRESHOLDS = (50, 150)  # Canny hysteresis thresholds without adaptive edges
+
+# Adaptive edges: Canny thresholds from the median intensity, kernel from the resolution
+ADAPTIVE_EDGES = os.getenv('ROOM_DETECTOR_ADAPTIVE_EDGES', '1') == '1'
+CANNY_SIGMA = 0.33  # Thresholds at (1 - sigma) and (1 + sigma) times the median
+INK_CONTRAST_GAIN = 2.0  # Upper threshold cap, in multiples of the paper-to-ink contrast
+EDGE_REFERENCE_SIDE = 1000  # Longest side at which the kernel is MORPH_KERNEL_SIZE
+EDGE_KERNEL_RANGE = (3, 9)  # Smallest and largest adaptive kernel side
+MIN_INK_CONTRAST = 16  # Paper-to-ink contrast (see intensity_levels) below which a page is blank
+
+# Room geometry: 'box' reports axis-aligned boxes only; 'obb' (minimum-area rotated
+# rectangle) and 'polygon' (approximated contour) add a flat [x1, y1, x2, y2, ...]
+# 'polygon' per room and merge overlapping rooms by the IoU of those shapes
+GEOMETRY_MODES = ('box', 'obb', 'polygon')
+ROOM_GEOMETRY = os.getenv('ROOM_DETECTOR_GEOMETRY', 'box')
+
+# Imports and shared objects are built during the Lambda init phase, which runs
+# with boosted CPU. ROOM_DETECTOR_LAZY_INIT=1 defers them to the first request
+# that needs them, for the fastest possible init (e.g. cache-hit heavy traffic).
+LAZY_INIT = os.getenv('ROOM_DETECTOR_LAZY_INIT', '0') == '1'
+
+# Tiled execution for very large scans (0 disables tiling / uses all cores)
+TILE_SIZE = int(os.getenv('ROOM_DETECTOR_TILE_SIZE', '0'))
+TILE_WORKERS = int(os.getenv('ROOM_DETECTOR_TILE_WORKERS', '0'))
+TILE_OVERLAP = 32  # Pixels of context around each tile; covers Canny + morphology reach
+
+# Coarse-to-fine pyramid mode (0 disables; e.g. 0.25 finds candidates at quarter size)
+PYRAMID_SCALE = float(os.getenv('ROOM_DETECTOR_PYRAMID_SCALE', '0'))
+PYRAMID_REFINE = os.getenv('ROOM_DETECTOR_PYRAMID_REFINE', '1') == '1'
+PYRAMID_MARGIN = 0.1  # Fraction of a candidate's size added around its refine region
+PYRAMID_MATCH_IOU = 0.5  # Min IoU between a refined contour and its coarse candidate
+
+# Incremental re-detection of an edited sheet: only the changed region is re-run
+INCREMENTAL_MARGIN = 32  # Pixels of context around the edit; covers blur + morphology reach
+INCREMENTAL_DIFF_THRESHOLD = 32  # Gray-level change that counts as an edit (above JPEG noise)
+INCREMENTAL_MAX_FRACTION = 0.5  # Larger affected regions are cheaper to re-detect in full
+PRIOR_IMAGES = int(os.getenv('ROOM_DETECTOR_PRIOR_IMAGES', '0'))  # Uploads kept for diffing (0: dirty rects only)
+
+# Per-contour log lines: always at DEBUG, otherwise for this fraction of contour searches
+CONTOUR_LOG_SAMPLE_RATE = float(os.getenv('CONTOUR_LOG_SAMPLE_RATE', '0'))
+
+# CloudWatch embedded metric format namespace for per-request stage metrics
+# ('' disables; on by default only when running in Lambda)
+METRICS_NAMESPACE = os.getenv(
+    'METRICS_NAMESPACE', 'RoomDetection' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else ''
+)
+
+# Decode size cap (0 keeps full resolution); larger scans are decoded reduced, JPEGs in the DCT domain
+MAX_IMAGE_SIDE = int(os.getenv('ROOM_DETECTOR_MAX_SIDE', '0'))
+PAPER_WHITE = 255  # Background transparent pixels are composited onto
+ALPHA_MODES = ('RGBA', 'RGBa', 'LA', 'La', 'PA')
+GRAYSCALE_DECODE_FLAGS = {  # JPEG reduction factor -> cv2 imdecode flag name
+    1: 'IMREAD_GRAYSCALE',
+    2: 'IMREAD_REDUCED_GRAYSCALE_2',
+    4: 'IMREAD_REDUCED_GRAYSCALE_4',
+    8: 'IMREAD_REDUCED_GRAYSCALE_8',
+}
+
+# Batch requests (/detect/batch or a ZIP upload): images detected in parallel (0 uses all cores)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '0'))
+
+# Presigned uploads: clients PUT to S3 and post {"key": ...} instead of the image
+S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', '')
+UPLOAD_KEY_PREFIX = 'uploads/'  # Keys handed out by the upload-url endpoint
+s3_client = None  # Created on first presigned request
+
+# Detection results cached across warm invocations (see result_cache.py)
+_cache_start = time.perf_counter()
+result_cache = cache_from_env()
+INIT_TIMINGS['result_cache_ms'] = round((time.perf_counter() - _cache_start) * 1000, 1)
+
+# Recent uploads by result cache key, so an edited re-submission can be diffed against them
+prior_images = MemoryTier(max_entries=PRIOR_IMAGES) if PRIOR_IMAGES and result_cache else None
+
+# Per-contour feature record, computed once and shared by every pipeline stage
+# (a NumPy dtype spec; plain type codes so defining it does not import NumPy)
+CONTOUR_FEATURE_DTYPE = [
+    ('area', 'f8'),          # Polygon area
+    ('perimeter', 'f8'),     # Closed arc length
+    ('x', 'i4'),             # Bounding rect origin and size
+    ('y', 'i4'),
+    ('w', 'i4'),
+    ('h', 'i4'),
+    ('hull_area', 'f8'),     # Convex hull area
+    ('num_vertices', 'i4'),  # Vertices of the approximated polygon
+]
+
+
+def load_grayscale(image_bytes: bytes, max_side: int = 0) -> np.ndarray:
+    """
+    Decode an uploaded image straight into 8-bit grayscale
+    
+    Opaque images are decoded by OpenCV directly to one 8-bit channel; JPEGs
+    as luminance only, and at a reduced DCT scale when max_side asks for a
+    smaller image. Images with transparency are composited onto white paper.
+    
+    Args:
+        image_bytes: Image file as bytes or a memoryview
+        max_side: Longest side of the returned image (0 keeps full resolution)
+        
+    Returns:
+        Grayscale uint8 image
+    """
+    image = Image.open(BytesIO(image_bytes))  # Reads the header only
+    width, height = image.size
+    scale = max_side / max(width, height) if max_side and max(width, height) > max_side else 1.0
+    gray = None
+    
+    if image.mode not in ALPHA_MODES and 'transparency' not in image.info:
+        # Largest libjpeg reduction that still covers the requested size
+        reduction = 1
+        if image.format == 'JPEG':
+            while reduction < 8 and scale * reduction * 2 <= 1:
+                reduction *= 2
+        flag = getattr(cv2, GRAYSCALE_DECODE_FLAGS[reduction])
+        gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+    
+    if gray is None:
+        # Transparency, or a format OpenCV cannot read: decode with Pillow
+        if image.mode.startswith('I'):
+            # 16-bit samples: keep the high byte (Pillow would clip them to 255)
+            image = Image.fromarray((np.asarray(image, dtype=np.uint32) >> 8).astype(np.uint8))
+        image = image.convert('LA') if image.mode in ('L', 'LA', 'La') else image.convert('RGBA')
+        paper = Image.new('L', image.size, PAPER_WHITE)
+        paper.paste(image.convert('L'), mask=image.getchannel('A'))
+        gray = np.asarray(paper)
+    del image
+    
+    # Finish reductions that the decoder could not do exactly
+    if scale < 1.0:
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if gray.shape[1] > target[0]:
+            gray = cv2.resize(gray, target, interpolation=cv2.INTER_AREA)
+    
+    return gray
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """
+    Convert image to single-channel grayscale if needed
+    
+    Args:
+        image: Input image as numpy array
+        
+    Returns:
+        Grayscale image
+    """
+    if len(image.shape) == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+class DetectionStats:
+    """
+    Stage timings and counters for one request
+    
+    Stages and counters accumulate, so a request covering several images or
+    pages (in parallel threads) reports per-stage totals across all of them.
+    """
+    
+    def __init__(self):
+        self.timings_ms: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.timings_ms[name] = self.timings_ms.get(name, 0.0) + elapsed
+    
+    def count(self, name: str, value: int = 1) -> None:
+        """Add value to counter name"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Timings (ms, rounded) and counters, as returned with ?stats=1"""
+        with self._lock:
+            return {
+                'timings_ms': {name: round(ms, 2) for name, ms in self.timings_ms.items()},
+                'counters': dict(self.counters),
+            }
+
+
+def emit_metrics(stats: DetectionStats, route: str) -> None:
+    """
+    Write a request's stats to CloudWatch as an embedded metric format record
+    
+    Lambda forwards stdout to CloudWatch Logs, which extracts the metrics;
+    no API calls are made on the request path.
+    
+    Args:
+        stats: Request stats
+        route: Metric dimension (detect, pdf or batch)
+    """
+    if not METRICS_NAMESPACE:
+        return
+    
+    values = stats.as_dict()
+    metrics = [{'Name': f'{name}_ms', 'Unit': 'Milliseconds'} for name in values['timings_ms']]
+    metrics += [{'Name': name, 'Unit': 'Count'} for name in values['counters']]
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Route']],
+                'Metrics': metrics,
+            }],
+        },
+        'Route': route,
+        'ModelVersion': MODEL_VERSION,
+        **{f'{name}_ms': ms for name, ms in values['timings_ms'].items()},
+        **values['counters'],
+    }
+    print(json.dumps(record), flush=True)
+
+
+_thread_state = threading.local()
+
+
+def get_clahe(tile_grid_size: Tuple[int, int] = CLAHE_TILE_GRID) -> Any:
+    """
+    CLAHE instance for a tile grid, created once per thread
+    
+    CLAHE objects keep working buffers, so threads (batch workers) get their own.
+    
+    Args:
+        tile_grid_size: CLAHE grid (columns, rows)
+        
+    Returns:
+        cv2.CLAHE
+    """
+    instances = getattr(_thread_state, 'clahe', None)
+    if instances is None:
+        instances = _thread_state.clahe = {}
+    clahe = instances.get(tile_grid_size)
+    if clahe is None:
+        clahe = instances[tile_grid_size] = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=tile_grid_size)
+    return clahe
+
+
+@lru_cache(maxsize=None)
+def morph_kernel(size: int = MORPH_KERNEL_SIZE) -> np.ndarray:
+    """Shared square structuring element for edge morphology (read-only)"""
+    kernel = np.ones((size, size), np.uint8)
+    kernel.flags.writeable = False
+    return kernel
+
+
+def initialize() -> Dict[str, float]:
+    """
+    Import the image libraries and build shared objects, once per container
+    
+    Returns:
+        INIT_TIMINGS
+    """
+    if 'initialize_ms' not in INIT_TIMINGS:
+        start = time.perf_counter()
+        for module in (np, cv2, Image):
+            if isinstance(module, LazyModule):
+                module.load()
+        
+        resources_start = time.perf_counter()
+        morph_kernel()
+        morph_kernel(2 * MORPH_KERNEL_SIZE - 1)
+        get_clahe(CLAHE_TILE_GRID)
+        INIT_TIMINGS['resources_ms'] = round((time.perf_counter() - resources_start) * 1000, 1)
+        INIT_TIMINGS['initialize_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return INIT_TIMINGS
+
+
+def preprocess_image(
+    image: np.ndarray,
+    tile_grid_size: Tuple[int, int] = CLAHE_TILE_GRID
+) -> np.ndarray:
+    """
+    Preprocess blueprint image for better edge detection
+    
+    Args:
+        image: Input image as numpy array
+        tile_grid_size: CLAHE grid (columns, rows)
+        
+    Returns:
+        Preprocessed grayscale image
+    """
+    # Convert to grayscale if needed
+    gray = to_grayscale(image)
+    
+    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
+    enhanced = get_clahe(tile_grid_size).apply(gray)
+    
+    # Apply Gaussian blur to reduce noise
+    blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
+    
+    return blurred
+
+
+def intensity_levels(image: np.ndarray) -> Tuple[int, int]:
+    """
+    Paper and ink levels of a grayscale image from one 256-bin histogram
+    
+    The paper is the median. The ink is whichever of the 1st and 99th
+    percentiles lies further from it, so light lines on a dark sheet
+    (inverted prints, negatives) count as ink as well as dark ones on white.
+    
+    Args:
+        image: Grayscale uint8 image
+        
+    Returns:
+        Tuple of (median intensity, ink intensity)
+    """
+    cumulative = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel().cumsum()
+    median = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+    dark = int(np.searchsorted(cumulative, cumulative[-1] / 100))
+    light = int(np.searchsorted(cumulative, cumulative[-1] * 99 / 100))
+    return median, dark if median - dark >= light - median else light
+
+
+def is_blank(image: np.ndarray) -> bool:
+    """True when nothing on the image differs from the paper by MIN_INK_CONTRAST"""
+    median, ink = intensity_levels(image)
+    return abs(median - ink) < MIN_INK_CONTRAST
+
+
+def edge_parameters(
+    image: np.ndarray,
+    image_side: Optional[int] = None
+) -> Optional[Tuple[float, float, int]]:
+    """
+    Derive Canny thresholds and the closing kernel from the image itself
+    
+    The thresholds bracket the median intensity (the paper, on a blueprint),
+    with the upper one capped at INK_CONTRAST_GAIN times the paper-to-ink
+    contrast so faint pencil scans still produce edges. On light-on-dark
+    sheets the median is measured down from white, so an inverted print
+    gets the thresholds of the original (Canny's gradients are the same for
+    both). The kernel scales with resolution, so gaps are closed at the
+    same physical size whatever the scan DPI.
+    
+    Args:
+        image: Preprocessed grayscale image
+        image_side: Longest side of the whole image when image is a tile or
+            region (None uses image itself)
+        
+    Returns:
+        Tuple of (low threshold, high threshold, kernel side), or None when
+        the image is blank
+    """
+    median, ink = intensity_levels(image)
+    contrast = abs(median - ink)
+    if contrast < MIN_INK_CONTRAST:
+        return None
+    
+    paper = median if ink < median else 255 - median
+    high = min(255.0, (1 + CANNY_SIGMA) * paper, INK_CONTRAST_GAIN * contrast)
+    low = min((1 - CANNY_SIGMA) * paper, high / 2)
+    
+    side = image_side or max(image.shape[:2])
+    smallest, largest = EDGE_KERNEL_RANGE
+    kernel_size = int(MORPH_KERNEL_SIZE * side / EDGE_REFERENCE_SIDE) | 1  # Odd, so it stays centered
+    return low, high, min(max(kernel_size, smallest), largest)
+
+
+def edge_settings(
+    image: np.ndarray,
+    adaptive: bool = False,
+    image_side: Optional[int] = None
+) -> Optional[Tuple[float, float, int]]:
+    """
+    Canny thresholds and closing kernel side used by detect_edges
+    
+    Args:
+        image: Preprocessed grayscale image
+        adaptive: See detect_edges
+        image_side: See detect_edges
+        
+    Returns:
+        Tuple of (low threshold, high threshold, kernel side), or None when
+        adaptive edges find the image blank
+    """
+    if adaptive:
+        return edge_parameters(image, image_side)
+    
+    # Fixed thresholds that work well for most floor plans
+    # Lower threshold: 50 (detects weaker edges)
+    # Upper threshold: 150 (strong edges)
+    low, high = FIXED_CANNY_THRESHOLDS
+    return low, high, MORPH_KERNEL_SIZE
+
+
+def close_edges(edges: np.ndarray, kernel_size: int) -> np.ndarray:
+    """
+    Close gaps and strengthen edges
+    
+    The original sequence (dilate twice, erode, then close = dilate + erode,
+    all k x k) is one dilation by (2k - 1) x (2k - 1) followed by one k x k
+    erosion: two dilations by a square are one by the larger square, and an
+    opening by k leaves an image that was just dilated by k unchanged. Two
+    passes instead of six.
+    
+    Args:
+        edges: Binary edge image
+        kernel_size: Side k of the square structuring element
+        
+    Returns:
+        Closed binary edge image
+    """
+    edges = cv2.dilate(edges, morph_kernel(2 * kernel_size - 1))
+    return cv2.erode(edges, morph_kernel(kernel_size))
+
+
+def detect_edges(
+    image: np.ndarray,
+    adaptive: bool = False,
+    image_side: Optional[int] = None
+) -> np.ndarray:
+    """
+    Detect edges using Canny edge detector
+    
+    Args:
+        image: Preprocessed grayscale image
+        adaptive: Derive thresholds and kernel from the image (see
+            edge_parameters) instead of the fixed 50/150 and 5x5
+        image_side: Longest side of the whole image when image is a tile or region
+        
+    Returns:
+        Binary edge image
+    """
+    settings = edge_settings(image, adaptive, image_side)
+    if settings is None:
+        # Blank image or region (e.g. a margin): no edges, skip Canny and morphology
+        return np.zeros_like(image)
+    low, high, kernel_size = settings
+    
+    edges = cv2.Canny(image, low, high)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Edge detection complete (thresholds {low:.0f}/{high:.0f}, kernel {kernel_size}), "
+                     f"edge pixels: {np.count_nonzero(edges)}")
+    
+    return close_edges(edges, kernel_size)
+
+
+def scaled_clahe_grid(
+    region_shape: Tuple[int, int],
+    image_shape: Tuple[int, int]
+) -> Tuple[int, int]:
+    """
+    CLAHE grid for a sub-region that keeps cells the size they have on the full image
+    
+    Args:
+        region_shape: Sub-region shape (height, width)
+        image_shape: Full image shape (height, width)
+        
+    Returns:
+        CLAHE grid (columns, rows)
+    """
+    grid_cols, grid_rows = CLAHE_TILE_GRID
+    return (
+        max(1, round(grid_cols * region_shape[1] / image_shape[1])),
+        max(1, round(grid_rows * region_shape[0] / image_shape[0])),
+    )
+
+
+def iter_tiles(
+    shape: Tuple[int, int],
+    tile_size: int,
+    overlap: int = TILE_OVERLAP
+):
+    """
+    Split an image into tiles with overlapping context
+    
+    Args:
+        shape: Image shape (height, width)
+        tile_size: Side length of each tile's core region
+        overlap: Extra context pixels on every side of a core
+        
+    Yields:
+        Tuples of (core, padded) slices as (row slice, column slice)
+    """
+    height, width = shape
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            core = (slice(y0, y1), slice(x0, x1))
+            padded = (
+                slice(max(0, y0 - overlap), min(height, y1 + overlap)),
+                slice(max(0, x0 - overlap), min(width, x1 + overlap)),
+            )
+            yield core, padded
+
+
+def detect_edges_tiled(
+    image: np.ndarray,
+    tile_size: int,
+    workers: Optional[int] = None,
+    overlap: int = TILE_OVERLAP,
+    adaptive: bool = False
+) -> np.ndarray:
+    """
+    Run detect_edges tile by tile in a thread pool, with the same result
+    
+    Thresholds come from the whole image. Canny's gradients and non-maximum
+    suppression only look a couple of pixels around each pixel, but its
+    hysteresis follows weak edges any distance from a strong one. So each
+    tile finds its weak and strong pixels, runs hysteresis within its core,
+    and where a weak chain crosses a seam into an edge the tile could not
+    see, the chain is flood-filled on the stitched map. The closing morphology then
+    runs per tile. Every per-tile step reaches less than the overlap, so the
+    result matches the untiled edge map pixel for pixel.
+    
+    Args:
+        image: Preprocessed grayscale image (see preprocess_image)
+        tile_size: Side length of each tile's core region
+        workers: Thread count (None or 0 uses every core)
+        overlap: Extra context pixels on every side of a tile
+        adaptive: See detect_edges
+        
+    Returns:
+        Binary edge image with the same shape as image
+    """
+    settings = edge_settings(image, adaptive)
+    if settings is None:
+        return np.zeros_like(image)
+    low, high, kernel_size = settings
+    
+    tiles = list(iter_tiles(image.shape, tile_size, overlap))
+    logger.info(f"Tiled edge detection: {len(tiles)} tiles of {tile_size}px, overlap {overlap}px")
+    
+    def core_of(tile_result, core, padded):
+        rows, cols = padded
+        return tile_result[
+            core[0].start - rows.start:core[0].stop - rows.start,
+            core[1].start - cols.start:core[1].stop - cols.start,
+        ]
+    
+    # Edge pixels are 255, weak pixels the tile's hysteresis did not reach 1
+    state = np.empty_like(image)
+    
+    def canny_tile(core, padded):
+        tile = image[padded]
+        # Canny with equal thresholds is non-maximum suppression plus one threshold
+        weak = core_of(cv2.Canny(tile, low, low), core, padded)
+        strong = core_of(cv2.Canny(tile, high, high), core, padded)
+        
+        # Hysteresis within the core (the padding's own hysteresis would start
+        # from gradients distorted by the tile border): weak chains holding a
+        # strong pixel are edges
+        count, labels = cv2.connectedComponents(weak, connectivity=8)
+        chain_is_edge = np.zeros(count, np.uint8)
+        chain_is_edge[labels[strong > 0]] = 255
+        chain_is_edge[0] = 0
+        state[core] = np.maximum(chain_is_edge[labels], weak >> 7)
+    
+    edges = np.empty_like(image)
+    
+    def close_tile(core, padded):
+        tile_edges = cv2.compare(state[padded], 255, cv2.CMP_EQ)
+        edges[core] = core_of(close_edges(tile_edges, kernel_size), core, padded)
+    
+    # OpenCV releases the GIL, so threads run tiles in parallel without copying them
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for future in [pool.submit(canny_tile, core, padded) for core, padded in tiles]:
+            future.result()
+        
+        # Finish hysteresis across seams: an edge pixel next to a weak one
+        # can only be in another tile, and the weak one's whole chain is an edge
+        height, width = image.shape
+        seeds = []
+        for x in range(tile_size, width, tile_size):
+            seeds += [(x, y) for y in seam_seeds(state[:, x - 1], state[:, x])]
+            seeds += [(x - 1, y) for y in seam_seeds(state[:, x], state[:, x - 1])]
+        for y in range(tile_size, height, tile_size):
+            seeds += [(x, y) for x in seam_seeds(state[y - 1], state[y])]
+            seeds += [(x, y - 1) for x in seam_seeds(state[y], state[y - 1])]
+        for seed in seeds:
+            if state[seed[1], seed[0]] == 1:
+                cv2.floodFill(state, None, seed, 255, 0, 0, 8)
+        
+        for future in [pool.submit(close_tile, core, padded) for core, padded in tiles]:
+            future.result()
+    
+    return edges
+
+
+def seam_seeds(edge_side: np.ndarray, weak_side: np.ndarray) -> np.ndarray:
+    """
+    Weak pixels on one side of a seam touching an edge pixel on the other
+    
+    Args:
+        edge_side: Row or column of the tile state map on one side
+        weak_side: Adjacent row or column on the other side
+        
+    Returns:
+        Indices into weak_side, 8-connected to an edge pixel in edge_side
+    """
+    edge = edge_side == 255
+    touching = edge.copy()
+    touching[1:] |= edge[:-1]
+    touching[:-1] |= edge[1:]
+    return np.flatnonzero((weak_side == 1) & touching)
+
+
+def room_area_limits(image_shape: Tuple[int, int]) -> Tuple[float, float]:
+    """
+    Contour area range accepted as a room for an image size
+    
+    Args:
+        image_shape: Image shape (height, width)
+        
+    Returns:
+        Tuple of (min_area, max_area) in pixels
+    """
+    height, width = image_shape
+    image_area = height * width
+    
+    # Calculate dynamic area thresholds based on image size
+    # For a 3000x3000 image, min_area = 50,000 (about 224x224px)
+    # This scales with image size
+    min_area = max(MIN_ROOM_AREA, image_area * 0.005)  # At least 0.5% of image
+    max_area = min(MAX_ROOM_AREA, image_area * 0.4)    # At most 40% of image
+    
+    return min_area, max_area
+
+
+def find_room_contours(
+    edges: np.ndarray,
+    original_shape: Tuple[int, int],
+    area_limits: Optional[Tuple[float, float]] = None,
+    stats: Optional[DetectionStats] = None
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Find room contours from edge image
+    
+    Args:
+        edges: Binary edge image
+        original_shape: Original image shape (height, width)
+        area_limits: (min_area, max_area) override, e.g. for downscaled or cropped edges
+        stats: Counts contours_found and contours_kept when given
+        
+    Returns:
+        Tuple of (approximated room polygons, CONTOUR_FEATURE_DTYPE feature table)
+    """
+    # Find all contours (not just external ones)
+    # This is important for colored floor plans where rooms are filled regions
+    # Tracing dominates this stage; connected-component stats with a bulk area
+    # filter, and pruning small subtrees of the hierarchy, both measured no faster
+    # (benchmarks/bench_contours.py)
+    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    logger.debug(f"Found {len(contours)} total contours before filtering")
+    
+    # Filter contours by area
+    valid_contours = []
+    height, width = original_shape
+    image_area = height * width
+    min_area, max_area = area_limits or room_area_limits(original_shape)
+    
+    logger.debug(f"Area thresholds: min={min_area:.0f}, max={max_area:.0f}, image_area={image_area}")
+    
+    # Per-contour lines cost more than the filtering itself on dense plans, so they are opt-in
+    log_contours = logger.isEnabledFor(logging.DEBUG) or random.random() < CONTOUR_LOG_SAMPLE_RATE
+    
+    for idx, contour in enumerate(contours):
+        area = cv2.contourArea(contour)
+        
+        # Filter by area constraints
+        if min_area < area < max_area:
+            # Approximate contour to reduce vertices
+            epsilon = 0.02 * cv2.arcLength(contour, True)
+            approx = cv2.approxPolyDP(contour, epsilon, True)
+            
+            # Log the contour for debugging
+            if log_contours:
+                logger.info(f"Valid contour {idx}: area={area:.0f}, vertices={len(approx)}")
+            valid_contours.append(approx)
+    
+    logger.debug(f"Filtered to {len(valid_contours)} valid contours")
+    if stats is not None:
+        stats.count('contours_found', len(contours))
+        stats.count('contours_kept', len(valid_contours))
+    return valid_contours, extract_contour_features(valid_contours)
+
+
+def extract_contour_features(contours: List[np.ndarray]) -> np.ndarray:
+    """
+    Measure every contour once into a structured feature table
+    
+    Args:
+        contours: Approximated room polygons
+        
+    Returns:
+        Array of CONTOUR_FEATURE_DTYPE records, one per contour
+    """
+    features = np.zeros(len(contours), dtype=CONTOUR_FEATURE_DTYPE)
+    
+    for idx, contour in enumerate(contours):
+        record = features[idx]
+        record['area'] = cv2.contourArea(contour)
+        record['perimeter'] = cv2.arcLength(contour, True)
+        record['x'], record['y'], record['w'], record['h'] = cv2.boundingRect(contour)
+        record['hull_area'] = cv2.contourArea(cv2.convexHull(contour))
+        record['num_vertices'] = len(contour)
+    
+    return features
+
+
+def box_iou(
+    box_a: Tuple[int, int, int, int],
+    box_b: Tuple[int, int, int, int]
+) -> float:
+    """
+    Intersection over Union of two boxes
+    
+    Args:
+        box_a: Box (x_min, y_min, x_max, y_max)
+        box_b: Box (x_min, y_min, x_max, y_max)
+        
+    Returns:
+        IoU (0-1), 0 when the boxes do not overlap
+    """
+    inter_w = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    inter_h = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    
+    inter_area = inter_w * inter_h
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union_area = area_a + area_b - inter_area
+    
+    return inter_area / union_area if union_area > 0 else 0.0
+
+
+def find_room_contours_pyramid(
+    gray: np.ndarray,
+    scale: float,
+    refine: bool = True,
+    margin: float = PYRAMID_MARGIN,
+    stats: Optional[DetectionStats] = None,
+    adaptive: bool = False
+) -> Tuple[List[np.ndarray], np.ndarray]:
+    """
+    Coarse-to-fine room search: find candidates on a downscaled image,
+    then re-detect each candidate region at full resolution
+    
+    Args:
+        gray: Full-resolution grayscale image
+        scale: Downscale factor for the coarse pass (0-1)
+        refine: Re-detect candidates at full resolution (False returns the
+            upscaled coarse contours, trading accuracy for latency)
+        margin: Fraction of a candidate's size added around its refine region
+        stats: Contour counters (summed over the coarse and refine passes)
+        adaptive: Adaptive edges, with the kernel sized for each pass's resolution
+        
+    Returns:
+        Tuple of (room polygons, feature table) in full-resolution pixels
+    """
+    height, width = gray.shape
+    min_area, max_area = room_area_limits(gray.shape)
+    
+    # Coarse pass on the downscaled image, with area limits scaled to match
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    small_edges = detect_edges(preprocess_image(small), adaptive)
+    coarse, _ = find_room_contours(
+        small_edges, small.shape, (min_area * scale * scale, max_area * scale * scale), stats
+    )
+    
+    # Map coarse polygons back to full-resolution pixels
+    fx, fy = width / small.shape[1], height / small.shape[0]
+    coarse = [
+        np.round(contour * (fx, fy)).astype(np.int32) for contour in coarse
+    ]
+    logger.info(f"Pyramid coarse pass at scale {scale}: {len(coarse)} candidates")
+    if stats is not None:
+        stats.count('pyramid_candidates', len(coarse))
+    
+    if not refine:
+        return coarse, extract_contour_features(coarse)
+    
+    refined = []
+    for candidate in coarse:
+        x, y, w, h = cv2.boundingRect(candidate)
+        pad_x, pad_y = int(w * margin) + 1, int(h * margin) + 1
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+        
+        # Re-detect inside the candidate's region only, with full-image limits
+        region = gray[y0:y1, x0:x1]
+        region_edges = detect_edges(
+            preprocess_image(region, scaled_clahe_grid(region.shape, gray.shape)), adaptive, max(gray.shape)
+        )
+        contours, features = find_room_contours(region_edges, region.shape, (min_area, max_area), stats)
+        
+        # Keep the refined contour that best matches the candidate, if any
+        best, best_iou = None, PYRAMID_MATCH_IOU
+        target = (x - x0, y - y0, x - x0 + w, y - y0 + h)
+        for contour, record in zip(contours, features):
+            rx, ry, rw, rh = (int(record[field]) for field in ('x', 'y', 'w', 'h'))
+            iou = box_iou((rx, ry, rx + rw, ry + rh), target)
+            if iou > best_iou:
+                best, best_iou = contour, iou
+        
+        refined.append(candidate if best is None else best + (x0, y0))
+    
+    return refined, extract_contour_features(refined)
+
+
+def contour_to_bounding_box(contour: np.ndarray) -> Tuple[int, int, int, int]:
+    """
+    Convert contour to bounding box
+    
+    Args:
+        contour: Contour as numpy array
+        
+    Returns:
+        Tuple of (x_min, y_min, x_max, y_max)
+    """
+    x, y, w, h = cv2.boundingRect(contour)
+    return (x, y, x + w, y + h)
+
+
+def score_contour_features(features: np.ndarray) -> np.ndarray:
+    """
+    Calculate detection confidence for a whole feature table at once
+    
+    Args:
+        features: Array of CONTOUR_FEATURE_DTYPE records
+        
+    Returns:
+        Confidence scores (0-1), one per record
+    """
+    area = features['area']
+    w = features['w'].astype(np.float64)
+    h = features['h'].astype(np.float64)
+    hull_area = features['hull_area']
+    num_vertices = features['num_vertices']
+    bounding_box_area = w * h
+    
+    # Start with base confidence
+    confidence = np.full(len(features), 0.5)
+    
+    # 1. Shape Quality (0-0.25)
+    # Rooms should fill their bounding box well; extent close to 1.0 means rectangular
+    extent = np.divide(area, bounding_box_area, out=np.zeros_like(area), where=bounding_box_area > 0)
+    confidence += np.where(
+        bounding_box_area > 0,
+        np.select([extent > 0.85, extent > 0.70, extent > 0.55], [0.25, 0.20, 0.15], 0.05),
+        0.0,
+    )
+    
+    # 2. Convexity (0-0.15)
+    # Rooms should be mostly convex (no major indentations)
+    solidity = np.divide(area, hull_area, out=np.zeros_like(area), where=hull_area > 0)
+    confidence += np.where(
+        hull_area > 0,
+        np.select([solidity > 0.95, solidity > 0.85], [0.15, 0.10], 0.05),
+        0.0,
+    )
+    
+    # 3. Vertex Count (0-0.15)
+    # Rooms typically have 4-8 vertices
+    confidence += np.select(
+        [
+            num_vertices == 4,
+            (num_vertices >= 5) & (num_vertices <= 8),
+            (num_vertices >= 9) & (num_vertices <= 12),
+        ],
+        [0.15, 0.12, 0.08],
+        0.03,
+    )
+    
+    # 4. Aspect Ratio (0-0.10)
+    # Rooms should not be extremely elongated
+    has_size = (w > 0) & (h > 0)
+    aspect_ratio = np.divide(
+        np.maximum(w, h), np.minimum(w, h), out=np.ones_like(w), where=has_size
+    )
+    confidence += np.where(
+        has_size,
+        np.select([aspect_ratio < 2.0, aspect_ratio < 3.0, aspect_ratio < 4.0], [0.10, 0.07, 0.04], 0.02),
+        0.0,
+    )
+    
+    # 5. Size Reasonableness (0-0.10)
+    # Penalize very small or very large rooms (typical room size for 3000x3000 image)
+    confidence += np.select(
+        [(area > 100000) & (area < 400000), (area > 50000) & (area < 500000)],
+        [0.10, 0.07],
+        0.03,
+    )
+    
+    # Log confidence breakdown for debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        for idx in range(len(features)):
+            logger.debug(f"Confidence breakdown - Area: {area[idx]:.0f}, Extent: {extent[idx]:.2f}, "
+                         f"Solidity: {solidity[idx]:.2f}, Vertices: {num_vertices[idx]}, "
+                         f"Aspect: {aspect_ratio[idx]:.2f}, Final: {confidence[idx]:.2f}")
+    
+    # Cap between 0.5 and 0.95 for OpenCV-based detection
+    return np.clip(confidence, 0.5, 0.95)
+
+
+def calculate_confidence(contour: np.ndarray, edges: np.ndarray) -> float:
+    """
+    Calculate detection confidence based on contour properties
+    
+    Args:
+        contour: Detected contour
+        edges: Edge image
+        
+    Returns:
+        Confidence score (0-1)
+    """
+    return float(score_contour_features(extract_contour_features([contour]))[0])
+
+
+def room_polygon(contour: np.ndarray, geometry: str) -> np.ndarray:
+    """
+    Outline of a room contour in the requested geometry
+    
+    Args:
+        contour: Approximated room polygon in image pixels
+        geometry: 'obb' for the minimum-area rotated rectangle, 'polygon'
+            for the contour itself
+        
+    Returns:
+        Array of shape (k, 2) with (x, y) vertices in image pixels
+    """
+    if geometry == 'obb':
+        return cv2.boxPoints(cv2.minAreaRect(contour))
+    return contour.reshape(-1, 2)
+
+
+def normalize_polygon(points: np.ndarray, image_shape: Tuple[int, int]) -> List[int]:
+    """
+    Normalize polygon vertices to the 0-1000 range as a flat coordinate list
+    
+    Args:
+        points: Array of shape (k, 2) with (x, y) vertices in image pixels
+        image_shape: Image shape (height, width)
+        
+    Returns:
+        Flat list [x1, y1, x2, y2, ...]
+    """
+    height, width = image_shape
+    normalized = points * (NORMALIZED_RANGE / width, NORMALIZED_RANGE / height)
+    return np.clip(normalized, 0, NORMALIZED_RANGE).astype(np.int32).ravel().tolist()
+
+
+def polygon_intersection_area(
+    poly_a: np.ndarray,
+    poly_b: np.ndarray,
+    convex: bool = False,
+    window: Optional[Tuple[float, float, float, float]] = None
+) -> float:
+    """
+    Area shared by two simple polygons
+    
+    Convex pairs (every OBB) are intersected exactly. Anything concave, such
+    as an L-shaped room, is rasterized over the overlap of the two bounding
+    boxes at one pixel per coordinate unit, which the 0-1000 space keeps small.
+    Rasterized areas count boundary pixels too; compare them with raster_area.
+    
+    Args:
+        poly_a: float32 array of shape (k, 2) with (x, y) vertices
+        poly_b: float32 array of shape (m, 2) with (x, y) vertices
+        convex: Both polygons are known to be convex
+        window: Overlap (x_min, y_min, x_max, y_max) of the polygons' bounding
+            boxes, when the caller already has it
+        
+    Returns:
+        Intersection area, 0 when the polygons do not overlap
+    """
+    if convex:
+        return float(cv2.intersectConvexConvex(poly_a, poly_b)[0])
+    
+    if window is None:
+        window = (*np.maximum(poly_a.min(axis=0), poly_b.min(axis=0)),
+                  *np.minimum(poly_a.max(axis=0), poly_b.max(axis=0)))
+    x_min, y_min = int(window[0]), int(window[1])
+    width, height = int(np.ceil(window[2])) - x_min + 1, int(np.ceil(window[3])) - y_min + 1
+    if width <= 1 or height <= 1:
+        return 0.0
+    
+    offset = (-x_min, -y_min)
+    mask_a = np.zeros((height, width), dtype=np.uint8)
+    mask_b = np.zeros((height, width), dtype=np.uint8)
+    cv2.fillPoly(mask_a, [poly_a.astype(np.int32)], 1, offset=offset)
+    cv2.fillPoly(mask_b, [poly_b.astype(np.int32)], 1, offset=offset)
+    return float(cv2.countNonZero(cv2.bitwise_and(mask_a, mask_b)))
+
+
+def raster_area(polygon: np.ndarray) -> float:
+    """
+    Pixels a filled polygon covers, boundary included (Pick's theorem)
+    
+    Args:
+        polygon: float32 array of shape (k, 2) with integer (x, y) vertices
+        
+    Returns:
+        Area plus half the perimeter plus one
+    """
+    return cv2.contourArea(polygon) + cv2.arcLength(polygon, True) / 2 + 1
+
+
+def polygon_iou(poly_a: np.ndarray, poly_b: np.ndarray) -> float:
+    """
+    Intersection over Union of two simple polygons
+    
+    Args:
+        poly_a: Array of shape (k, 2) with (x, y) vertices
+        poly_b: Array of shape (m, 2) with (x, y) vertices
+        
+    Returns:
+        IoU (0-1), 0 when the polygons do not overlap
+    """
+    poly_a = np.ascontiguousarray(poly_a, dtype=np.float32).reshape(-1, 2)
+    poly_b = np.ascontiguousarray(poly_b, dtype=np.float32).reshape(-1, 2)
+    convex = cv2.isContourConvex(poly_a) and cv2.isContourConvex(poly_b)
+    
+    inter_area = polygon_intersection_area(poly_a, poly_b, convex)
+    measure = cv2.contourArea if convex else raster_area
+    union_area = measure(poly_a) + measure(poly_b) - inter_area
+    return min(inter_area / union_area, 1.0) if union_area > 0 else 0.0
+
+
+def normalize_coordinates(
+    bbox: Tuple[int, int, int, int], 
+    image_shape: Tuple[int, int]
+) -> List[int]:
+    """
+    Normalize bounding box coordinates to 0-1000 range
+    
+    Args:
+        bbox: Bounding box (x_min, y_min, x_max, y_max)
+        image_shape: Image shape (height, width)
+        
+    Returns:
+        Normalized coordinates [x_min, y_min, x_max, y_max]
+    """
+    height, width = image_shape
+    x_min, y_min, x_max, y_max = bbox
+    
+    return [
+        int((x_min / width) * NORMALIZED_RANGE),
+        int((y_min / height) * NORMALIZED_RANGE),
+        int((x_max / width) * NORMALIZED_RANGE),
+        int((y_max / height) * NORMALIZED_RANGE),
+    ]
+
+
+def _candidate_pairs(bboxes: np.ndarray):
+    """
+    Yield index pairs of boxes whose x-ranges overlap, in bounded chunks
+
+    Boxes are swept in x_min order, so each box is only paired with the boxes
+    that start before it ends instead of with every other box.
+
+    Args:
+        bboxes: Array of shape (n, 4) with (x_min, y_min, x_max, y_max) rows
+
+    Yields:
+        Tuples of (i, j) index arrays into bboxes
+    """
+    n = len(bboxes)
+    x_order = np.argsort(bboxes[:, 0], kind='stable')
+    x_min_sorted = bboxes[x_order, 0]
+
+    # Boxes after position p in x order that start before box p ends
+    ends = np.searchsorted(x_min_sorted, bboxes[x_order, 2], side='left')
+    counts = np.maximum(ends - np.arange(1, n + 1), 0)
+    bounds = np.cumsum(counts)
+
+    start = 0
+    while start < n:
+        base = bounds[start - 1] if start else 0
+        stop = int(np.searchsorted(bounds, base + NMS_PAIR_CHUNK, side='right'))
+        stop = max(stop, start + 1)
+
+        chunk_counts = counts[start:stop]
+        total = int(chunk_counts.sum())
+        if total:
+            pos_i = np.repeat(np.arange(start, stop), chunk_counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            pos_j = pos_i + 1 + offsets
+            yield x_order[pos_i], x_order[pos_j]
+
+        start = stop
+
+
+def suppress_overlapping_boxes(
+    bboxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float = IOU_MERGE_THRESHOLD,
+    polygons: Optional[List[np.ndarray]] = None
+) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over an array of boxes
+
+    IoU is computed in bulk for every pair of boxes that overlap along x,
+    then boxes are visited from highest to lowest score and each kept box
+    suppresses its overlapping neighbours.
+
+    With polygons, pairs are scored by polygon IoU instead. The boxes still
+    find the candidate pairs, and a pair is only intersected exactly when
+    its box overlap could reach the threshold: polygon intersection is at
+    most the box intersection, and the union at least the larger polygon.
+
+    Args:
+        bboxes: Array of shape (n, 4) with (x_min, y_min, x_max, y_max) rows
+        scores: Array of shape (n,) with box confidences
+        iou_threshold: Boxes overlapping a kept box above this IoU are dropped
+        polygons: Optional (k, 2) vertex arrays, one per box, inside their boxes
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(bboxes)
+
+    # Stable descending sort keeps input order for equal scores
+    order = np.argsort(-scores, kind='stable')
+    if n <= 1:
+        return order
+
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    x_min, y_min, x_max, y_max = (np.ascontiguousarray(col) for col in bboxes.T)
+    areas = (x_max - x_min) * (y_max - y_min)
+    if polygons is not None:
+        # Measure every polygon once; pairs only pay for their intersection
+        polygons = [np.ascontiguousarray(polygon, dtype=np.float32).reshape(-1, 2) for polygon in polygons]
+        convex = np.array([cv2.isContourConvex(polygon) for polygon in polygons])
+        polygon_areas = np.array([cv2.contourArea(polygon) for polygon in polygons])
+        pixel_areas = np.array([raster_area(polygon) for polygon in polygons])
+
+    winners = []
+    losers = []
+    for i, j in _candidate_pairs(bboxes):
+        # Pairs already overlap along x; drop the ones apart along y first
+        inter_h = np.minimum(y_max[i], y_max[j]) - np.maximum(y_min[i], y_min[j])
+        overlapping = inter_h > 0
+        i, j, inter_h = i[overlapping], j[overlapping], inter_h[overlapping]
+
+        inter_w = np.minimum(x_max[i], x_max[j]) - np.maximum(x_min[i], x_min[j])
+        overlapping = inter_w > 0
+        i, j = i[overlapping], j[overlapping]
+        inter_area = inter_w[overlapping] * inter_h[overlapping]
+
+        if polygons is None:
+            union_area = areas[i] + areas[j] - inter_area
+            iou = np.divide(inter_area, union_area, out=np.zeros_like(inter_area), where=union_area > 0)
+        else:
+            # Upper bound first, exact polygon IoU only for pairs that can pass
+            larger = np.maximum(polygon_areas[i], polygon_areas[j])
+            possible = inter_area > iou_threshold * larger
+            i, j = i[possible], j[possible]
+            windows = np.stack([
+                np.maximum(x_min[i], x_min[j]), np.maximum(y_min[i], y_min[j]),
+                np.minimum(x_max[i], x_max[j]), np.minimum(y_max[i], y_max[j]),
+            ], axis=1).tolist()
+            both_convex = (convex[i] & convex[j]).tolist()
+            inter_area = np.array([
+                polygon_intersection_area(polygons[a], polygons[b], both, window)
+                for a, b, both, window in zip(i.tolist(), j.tolist(), both_convex, windows)
+            ])
+            union_area = np.where(
+                both_convex, polygon_areas[i] + polygon_areas[j], pixel_areas[i] + pixel_areas[j]
+            ) - inter_area
+            iou = np.divide(inter_area, union_area, out=np.zeros_like(inter_area), where=union_area > 0)
+        hit = iou > iou_threshold
+        i, j = i[hit], j[hit]
+
+        # The higher-ranked box of each pair is the one that can suppress
+        i_first = rank[i] < rank[j]
+        winners.append(np.where(i_first, i, j))
+        losers.append(np.where(i_first, j, i))
+
+    winners = np.concatenate(winners) if winners else np.empty(0, dtype=np.int64)
+    losers = np.concatenate(losers) if losers else np.empty(0, dtype=np.int64)
+
+    # Group suppressed neighbours by the box that suppresses them (CSR layout)
+    by_winner = np.argsort(winners, kind='stable')
+    losers = losers[by_winner]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(winners, minlength=n), out=indptr[1:])
+
+    # The greedy pass is inherently sequential; plain lists keep it cheap
+    indptr = indptr.tolist()
+    losers = losers.tolist()
+    suppressed = bytearray(n)
+    keep = []
+    for idx in order.tolist():
+        if suppressed[idx]:
+            continue
+        keep.append(idx)
+        for loser in losers[indptr[idx]:indptr[idx + 1]]:
+            suppressed[loser] = 1
+
+    return np.array(keep, dtype=np.int64)
+
+
+def merge_overlapping_boxes(
+    boxes: List[Dict[str, Any]], 
+    iou_threshold: float = IOU_MERGE_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Merge overlapping bounding boxes
+    
+    Args:
+        boxes: List of detected rooms
+        iou_threshold: IoU threshold for merging
+        
+    Returns:
+        List of merged rooms, highest confidence first
+    """
+    if len(boxes) <= 1:
+        return boxes
+    
+    bboxes = np.array([box['bounding_box'] for box in boxes], dtype=np.float64)
+    scores = np.array([box['confidence'] for box in boxes], dtype=np.float64)
+    
+    # Rooms with outlines (obb/polygon geometry) are merged by the IoU of those
+    polygons = [box['polygon'] for box in boxes] if 'polygon' in boxes[0] else None
+    
+    keep = suppress_overlapping_boxes(bboxes, scores, iou_threshold, polygons)
+    
+    return [boxes[i] for i in keep]
+
+
+def detect_rooms(
+    image_bytes: bytes,
+    iou_threshold: float = IOU_MERGE_THRESHOLD,
+    tile_size: Optional[int] = None,
+    tile_workers: Optional[int] = None,
+    pyramid_scale: Optional[float] = None,
+    pyramid_refine: Optional[bool] = None,
+    max_side: Optional[int] = None,
+    adaptive_edges: Optional[bool] = None,
+    geometry: Optional[str] = None,
+    stats: Optional[DetectionStats] = None
+) -> Dict[str, Any]:
+    """
+    Main room detection function
+    
+    Args:
+        image_bytes: Blueprint image as bytes
+        iou_threshold: IoU threshold for merging overlapping rooms
+        tile_size: Tile side length for tiled edge detection
+            (None uses TILE_SIZE, 0 processes the image in one piece)
+        tile_workers: Threads for tiled edge detection (None uses TILE_WORKERS)
+        pyramid_scale: Downscale factor for coarse-to-fine detection
+            (None uses PYRAMID_SCALE, 0 disables the pyramid)
+        pyramid_refine: Refine pyramid candidates at full resolution
+            (None uses PYRAMID_REFINE)
+        max_side: Decode larger images reduced to this longest side
+            (None uses MAX_IMAGE_SIDE, 0 keeps full resolution)
+        adaptive_edges: Canny thresholds and closing kernel from the image's
+            median intensity and resolution, blank pages skipped
+            (None uses ADAPTIVE_EDGES; False uses fixed 50/150 and 5x5)
+        geometry: Room shape reported and merged on: 'box', 'obb' or
+            'polygon' (None uses ROOM_GEOMETRY); see GEOMETRY_MODES
+        stats: Collects stage timings (decode, preprocess, edges, contours,
+            scoring, merge) and counters when given
+        
+    Returns:
+        Detection results with rooms and metadata
+    """
+    start_time = time.time()
+    stats = stats or DetectionStats()
+    
+    max_side = MAX_IMAGE_SIDE if max_side is None else max_side
+    
+    # Load image
+    with stats.stage('decode'):
+        gray = load_grayscale(image_bytes, max_side)
+    
+    logger.info(f"Image loaded: {gray.shape} in {int((time.time() - start_time) * 1000)}ms")
+    
+    result = detect_rooms_in_image(
+        gray, iou_threshold, tile_size, tile_workers, pyramid_scale, pyramid_refine, adaptive_edges, geometry, stats
+    )
+    result['processing_time_ms'] = int((time.time() - start_time) * 1000)
+    return result
+
+
+def detect_rooms_in_image(
+    gray: np.ndarray,
+    iou_threshold: float = IOU_MERGE_THRESHOLD,
+    tile_size: Optional[int] = None,
+    tile_workers: Optional[int] = None,
+    pyramid_scale: Optional[float] = None,
+    pyramid_refine: Optional[bool] = None,
+    adaptive_edges: Optional[bool] = None,
+    geometry: Optional[str] = None,
+    stats: Optional[DetectionStats] = None
+) -> Dict[str, Any]:
+    """
+    Room detection on an already decoded grayscale image
+    
+    Args:
+        gray: Grayscale uint8 image
+        iou_threshold: IoU threshold for merging overlapping rooms
+        tile_size: See detect_rooms
+        tile_workers: See detect_rooms
+        pyramid_scale: See detect_rooms
+        pyramid_refine: See detect_rooms
+        adaptive_edges: See detect_rooms
+        geometry: See detect_rooms
+        stats: See detect_rooms; stages fused by pyramid mode (everything
+            into contours) are timed together
+        
+    Returns:
+        Detection results with rooms and metadata
+    """
+    start_time = time.time()
+    stats = stats or DetectionStats()
+    
+    tile_size = TILE_SIZE if tile_size is None else tile_size
+    tile_workers = TILE_WORKERS if tile_workers is None else tile_workers
+    pyramid_scale = PYRAMID_SCALE if pyramid_scale is None else pyramid_scale
+    pyramid_refine = PYRAMID_REFINE if pyramid_refine is None else pyramid_refine
+    adaptive_edges = ADAPTIVE_EDGES if adaptive_edges is None else adaptive_edges
+    geometry = geometry or ROOM_GEOMETRY
+    if geometry not in GEOMETRY_MODES:
+        raise ValueError(f"Unknown geometry '{geometry}', expected one of {', '.join(GEOMETRY_MODES)}")
+    
+    if adaptive_edges and is_blank(gray):
+        # Fast path: blank sheets (cover pages, empty backs) have no rooms to find
+        logger.info("Blank image, skipping detection")
+        stats.count('blank_images')
+        preprocessed = gray
+        contours, features = [], extract_contour_features([])
+    elif 0 < pyramid_scale < 1:
+        # Pyramid mode: coarse candidates, refined region by region
+        preprocessed = gray
+        with stats.stage('contours'):
+            contours, features = find_room_contours_pyramid(
+                preprocessed, pyramid_scale, pyramid_refine, stats=stats, adaptive=adaptive_edges
+            )
+    else:
+        # Preprocess
+        with stats.stage('preprocess'):
+            preprocessed = preprocess_image(gray)
+        
+        # Detect edges (tiled mode: per tile in parallel, same edge map)
+        with stats.stage('edges'):
+            if tile_size and max(gray.shape) > tile_size:
+                edges = detect_edges_tiled(preprocessed, tile_size, tile_workers, adaptive=adaptive_edges)
+            else:
+                edges = detect_edges(preprocessed, adaptive_edges)
+        
+        # Find contours and measure them once
+        with stats.stage('contours'):
+            contours, features = find_room_contours(edges, preprocessed.shape, stats=stats)
+    
+    logger.info(f"Found {len(contours)} potential rooms")
+    
+    with stats.stage('scoring'):
+        # Score every contour in one pass over the feature table
+        confidences = score_contour_features(features)
+        
+        # Convert to rooms
+        rooms = []
+        for idx, record in enumerate(features):
+            x, y, w, h = (int(record[field]) for field in ('x', 'y', 'w', 'h'))
+            normalized_bbox = normalize_coordinates((x, y, x + w, y + h), preprocessed.shape)
+            
+            room = {
+                'id': f'room_{idx:03d}',
+                'bounding_box': normalized_bbox,
+                'confidence': round(float(confidences[idx]), 2),
+                'name_hint': None,  # Phase 2: Add name detection
+            }
+            if geometry != 'box':
+                room['polygon'] = normalize_polygon(room_polygon(contours[idx], geometry), preprocessed.shape)
+            rooms.append(room)
+    
+    with stats.stage('merge'):
+        # Merge overlapping rooms (by outline when they have one)
+        rooms = merge_overlapping_boxes(rooms, iou_threshold)
+        
+        # Sort by size (larger rooms first)
+        rooms.sort(key=lambda r: (
+            (r['bounding_box'][2] - r['bounding_box'][0]) * 
+            (r['bounding_box'][3] - r['bounding_box'][1])
+        ), reverse=True)
+    
+    stats.count('images')
+    stats.count('rooms', len(rooms))
+    
+    processing_time = int((time.time() - start_time) * 1000)
+    
+    return {
+        'rooms': rooms,
+        'processing_time_ms': processing_time,
+        'model_version': MODEL_VERSION,
+    }
 
 
-def preprocess_image(image: np.ndarray) -> np.ndarray:
+def find_edited_region(gray: np.ndarray, prior_gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
     """
-    Preprocess blueprint image for better edge detection
+    Bounding box of the pixels that changed between two versions of a sheet
     
     Args:
-        image: Input image as numpy array
+        gray: New grayscale image
+        prior_gray: Earlier grayscale image of the same shape
         
     Returns:
-        Preprocessed grayscale image
+        (x_min, y_min, x_max, y_max) in pixels, or None when nothing changed
     """
-    # Convert to grayscale if needed
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-    
-    # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
-    
-    return blurred
+    _, changed = cv2.threshold(cv2.absdiff(gray, prior_gray), INCREMENTAL_DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+    points = cv2.findNonZero(changed)
+    if points is None:
+        return None
+    x, y, w, h = cv2.boundingRect(points)
+    return (x, y, x + w, y + h)
 
 
-def detect_edges(image: np.ndarray) -> np.ndarray:
+def detect_rooms_incremental(
+    gray: np.ndarray,
+    prior_rooms: List[Dict[str, Any]],
+    dirty_rect: Optional[Tuple[int, int, int, int]] = None,
+    prior_gray: Optional[np.ndarray] = None,
+    margin: int = INCREMENTAL_MARGIN,
+    stats: Optional[DetectionStats] = None,
+    **params: Any
+) -> Dict[str, Any]:
     """
-    Detect edges using Canny edge detector
+    Re-detect rooms only where a sheet was edited, reusing an earlier result
+    
+    The edited region (given, or found by diffing against the earlier image)
+    is grown by a margin and by every earlier room it touches, so rooms are
+    always re-detected whole. Preprocessing, edges and contours run on that
+    region alone; earlier rooms outside it are kept and merged with the new
+    ones. Latency follows the size of the edit rather than of the sheet.
+    
+    Falls back to full detection when neither a dirty rectangle nor an
+    earlier image is given, the sizes differ, the earlier rooms lack the
+    requested geometry, or the region covers most of the sheet.
     
     Args:
-        image: Preprocessed grayscale image
+        gray: Grayscale uint8 image of the edited sheet
+        prior_rooms: Rooms of the earlier result (0-1000 coordinates)
+        dirty_rect: Edited area (x_min, y_min, x_max, y_max) in 0-1000 coordinates
+        prior_gray: Earlier grayscale image, diffed when no dirty_rect is given
+        margin: Pixels of context added around the edited area
+        stats: See detect_rooms; the diff is timed as its own stage
+        **params: Further detect_rooms_in_image arguments
         
     Returns:
-        Binary edge image
+        Detection results with rooms and metadata; 'incremental' describes
+        the re-detected region and how many rooms were reused
     """
-    # Use fixed thresholds that work well for most floor plans
-    # Lower threshold: 50 (detects weaker edges)
-    # Upper threshold: 150 (strong edges)
-    edges = cv2.Canny(image, 50, 150)
+    start_time = time.time()
+    stats = stats or DetectionStats()
+    height, width = gray.shape
+    geometry = params.get('geometry') or ROOM_GEOMETRY
     
-    logger.info(f"Edge detection complete, edge pixels: {np.count_nonzero(edges)}")
+    def full_detection(reason: str) -> Dict[str, Any]:
+        logger.info(f"Incremental detection not possible ({reason}), detecting the whole image")
+        return detect_rooms_in_image(gray, stats=stats, **params)
     
-    # Apply morphological operations to close gaps and strengthen edges
-    kernel = np.ones((5, 5), np.uint8)
+    if any(('polygon' in room) != (geometry != 'box') for room in prior_rooms):
+        return full_detection("earlier rooms have another geometry")
     
-    # Dilate to connect nearby edges (important for room boundaries)
-    edges = cv2.dilate(edges, kernel, iterations=2)
+    # Edited area in pixels
+    if dirty_rect is not None:
+        x0, y0, x1, y1 = dirty_rect
+        region = (
+            int(x0 * width / NORMALIZED_RANGE), int(y0 * height / NORMALIZED_RANGE),
+            math.ceil(x1 * width / NORMALIZED_RANGE), math.ceil(y1 * height / NORMALIZED_RANGE),
+        )
+    elif prior_gray is not None and prior_gray.shape == gray.shape:
+        with stats.stage('diff'):
+            region = find_edited_region(gray, prior_gray)
+        if region is None:
+            logger.info("No changes against the earlier image, reusing its rooms")
+            return {
+                'rooms': prior_rooms,
+                'processing_time_ms': int((time.time() - start_time) * 1000),
+                'model_version': MODEL_VERSION,
+                'incremental': {'region': None, 'reused_rooms': len(prior_rooms), 'new_rooms': 0},
+            }
+    else:
+        return full_detection("no dirty rectangle or matching earlier image")
     
-    # Erode to thin the edges back
-    edges = cv2.erode(edges, kernel, iterations=1)
+    # Earlier rooms in pixels; grow the region until no room straddles its border
+    scale = np.array([width, height, width, height]) / NORMALIZED_RANGE
+    prior_boxes = np.array([room['bounding_box'] for room in prior_rooms], dtype=np.float64).reshape(-1, 4) * scale
+    x0, y0, x1, y1 = region
+    x0, y0, x1, y1 = max(0, x0 - margin), max(0, y0 - margin), min(width, x1 + margin), min(height, y1 + margin)
+    inside = np.zeros(len(prior_boxes), dtype=bool)
+    while True:
+        touching = (
+            (prior_boxes[:, 0] < x1) & (prior_boxes[:, 2] > x0) & (prior_boxes[:, 1] < y1) & (prior_boxes[:, 3] > y0)
+        )
+        if not (touching & ~inside).any():
+            break
+        inside |= touching
+        grown = prior_boxes[inside]
+        x0 = max(0, min(x0, int(grown[:, 0].min()) - margin))
+        y0 = max(0, min(y0, int(grown[:, 1].min()) - margin))
+        x1 = min(width, max(x1, math.ceil(grown[:, 2].max()) + margin))
+        y1 = min(height, max(y1, math.ceil(grown[:, 3].max()) + margin))
     
-    # Close small holes in the edges
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    if (x1 - x0) * (y1 - y0) > INCREMENTAL_MAX_FRACTION * width * height:
+        return full_detection(f"edited region is {(x1 - x0) * (y1 - y0) / (width * height):.0%} of the image")
     
-    return edges
+    # Re-detect inside the region only, with full-image limits (as pyramid refinement does)
+    area = gray[y0:y1, x0:x1]
+    adaptive_edges = params.get('adaptive_edges')
+    adaptive_edges = ADAPTIVE_EDGES if adaptive_edges is None else adaptive_edges
+    with stats.stage('preprocess'):
+        preprocessed = preprocess_image(area, scaled_clahe_grid(area.shape, gray.shape))
+    with stats.stage('edges'):
+        edges = detect_edges(preprocessed, adaptive_edges, max(gray.shape))
+    with stats.stage('contours'):
+        contours, features = find_room_contours(edges, area.shape, room_area_limits(gray.shape), stats)
+    
+    with stats.stage('scoring'):
+        confidences = score_contour_features(features)
+        next_id = 1 + max((int(room['id'].rpartition('_')[2]) for room in prior_rooms), default=-1)
+        
+        new_rooms = []
+        for idx, record in enumerate(features):
+            x, y, w, h = (int(record[field]) for field in ('x', 'y', 'w', 'h'))
+            
+            # A contour cut by an inner region border is a fragment of something outside it
+            if (x == 0 < x0) or (y == 0 < y0) or (x + w == area.shape[1] and x1 < width) or \
+                    (y + h == area.shape[0] and y1 < height):
+                continue
+            
+            room = {
+                'id': f'room_{next_id + len(new_rooms):03d}',
+                'bounding_box': normalize_coordinates((x + x0, y + y0, x + x0 + w, y + y0 + h), gray.shape),
+                'confidence': round(float(confidences[idx]), 2),
+                'name_hint': None,
+            }
+            if geometry != 'box':
+                outline = room_polygon(contours[idx], geometry) + (x0, y0)
+                room['polygon'] = normalize_polygon(outline, gray.shape)
+            new_rooms.append(room)
+    
+    with stats.stage('merge'):
+        kept_rooms = [room for room, replaced in zip(prior_rooms, inside) if not replaced]
+        rooms = merge_overlapping_boxes(kept_rooms + new_rooms, params.get('iou_threshold', IOU_MERGE_THRESHOLD))
+        rooms.sort(key=lambda r: (
+            (r['bounding_box'][2] - r['bounding_box'][0]) * 
+            (r['bounding_box'][3] - r['bounding_box'][1])
+        ), reverse=True)
+    
+    logger.info(f"Incremental detection: region {x1 - x0}x{y1 - y0} at ({x0}, {y0}), "
+                f"{len(kept_rooms)} rooms reused, {len(new_rooms)} re-detected")
+    stats.count('images')
+    stats.count('rooms', len(rooms))
+    stats.count('rooms_reused', len(kept_rooms))
+    
+    return {
+        'rooms': rooms,
+        'processing_time_ms': int((time.time() - start_time) * 1000),
+        'model_version': MODEL_VERSION,
+        'incremental': {
+            'region': normalize_coordinates((x0, y0, x1, y1), gray.shape),
+            'reused_rooms': len(kept_rooms),
+            'new_rooms': len(new_rooms),
+        },
+    }
 
 
-def find_room_contours(edges: np.ndarray, original_shape: Tuple[int, int]) -> List[np.ndarray]:
+def detect_pdf_pages(
+    pdf_bytes: bytes,
+    dpi: float = PDF_DPI,
+    workers: Optional[int] = None,
+    max_side: Optional[int] = None,
+    stats: Optional[DetectionStats] = None,
+    **params: Any
+) -> Iterator[Dict[str, Any]]:
     """
-    Find room contours from edge image
+    Detect rooms on every page of a PDF, yielding results page by page
+    
+    Pages are rendered lazily inside the workers, so only the pages being
+    processed are held in memory. Results come out in page order as soon as
+    each page (and all pages before it) is done.
     
     Args:
-        edges: Binary edge image
-        original_shape: Original image shape (height, width)
+        pdf_bytes: PDF document as bytes
+        dpi: Rendering resolution
+        workers: Pages processed in parallel (None uses every core)
+        max_side: Longest rendered page side (None uses MAX_IMAGE_SIDE,
+            0 uses the PDF_MAX_SIDE cap)
+        stats: Stage timings and counters summed over all pages, with
+            rendering timed as decode
+        **params: Further detect_rooms_in_image arguments
         
+    Yields:
+        Detection results per page with page number and page count,
+        or an error entry for a page that failed
+    """
+    max_side = MAX_IMAGE_SIDE if max_side is None else max_side
+    stats = stats or DetectionStats()
+    pages = PdfPages(pdf_bytes, dpi=dpi, max_side=max_side or PDF_MAX_SIDE)
+    
+    def detect_page(index: int) -> Dict[str, Any]:
+        start_time = time.time()
+        try:
+            with stats.stage('decode'):
+                page = pages.render(index)
+            result = detect_rooms_in_image(page, stats=stats, **params)
+        except Exception as e:
+            logger.error(f"Page {index + 1} failed: {str(e)}", exc_info=True)
+            result = {'error': 'Processing failed', 'message': str(e)}
+        result['processing_time_ms'] = int((time.time() - start_time) * 1000)
+        return {'page': index + 1, 'page_count': len(pages), **result}
+    
+    pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    try:
+        futures = [pool.submit(detect_page, index) for index in range(len(pages))]
+        for future in futures:
+            yield future.result()
+    finally:
+        # Drop pages not yet started when the consumer stops early
+        pool.shutdown(wait=True, cancel_futures=True)
+        pages.close()
+
+
+def detection_params() -> Dict[str, Any]:
+    """
+    Detection parameters used by the Lambda endpoint
+    
     Returns:
-        List of valid room contours
+        Keyword arguments for detect_rooms; also part of the result cache key
     """
-    # Find all contours (not just external ones)
-    # This is important for colored floor plans where rooms are filled regions
-    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    return {
+        'iou_threshold': IOU_MERGE_THRESHOLD,
+        'tile_size': TILE_SIZE,
+        'pyramid_scale': PYRAMID_SCALE,
+        'pyramid_refine': PYRAMID_REFINE,
+        'max_side': MAX_IMAGE_SIDE,
+        'adaptive_edges': ADAPTIVE_EDGES,
+        'geometry': ROOM_GEOMETRY,
+    }
+
+
+def iter_multipart_files(body: bytes, content_type: str) -> Iterator[Tuple[str, memoryview]]:
+    """
+    Iterate over the file parts of multipart/form-data
     
-    logger.info(f"Found {len(contours)} total contours before filtering")
+    Scans the raw body for boundary delimiters and yields views of the file
+    parts, so uploads are never split, decoded or re-encoded.
     
-    # Filter contours by area
-    valid_contours = []
-    height, width = original_shape
-    image_area = height * width
+    Args:
+        body: Request body as bytes (a latin-1 str is still accepted)
+        content_type: Content-Type header value
+        
+    Yields:
+        Tuple of (file name, memoryview of the file bytes inside body)
+    """
+    # Extract boundary from content type
+    boundary = None
+    for part in content_type.split(';'):
+        part = part.strip()
+        if part.startswith('boundary='):
+            boundary = part.split('=', 1)[1].strip('"')
+            break
     
-    # Calculate dynamic area thresholds based on image size
-    # For a 3000x3000 image, min_area = 50,000 (about 224x224px)
-    # This scales with image size
-    min_area = max(MIN_ROOM_AREA, image_area * 0.005)  # At least 0.5% of image
-    max_area = min(MAX_ROOM_AREA, image_area * 0.4)    # At most 40% of image
+    if not boundary:
+        raise ValueError("No boundary found in content-type")
     
-    logger.info(f"Area thresholds: min={min_area:.0f}, max={max_area:.0f}, image_area={image_area}")
+    logger.info(f"Parsing multipart with boundary: {boundary}")
     
-    for idx, contour in enumerate(contours):
-        area = cv2.contourArea(contour)
+    if isinstance(body, str):
+        body = body.encode('latin-1')
+    delimiter = b'--' + boundary.encode('latin-1')
+    
+    # Walk the parts by locating each delimiter in place
+    position = body.find(delimiter)
+    while position != -1:
+        part_start = position + len(delimiter)
+        if body[part_start:part_start + 2] == b'--':
+            break  # Closing delimiter
         
-        # Filter by area constraints
-        if min_area < area < max_area:
-            # Approximate contour to reduce vertices
-            epsilon = 0.02 * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
+        next_delimiter = body.find(delimiter, part_start)
+        part_end = next_delimiter if next_delimiter != -1 else len(body)
+        
+        # Split headers from content
+        separator = body.find(b'\r\n\r\n', part_start, part_end)
+        if separator != -1:
+            content_start = separator + 4
+        else:
+            separator = body.find(b'\n\n', part_start, part_end)
+            content_start = separator + 2
+        
+        # Check if this part contains a file
+        headers = body[part_start:separator] if separator != -1 else b''
+        if b'Content-Disposition' in headers and b'filename' in headers:
+            # The line break before the next delimiter belongs to the delimiter
+            content_end = part_end
+            if body[content_end - 2:content_end] == b'\r\n':
+                content_end -= 2
+            elif body[content_end - 1:content_end] == b'\n':
+                content_end -= 1
             
-            # Log the contour for debugging
-            logger.info(f"Valid contour {idx}: area={area:.0f}, vertices={len(approx)}")
-            valid_contours.append(approx)
-    
-    logger.info(f"Filtered to {len(valid_contours)} valid contours")
-    return valid_contours
+            logger.info(f"Found file part, content length: {content_end - content_start} bytes")
+            yield multipart_filename(headers), memoryview(body)[content_start:content_end]
+        
+        position = next_delimiter
 
 
-def contour_to_bounding_box(contour: np.ndarray) -> Tuple[int, int, int, int]:
+def multipart_filename(headers: bytes) -> str:
     """
-    Convert contour to bounding box
+    Read the filename parameter of a part's Content-Disposition header
     
     Args:
-        contour: Contour as numpy array
+        headers: Raw part headers
         
     Returns:
-        Tuple of (x_min, y_min, x_max, y_max)
+        File name, or an empty string when it is missing
     """
-    x, y, w, h = cv2.boundingRect(contour)
-    return (x, y, x + w, y + h)
+    for line in headers.decode('utf-8', 'replace').splitlines():
+        if line.lower().startswith('content-disposition'):
+            for param in line.split(';')[1:]:
+                name, _, value = param.strip().partition('=')
+                if name.lower() == 'filename':
+                    return value.strip('"')
+    return ''
 
 
-def calculate_confidence(contour: np.ndarray, edges: np.ndarray) -> float:
+def parse_multipart(body: bytes, content_type: str) -> memoryview:
     """
-    Calculate detection confidence based on contour properties
+    Parse multipart/form-data to extract file bytes
     
     Args:
-        contour: Detected contour
-        edges: Edge image
+        body: Request body as bytes (a latin-1 str is still accepted)
+        content_type: Content-Type header value
         
     Returns:
-        Confidence score (0-1)
+        Memoryview of the first file part inside body
     """
-    # Start with base confidence
-    confidence = 0.5
+    for _, content in iter_multipart_files(body, content_type):
+        return content
     
-    # Get contour properties
-    area = cv2.contourArea(contour)
-    perimeter = cv2.arcLength(contour, True)
-    x, y, w, h = cv2.boundingRect(contour)
-    bounding_box_area = w * h
+    raise ValueError("No file found in multipart data")
+
+
+def fetch_uploaded_object(key: str) -> bytes:
+    """
+    Download a blueprint uploaded through a presigned URL
     
-    # Approximate contour to polygon
-    epsilon = 0.02 * perimeter
-    approx = cv2.approxPolyDP(contour, epsilon, True)
-    num_vertices = len(approx)
+    Args:
+        key: Object key returned by the upload-url endpoint
+        
+    Returns:
+        Object bytes
+    """
+    global s3_client
     
-    # Initialize metrics
-    extent = 0.0
-    solidity = 0.0
-    aspect_ratio = 1.0
+    if not S3_BUCKET_NAME:
+        raise ValueError("S3_BUCKET_NAME is not configured")
+    if not key.startswith(UPLOAD_KEY_PREFIX):
+        raise ValueError(f"Object key must start with {UPLOAD_KEY_PREFIX}")
     
-    # 1. Shape Quality (0-0.25)
-    # Rooms should fill their bounding box well
-    if bounding_box_area > 0:
-        extent = area / bounding_box_area
-        # Extent close to 1.0 means rectangular, close to 0 means irregular
-        if extent > 0.85:  # Very rectangular
-            confidence += 0.25
-        elif extent > 0.70:  # Fairly rectangular
-            confidence += 0.20
-        elif extent > 0.55:  # Somewhat rectangular
-            confidence += 0.15
-        else:
-            confidence += 0.05
+    if s3_client is None:
+        import boto3  # Provided by the Lambda base image; only needed for this path
+        s3_client = boto3.client('s3')
     
-    # 2. Convexity (0-0.15)
-    # Rooms should be mostly convex (no major indentations)
-    hull = cv2.convexHull(contour)
-    hull_area = cv2.contourArea(hull)
-    if hull_area > 0:
-        solidity = area / hull_area
-        if solidity > 0.95:  # Very convex
-            confidence += 0.15
-        elif solidity > 0.85:  # Mostly convex
-            confidence += 0.10
-        else:
-            confidence += 0.05
+    logger.info(f"Fetching s3://{S3_BUCKET_NAME}/{key}")
+    return s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=key)['Body'].read()
+
+
+def read_request_image(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    Extract the uploaded image from a decoded request body
     
-    # 3. Vertex Count (0-0.15)
-    # Rooms typically have 4-8 vertices
-    if num_vertices == 4:  # Perfect rectangle
-        confidence += 0.15
-    elif 5 <= num_vertices <= 8:  # Near-rectangular
-        confidence += 0.12
-    elif 9 <= num_vertices <= 12:  # Complex but valid
-        confidence += 0.08
-    else:
-        confidence += 0.03
+    Accepts multipart/form-data with a file part, a JSON body naming a
+    presigned upload ({"key": "uploads/..."}), or the raw image bytes.
+    The upload may also be a PDF (see detect_pdf_pages).
     
-    # 4. Aspect Ratio (0-0.10)
-    # Rooms should not be extremely elongated
-    if w > 0 and h > 0:
-        aspect_ratio = max(w, h) / min(w, h)
-        if aspect_ratio < 2.0:  # Nearly square
-            confidence += 0.10
-        elif aspect_ratio < 3.0:  # Reasonable rectangle
-            confidence += 0.07
-        elif aspect_ratio < 4.0:  # Long room
-            confidence += 0.04
-        else:  # Very elongated
-            confidence += 0.02
+    Args:
+        body: Request body as bytes
+        content_type: Content-Type header value
+        
+    Returns:
+        Image bytes or a memoryview of them
+    """
+    media_type = (content_type or '').lower()
     
-    # 5. Size Reasonableness (0-0.10)
-    # Penalize very small or very large rooms
-    if 100000 < area < 400000:  # Typical room size for 3000x3000 image
-        confidence += 0.10
-    elif 50000 < area < 500000:  # Acceptable range
-        confidence += 0.07
-    else:
-        confidence += 0.03
+    if 'multipart/form-data' in media_type:
+        return parse_multipart(body, content_type)
     
-    # Log confidence breakdown for debugging
-    logger.info(f"Confidence breakdown - Area: {area:.0f}, Extent: {extent:.2f}, "
-                f"Solidity: {solidity:.2f}, Vertices: {num_vertices}, "
-                f"Aspect: {aspect_ratio:.2f}, Final: {confidence:.2f}")
+    if 'application/json' in media_type:
+        key = json.loads(body).get('key')
+        if not key:
+            raise ValueError("JSON body must contain the uploaded object key")
+        return fetch_uploaded_object(key)
     
-    # Cap between 0.5 and 0.95 for OpenCV-based detection
-    return max(0.5, min(confidence, 0.95))
+    # Fallback: assume body is raw image bytes
+    return body
 
 
-def normalize_coordinates(
-    bbox: Tuple[int, int, int, int], 
-    image_shape: Tuple[int, int]
-) -> List[int]:
+def upload_params(image_bytes: bytes, geometry: Optional[str] = None) -> Dict[str, Any]:
     """
-    Normalize bounding box coordinates to 0-1000 range
+    Detection parameters for one upload; also part of its result cache key
     
     Args:
-        bbox: Bounding box (x_min, y_min, x_max, y_max)
-        image_shape: Image shape (height, width)
+        image_bytes: Image or PDF bytes
+        geometry: Overrides the configured room geometry (see detect_rooms)
         
     Returns:
-        Normalized coordinates [x_min, y_min, x_max, y_max]
+        detection_params(), plus the rendering resolution for a PDF
     """
-    height, width = image_shape
-    x_min, y_min, x_max, y_max = bbox
-    
-    return [
-        int((x_min / width) * NORMALIZED_RANGE),
-        int((y_min / height) * NORMALIZED_RANGE),
-        int((x_max / width) * NORMALIZED_RANGE),
-        int((y_max / height) * NORMALIZED_RANGE),
-    ]
+    params = detection_params()
+    if geometry:
+        params['geometry'] = geometry
+    if is_pdf(image_bytes):
+        params['dpi'] = PDF_DPI
+    return params
 
 
-def merge_overlapping_boxes(
-    boxes: List[Dict[str, Any]], 
-    iou_threshold: float = 0.3
-) -> List[Dict[str, Any]]:
+def parse_dirty_rect(value: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
     """
-    Merge overlapping bounding boxes
+    Parse a ?dirty= edited area
     
     Args:
-        boxes: List of detected rooms
-        iou_threshold: IoU threshold for merging
+        value: 'x_min,y_min,x_max,y_max' in 0-1000 coordinates, or None
         
     Returns:
-        List of merged rooms
-    """
-    if len(boxes) <= 1:
-        return boxes
-    
-    # Sort by confidence (keep higher confidence boxes)
-    boxes = sorted(boxes, key=lambda x: x['confidence'], reverse=True)
-    
-    merged = []
-    used = set()
-    
-    for i, box1 in enumerate(boxes):
-        if i in used:
-            continue
-            
-        # Check for overlaps with remaining boxes
-        for j in range(i + 1, len(boxes)):
-            if j in used:
-                continue
-                
-            # Calculate IoU (Intersection over Union)
-            box2 = boxes[j]
-            x1_min, y1_min, x1_max, y1_max = box1['bounding_box']
-            x2_min, y2_min, x2_max, y2_max = box2['bounding_box']
-            
-            # Calculate intersection
-            x_inter_min = max(x1_min, x2_min)
-            y_inter_min = max(y1_min, y2_min)
-            x_inter_max = min(x1_max, x2_max)
-            y_inter_max = min(y1_max, y2_max)
-            
-            if x_inter_max > x_inter_min and y_inter_max > y_inter_min:
-                inter_area = (x_inter_max - x_inter_min) * (y_inter_max - y_inter_min)
-                box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-                box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-                union_area = box1_area + box2_area - inter_area
-                
-                iou = inter_area / union_area if union_area > 0 else 0
-                
-                if iou > iou_threshold:
-                    used.add(j)
+        Tuple of (x_min, y_min, x_max, y_max), or None without a value
         
-        merged.append(box1)
+    Raises:
+        ValueError: Not four integers in range with each min below its max
+    """
+    if not value:
+        return None
     
-    return merged
+    message = f"dirty must be x_min,y_min,x_max,y_max in 0-{NORMALIZED_RANGE} coordinates, got '{value}'"
+    try:
+        dirty_rect = tuple(int(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError(message) from None
+    if len(dirty_rect) != 4 or not all(0 <= part <= NORMALIZED_RANGE for part in dirty_rect):
+        raise ValueError(message)
+    x_min, y_min, x_max, y_max = dirty_rect
+    if x_min >= x_max or y_min >= y_max:
+        raise ValueError(message)
+    return dirty_rect
+
+
+def error_response(status_code: int, error: str, message: str) -> Dict[str, Any]:
+    """API Gateway response for a failed request"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+        },
+        'body': json.dumps({
+            'error': error,
+            'message': message,
+        }),
+    }
 
 
-def detect_rooms(image_bytes: bytes) -> Dict[str, Any]:
+def detect_upload(
+    image_bytes: bytes,
+    stats: Optional[DetectionStats] = None,
+    geometry: Optional[str] = None,
+    prior: Optional[str] = None,
+    dirty_rect: Optional[Tuple[int, int, int, int]] = None
+) -> Tuple[Dict[str, Any], bool, Optional[str]]:
     """
-    Main room detection function
+    Detect rooms in one uploaded image or PDF, reusing cached results
     
     Args:
-        image_bytes: Blueprint image as bytes
+        image_bytes: Image or PDF bytes
+        stats: Collects stage timings and counters (cache_hits on a hit)
+        geometry: Overrides the configured room geometry (see detect_rooms)
+        prior: Result cache key of an earlier version of this image; only
+            the edited region is re-detected (see detect_rooms_incremental)
+        dirty_rect: Edited area in 0-1000 coordinates; without it the image
+            is diffed against the earlier upload, if that is still kept
         
     Returns:
-        Detection results with rooms and metadata
+        Tuple of (detection result, with 'pages' for a PDF; cache hit;
+        result cache key, None without a cache; incremental results have a
+        key of their own)
     """
-    import time
     start_time = time.time()
+    pdf = is_pdf(image_bytes)
     
-    # Load image
-    image = Image.open(BytesIO(image_bytes))
-    image_array = np.array(image)
+    # Reuse the result of an identical earlier upload when cached
+    params = upload_params(image_bytes, geometry)
+    cache_key = make_cache_key(image_bytes, MODEL_VERSION, params) if result_cache else None
+    result = result_cache.get(cache_key) if result_cache else None
+    
+    if result is not None:
+        logger.info(f"Cache hit: {cache_key[:12]}")
+        if stats is not None:
+            stats.count('cache_hits')
+        # Report the time to serve the hit, not the stored time of the original run
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        for entry in result.get('pages', [result]):
+            entry['processing_time_ms'] = elapsed_ms
+        return result, True, cache_key
     
-    logger.info(f"Image loaded: {image_array.shape}")
+    # Earlier result to update, when the edit refers to one that is still cached
+    prior_result = result_cache.get(prior) if prior and result_cache and not pdf else None
+    if prior and prior_result is None:
+        logger.info(f"Earlier result {prior[:12]} not cached, detecting the whole image")
+    
+    # Detect rooms
+    if pdf:
+        result = {'pages': list(detect_pdf_pages(image_bytes, stats=stats, **params))}
+    elif prior_result is not None:
+        # Incremental results only approximate full detection, so they are kept
+        # under their own key (derived from the plain one): a plain upload of
+        # the same image must not be served one
+        cache_key = make_cache_key(cache_key.encode('utf-8'), MODEL_VERSION, {'prior': prior, 'dirty_rect': dirty_rect})
+        stats = stats or DetectionStats()
+        max_side = params.pop('max_side')
+        max_side = MAX_IMAGE_SIDE if max_side is None else max_side
+        with stats.stage('decode'):
+            gray = load_grayscale(image_bytes, max_side)
+            prior_bytes = prior_images.get(prior) if prior_images and dirty_rect is None else None
+            prior_gray = load_grayscale(prior_bytes, max_side) if prior_bytes else None
+        result = detect_rooms_incremental(gray, prior_result['rooms'], dirty_rect, prior_gray, stats=stats, **params)
+        result['processing_time_ms'] = int((time.time() - start_time) * 1000)
+    else:
+        result = detect_rooms(image_bytes, stats=stats, **params)
+    if result_cache and not any('error' in page for page in result.get('pages', [])):
+        result_cache.set(cache_key, result)
+    if prior_images is not None and not pdf:
+        prior_images.set(cache_key, bytes(image_bytes))
+    return result, False, cache_key
+
+
+def detect_batch(
+    uploads: List[Tuple[str, Callable[[], bytes]]],
+    workers: Optional[int] = None,
+    stats: Optional[DetectionStats] = None,
+    geometry: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Detect rooms in many images with a worker pool
     
-    # Preprocess
-    preprocessed = preprocess_image(image_array)
+    A bad image only fails its own entry; the rest of the batch still runs.
     
-    # Detect edges
-    edges = detect_edges(preprocessed)
+    Args:
+        uploads: (file name, loader returning the bytes) per image; loaders
+            run inside the workers, so archives are read lazily
+        workers: Images processed in parallel (None uses BATCH_WORKERS)
+        stats: Stage timings and counters summed over all images
+        geometry: Overrides the configured room geometry (see detect_rooms)
+        
+    Returns:
+        Per-image results in upload order plus aggregate counts and timing
+    """
+    start_time = time.time()
+    workers = workers or BATCH_WORKERS or os.cpu_count() or 1
     
-    # Find contours
-    contours = find_room_contours(edges, preprocessed.shape)
-    logger.info(f"Found {len(contours)} potential rooms")
+    def detect_one(index: int) -> Dict[str, Any]:
+        filename, load = uploads[index]
+        image_start = time.time()
+        try:
+            result, cache_hit, _ = detect_upload(load(), stats, geometry)
+            entry = {**result, 'cache_hit': cache_hit}
+        except Exception as e:
+            logger.error(f"Batch image {index} ({filename}) failed: {str(e)}")
+            entry = {'error': 'Processing failed', 'message': str(e)}
+        entry['processing_time_ms'] = int((time.time() - image_start) * 1000)
+        return {'index': index, 'filename': filename, **entry}
     
-    # Convert to rooms
-    rooms = []
-    for idx, contour in enumerate(contours):
-        bbox = contour_to_bounding_box(contour)
-        confidence = calculate_confidence(contour, edges)
-        normalized_bbox = normalize_coordinates(bbox, preprocessed.shape)
-        
-        rooms.append({
-            'id': f'room_{idx:03d}',
-            'bounding_box': normalized_bbox,
-            'confidence': round(confidence, 2),
-            'name_hint': None,  # Phase 2: Add name detection
-        })
-    
-    # Merge overlapping boxes
-    rooms = merge_overlapping_boxes(rooms)
-    
-    # Sort by size (larger rooms first)
-    rooms.sort(key=lambda r: (
-        (r['bounding_box'][2] - r['bounding_box'][0]) * 
-        (r['bounding_box'][3] - r['bounding_box'][1])
-    ), reverse=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(detect_one, range(len(uploads))))
     
-    processing_time = int((time.time() - start_time) * 1000)
+    image_times = [entry['processing_time_ms'] for entry in results]
+    failed = sum('error' in entry for entry in results)
     
     return {
-        'rooms': rooms,
-        'processing_time_ms': processing_time,
-        'model_version': 'phase_1_opencv',
+        'results': results,
+        'image_count': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'processing_time_ms': int((time.time() - start_time) * 1000),
+        'total_image_time_ms': sum(image_times),
+        'mean_image_time_ms': round(sum(image_times) / len(image_times), 1) if image_times else 0.0,
+        'max_image_time_ms': max(image_times, default=0),
+        'workers': workers,
+        'model_version': MODEL_VERSION,
     }
 
 
-def parse_multipart(body: str, content_type: str) -> bytes:
+def read_batch_uploads(body: bytes, content_type: Optional[str]) -> List[Tuple[str, Callable[[], bytes]]]:
     """
-    Parse multipart/form-data to extract file bytes
+    Collect the images of a batch request
+    
+    Every file part of a multipart body is one image; ZIP archives (as a
+    part, the raw body or a presigned upload) contribute each image inside.
     
     Args:
-        body: Request body as string
+        body: Request body as bytes
         content_type: Content-Type header value
         
     Returns:
-        File bytes
+        List of (file name, loader returning the bytes)
     """
-    # Extract boundary from content type
-    boundary = None
-    for part in content_type.split(';'):
-        part = part.strip()
-        if part.startswith('boundary='):
-            boundary = part.split('=', 1)[1].strip('"')
-            break
-    
-    if not boundary:
-        raise ValueError("No boundary found in content-type")
-    
-    logger.info(f"Parsing multipart with boundary: {boundary}")
-    
-    # Split body by boundary
-    parts = body.split(f'--{boundary}')
+    if 'multipart/form-data' in (content_type or '').lower():
+        files = list(iter_multipart_files(body, content_type))
+    else:
+        files = [('', read_request_image(body, content_type))]
     
-    # Find the file part
-    for part in parts:
-        if not part or part.strip() == '--':
-            continue
-        
-        # Split headers from content
-        if '\r\n\r\n' in part:
-            headers, content = part.split('\r\n\r\n', 1)
-        elif '\n\n' in part:
-            headers, content = part.split('\n\n', 1)
+    uploads = []
+    for filename, data in files:
+        if is_zip(data):
+            uploads.extend(open_zip_images(data))
         else:
-            continue
-        
-        # Check if this part contains a file
-        if 'Content-Disposition' in headers and 'filename' in headers:
-            # Remove trailing boundary markers
-            content = content.split(f'--{boundary}')[0]
-            # Remove trailing newlines
-            content = content.rstrip('\r\n-')
-            
-            logger.info(f"Found file part, content length: {len(content)} bytes")
-            return content.encode('latin-1')  # Preserve binary data
+            uploads.append((filename, lambda data=data: data))
     
-    raise ValueError("No file found in multipart data")
+    if not uploads:
+        raise ValueError("No images found in batch request")
+    if len(uploads) > BATCH_MAX_IMAGES:
+        raise ValueError(f"Batch has {len(uploads)} images, the limit is {BATCH_MAX_IMAGES}")
+    
+    return uploads
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -453,60 +2130,131 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         logger.info("Processing room detection request")
         
         # Parse request body
-        body = event.get('body', '')
-        headers = event.get('headers', {})
+        body = event.get('body') or ''
+        headers = event.get('headers') or {}
         
-        # Get content type (handle case-insensitive headers)
+        # Get content type and accepted response types (handle case-insensitive headers)
         content_type = None
+        accept = None
         for key, value in headers.items():
             if key.lower() == 'content-type':
                 content_type = value
-                break
+            elif key.lower() == 'accept':
+                accept = value
         
         logger.info(f"Content-Type: {content_type}")
         logger.info(f"Is Base64 Encoded: {event.get('isBase64Encoded', False)}")
         logger.info(f"Body length: {len(body)} bytes")
         
-        # Handle base64 encoding from API Gateway
+        # Handle base64 encoding from API Gateway; binary bodies stay bytes from here on
         is_base64 = event.get('isBase64Encoded', False)
         if is_base64:
-            body = base64.b64decode(body).decode('latin-1')
+            body = binascii.a2b_base64(body)  # Decodes the str in place; b64decode copies it to bytes first
+        elif isinstance(body, str):
+            body = body.encode('utf-8' if content_type and 'json' in content_type.lower() else 'latin-1')
+        
+        # ?stats=1 adds stage timings and counters to the response
+        query = event.get('queryStringParameters') or {}
+        include_stats = str(query.get('stats', '')).lower() in ('1', 'true')
+        
+        # ?geometry=obb|polygon adds room outlines (see GEOMETRY_MODES)
+        geometry = query.get('geometry') or None
+        if geometry is not None and geometry not in GEOMETRY_MODES:
+            return error_response(
+                400, 'Invalid parameter', f"geometry must be one of {', '.join(GEOMETRY_MODES)}, got '{geometry}'"
+            )
         
-        # Parse multipart/form-data
-        if content_type and 'multipart/form-data' in content_type:
-            image_bytes = parse_multipart(body, content_type)
+        # ?prior=<X-Result-Key of an earlier version>[&dirty=x1,y1,x2,y2] re-detects only the edit
+        prior = query.get('prior') or None
+        try:
+            dirty_rect = parse_dirty_rect(query.get('dirty'))
+        except ValueError as e:
+            return error_response(400, 'Invalid parameter', str(e))
+        stats = DetectionStats()
+        
+        path = event.get('path') or event.get('rawPath') or ''
+        if path.rstrip('/').endswith('/batch'):
+            # Many images in one call: multipart set and/or ZIP archives
+            uploads = read_batch_uploads(body, content_type)
+        else:
+            image_bytes = read_request_image(body, content_type)
+            uploads = open_zip_images(image_bytes) if is_zip(image_bytes) else None
+        
+        if uploads is not None:
+            result = detect_batch(uploads, stats=stats, geometry=geometry)
+            logger.info(f"Batch complete: {result['succeeded']}/{result['image_count']} images")
+            route = 'batch'
+            content_type = 'application/json'
+            with stats.stage('serialize'):
+                body = json.dumps(result)
         else:
-            # Fallback: assume body is raw image bytes
-            image_bytes = body.encode('latin-1') if isinstance(body, str) else body
+            result, cache_hit, result_key = detect_upload(image_bytes, stats, geometry, prior, dirty_rect)
+            
+            if 'pages' in result:
+                # Multi-page PDFs get one result per page, returned as NDJSON lines
+                logger.info(f"Detection complete: {len(result['pages'])} pages")
+                route = 'pdf'
+                content_type = NDJSON_MEDIA_TYPE
+                with stats.stage('serialize'):
+                    body = ''.join(json.dumps({**page, 'cache_hit': cache_hit}) + '\n' for page in result['pages'])
+            elif accepts_binary(accept):
+                # Packed room columns instead of JSON (see room_encoding.py); stats go in its metadata
+                logger.info(f"Detection complete: {len(result['rooms'])} rooms found")
+                route = 'detect'
+                content_type = ROOMS_MEDIA_TYPE
+                payload = {**result, 'cache_hit': cache_hit}
+                if include_stats:
+                    payload['stats'] = stats.as_dict()
+                with stats.stage('serialize'):
+                    body = binascii.b2a_base64(encode_rooms(payload), newline=False).decode('ascii')
+            else:
+                logger.info(f"Detection complete: {len(result['rooms'])} rooms found")
+                route = 'detect'
+                content_type = 'application/json'
+                with stats.stage('serialize'):
+                    body = json.dumps({**result, 'cache_hit': cache_hit})
         
-        # Detect rooms
-        result = detect_rooms(image_bytes)
+        emit_metrics(stats, route)
+        if include_stats and content_type != ROOMS_MEDIA_TYPE:
+            # Added after serializing, so the serialize stage is included
+            stats_json = json.dumps(stats.as_dict())
+            if content_type == NDJSON_MEDIA_TYPE:
+                body += f'{{"stats": {stats_json}}}\n'  # Trailing line after the pages
+            else:
+                body = f'{body[:-1]}, "stats": {stats_json}}}'
         
-        logger.info(f"Detection complete: {len(result['rooms'])} rooms found")
+        response_headers = {
+            'Content-Type': content_type,
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Vary': 'Accept',  # JSON or binary rooms depending on Accept
+        }
+        if result_cache and route == 'detect':
+            # Lets the client refer to this result when it re-submits an edited version
+            response_headers['X-Result-Key'] = result_key
+            response_headers['Access-Control-Expose-Headers'] = 'X-Result-Key'
+        global _cold_start
+        if _cold_start:
+            # First request in this container: report where init time went
+            _cold_start = False
+            response_headers['X-Init-Timings'] = json.dumps(INIT_TIMINGS)
         
         return {
             'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-            },
-            'body': json.dumps(result),
+            'headers': response_headers,
+            'body': body,
+            'isBase64Encoded': content_type == ROOMS_MEDIA_TYPE,
         }
         
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-            },
-            'body': json.dumps({
-                'error': 'Processing failed',
-                'message': str(e),
-            }),
-        }
+        return error_response(500, 'Processing failed', str(e))
+
 
+_cold_start = True  # Cleared by the first invocation
+if not LAZY_INIT:
+    initialize()
+INIT_TIMINGS['module_ms'] = round((time.perf_counter() - _module_start) * 1000, 1)
+logger.info(f"Init timings: {json.dumps(INIT_TIMINGS)}")
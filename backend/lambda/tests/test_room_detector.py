@@ -0,0 +1,98 @@
+"""
+Tests for room_detector
+
+Run from backend/lambda:
+    python -m pytest tests
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import room_detector  # noqa: E402
+from room_detector import (  # noqa: E402
+    detect_edges, detect_edges_tiled, detect_rooms, detect_rooms_in_image, detect_upload, is_blank,
+    lambda_handler, parse_dirty_rect, preprocess_image,
+)
+from result_cache import MemoryTier, ResultCache  # noqa: E402
+
+
+def make_plan(width: int = 1600, height: int = 1200) -> np.ndarray:
+    """Grayscale floor plan: a grid of rooms, faint long lines crossing it, and scan noise"""
+    rng = np.random.default_rng(0)
+    plan = np.full((height, width), 235, np.uint8)
+    cv2.rectangle(plan, (40, 40), (width - 40, height - 40), 20, 8)
+    for x in range(40, width - 40, 380):
+        cv2.line(plan, (x, 40), (x, height - 40), 20, 6)
+    for y in range(40, height - 40, 290):
+        cv2.line(plan, (40, y), (width - 40, y), 20, 6)
+    # Faint dimension lines, whose edges only survive through hysteresis
+    cv2.line(plan, (0, 150), (width - 1, 700), 195, 2)
+    cv2.line(plan, (100, height - 1), (width - 200, 0), 205, 1)
+    noise = rng.normal(0, 6, plan.shape)
+    return np.clip(plan + noise, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('adaptive', [True, False])
+@pytest.mark.parametrize('tile_size', [256, 500])
+def test_tiled_edges_match_untiled(adaptive, tile_size):
+    preprocessed = preprocess_image(make_plan())
+    untiled = detect_edges(preprocessed, adaptive)
+    tiled = detect_edges_tiled(preprocessed, tile_size, workers=2, adaptive=adaptive)
+    assert np.array_equal(tiled, untiled)
+
+
+def test_tiled_rooms_match_untiled():
+    plan = make_plan()
+    untiled = detect_rooms_in_image(plan, tile_size=0)
+    tiled = detect_rooms_in_image(plan, tile_size=256)
+    assert untiled['rooms']
+    assert tiled['rooms'] == untiled['rooms']
+
+
+def test_blank_sheet_is_blank():
+    assert is_blank(np.full((600, 800), 250, np.uint8))
+
+
+def test_inverted_plan_is_not_blank():
+    inverted = 255 - make_plan()
+    assert not is_blank(inverted)
+    assert len(detect_rooms_in_image(inverted)['rooms']) == len(detect_rooms_in_image(make_plan())['rooms'])
+
+
+def test_plain_upload_after_incremental_gets_full_detection(monkeypatch):
+    monkeypatch.setattr(room_detector, 'result_cache', ResultCache(MemoryTier()))
+    # Rooms apart by more than INCREMENTAL_MARGIN, so an edit stays within one
+    plan = np.full((1200, 1600), 235, np.uint8)
+    for x in range(0, 1600, 400):
+        for y in range(0, 1200, 400):
+            cv2.rectangle(plan, (x + 50, y + 50), (x + 350, y + 350), 20, 8)
+    _, _, prior = detect_upload(cv2.imencode('.png', plan)[1].tobytes())
+
+    cv2.line(plan, (600, 470), (600, 730), 20, 6)  # A partition inside one room
+    edited = cv2.imencode('.png', plan)[1].tobytes()
+    incremental, _, incremental_key = detect_upload(edited, prior=prior, dirty_rect=(365, 385, 385, 615))
+    assert 'incremental' in incremental
+
+    result, cache_hit, cache_key = detect_upload(edited)
+    assert not cache_hit
+    assert cache_key != incremental_key
+    assert 'incremental' not in result
+    assert result['rooms'] == detect_rooms(edited)['rooms']
+
+
+def test_parse_dirty_rect():
+    assert parse_dirty_rect('0,10,1000,20') == (0, 10, 1000, 20)
+    assert parse_dirty_rect(None) is None
+
+
+@pytest.mark.parametrize('dirty', ['1,2,3', 'a,b,c,d', '0,0,1001,10', '-5,0,10,10', '50,0,40,10', '0,10,10,10'])
+def test_handler_rejects_bad_dirty_rect(dirty):
+    response = lambda_handler({'queryStringParameters': {'prior': 'key', 'dirty': dirty}, 'body': ''}, None)
+    assert response['statusCode'] == 400
+    assert 'dirty' in json.loads(response['body'])['message']
@@ -0,0 +1,106 @@
+"""
+PDF blueprint rasterization
+Renders multi-sheet construction sets one page at a time with pdfium, so each
+sheet can be detected as soon as it is rendered
+"""
+from __future__ import annotations
+
+import os
+import logging
+import threading
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through the environment
+PDF_DPI = float(os.getenv('PDF_DPI', '150'))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '200'))
+PDF_MAX_SIDE = int(os.getenv('PDF_MAX_SIDE', '10000'))  # Rendered pixels per side, whatever the DPI
+POINTS_PER_INCH = 72
+PDF_SIGNATURE = b'%PDF-'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# pdfium is not thread-safe, so every call into it is serialized
+_pdfium_lock = threading.Lock()
+
+
+def is_pdf(data: Any) -> bool:
+    """
+    Check whether an upload is a PDF document
+
+    Args:
+        data: Upload as bytes or a memoryview
+
+    Returns:
+        True when the PDF signature appears in the first KB
+    """
+    return bytes(data[:1024]).find(PDF_SIGNATURE) != -1
+
+
+class PdfPages:
+    """Pages of a PDF document, rasterized on demand"""
+
+    def __init__(
+        self,
+        data: Any,
+        dpi: float = PDF_DPI,
+        max_pages: int = PDF_MAX_PAGES,
+        max_side: int = PDF_MAX_SIDE
+    ):
+        """
+        Args:
+            data: PDF document as bytes or a memoryview
+            dpi: Rendering resolution
+            max_pages: Documents with more pages are rejected
+            max_side: Longest rendered side in pixels; large sheets render below dpi
+        """
+        import pypdfium2 as pdfium  # Only needed for PDF uploads
+
+        self.dpi = dpi
+        self.max_side = max_side
+        with _pdfium_lock:
+            self._document = pdfium.PdfDocument(bytes(data))
+            self.page_count = len(self._document)
+
+        if self.page_count > max_pages:
+            self.close()
+            raise ValueError(f"PDF has {self.page_count} pages, the limit is {max_pages}")
+
+        logger.info(f"Opened PDF with {self.page_count} pages at {dpi:g} DPI")
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def render(self, index: int, grayscale: bool = True) -> np.ndarray:
+        """
+        Rasterize one page
+
+        Args:
+            index: Zero-based page number
+            grayscale: Render one 8-bit channel instead of BGR
+
+        Returns:
+            Page image as uint8 array, (height, width) or (height, width, 3) BGR
+        """
+        with _pdfium_lock:
+            page = self._document[index]
+            try:
+                width, height = page.get_size()  # Points
+                scale = min(self.dpi / POINTS_PER_INCH, self.max_side / max(width, height, 1))
+                bitmap = page.render(scale=scale, grayscale=grayscale)
+                # The array is a view of pdfium memory; copy it out before the bitmap is freed
+                image = bitmap.to_numpy().copy()
+                if grayscale and image.ndim == 3:
+                    image = image[:, :, 0]  # Older pypdfium2 keeps a trailing channel axis
+                bitmap.close()
+            finally:
+                page.close()
+        return image
+
+    def close(self) -> None:
+        """Release the pdfium document"""
+        with _pdfium_lock:
+            self._document.close()
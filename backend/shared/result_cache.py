@@ -0,0 +1,274 @@
+"""
+Content-addressed detection result cache
+In-process LRU tier backed by an optional persistent tier (disk directory or SQLite)
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through the environment
+CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')  # none | memory | disk | sqlite
+CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '/tmp/room-detection-cache')
+CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '128'))
+CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def content_digest(data: Any) -> str:
+    """
+    Hex SHA-256 of an upload, for callers that key several caches on one hash
+
+    Args:
+        data: Upload as bytes or any bytes-like object
+
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(image_bytes: bytes, detector_version: str, params: Dict[str, Any]) -> str:
+    """
+    Build a cache key from the image content, detector version and parameters
+
+    Args:
+        image_bytes: Uploaded image as bytes
+        detector_version: Model or detector version string
+        params: Detection parameters that change the result
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(image_bytes)
+    digest.update(b'\0')
+    digest.update(detector_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """In-process LRU bounded by entry count and total encoded size"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+
+            # Evict least recently used entries until both limits hold
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class DiskTier:
+    """One file per entry in a directory, evicting least recently used files by size"""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in self.path.glob('*.json'))
+
+    def _file(self, key: str) -> Path:
+        return self.path / f'{key}.json'
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._file(key)
+        try:
+            value = entry.read_bytes()
+            os.utime(entry)  # Mark as recently used
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            entry = self._file(key)
+            if entry.exists():
+                self._size -= entry.stat().st_size
+
+            # Write then rename so readers never see a partial file
+            tmp = entry.with_suffix('.tmp')
+            tmp.write_bytes(value)
+            tmp.replace(entry)
+            self._size += len(value)
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(
+            ((entry.stat().st_mtime, entry) for entry in self.path.glob('*.json')),
+            key=lambda item: item[0],
+        )
+        for _, entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                entry.unlink()
+                self._size -= size
+            except FileNotFoundError:
+                continue
+
+
+class SQLiteTier:
+    """Single-file SQLite store, evicting least recently used rows by size"""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        db_path = Path(path)
+        if db_path.suffix != '.sqlite':
+            db_path.mkdir(parents=True, exist_ok=True)
+            db_path = db_path / 'results.sqlite'
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+            return bytes(row[0])
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, value, len(value), time.time()),
+            )
+
+            # Drop least recently used rows until the total size fits
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute('SELECT key, size FROM results ORDER BY accessed').fetchall()
+                for old_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute('DELETE FROM results WHERE key = ?', (old_key,))
+                    total -= size
+            self._conn.commit()
+
+
+class ResultCache:
+    """Two-tier cache of JSON-serializable detection results"""
+
+    def __init__(self, memory: Optional[MemoryTier] = None, persistent: Optional[Any] = None):
+        self.memory = memory
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a result, promoting persistent hits into memory
+
+        Args:
+            key: Key from make_cache_key
+
+        Returns:
+            Cached result, or None on a miss
+        """
+        value = self.memory.get(key) if self.memory else None
+
+        if value is None and self.persistent:
+            try:
+                value = self.persistent.get(key)
+            except Exception as e:
+                logger.warning(f"Persistent cache read failed: {str(e)}")
+                value = None
+            if value is not None and self.memory:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a result in every tier
+
+        Args:
+            key: Key from make_cache_key
+            result: JSON-serializable detection result
+        """
+        value = json.dumps(result).encode('utf-8')
+
+        if self.memory:
+            self.memory.set(key, value)
+        if self.persistent:
+            try:
+                self.persistent.set(key, value)
+            except Exception as e:
+                logger.warning(f"Persistent cache write failed: {str(e)}")
+
+
+def cache_from_env() -> Optional[ResultCache]:
+    """
+    Build the cache configured by RESULT_CACHE_* environment variables
+
+    Returns:
+        ResultCache, or None when caching is disabled
+    """
+    if CACHE_BACKEND == 'none':
+        return None
+
+    memory = MemoryTier(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES) if CACHE_MAX_ENTRIES > 0 else None
+
+    persistent = None
+    try:
+        if CACHE_BACKEND == 'disk':
+            persistent = DiskTier(CACHE_PATH, CACHE_MAX_BYTES)
+        elif CACHE_BACKEND == 'sqlite':
+            persistent = SQLiteTier(CACHE_PATH, CACHE_MAX_BYTES)
+    except Exception as e:
+        logger.warning(f"Persistent result cache unavailable, using memory only: {str(e)}")
+
+    logger.info(f"Result cache: backend={CACHE_BACKEND}, max_entries={CACHE_MAX_ENTRIES}, "
+                f"max_bytes={CACHE_MAX_BYTES}")
+    return ResultCache(memory, persistent)
@@ -0,0 +1,172 @@
+"""
+Compact binary encoding of detection results
+Rooms as packed columns instead of a JSON list of dicts, for clients that
+send Accept: application/vnd.room-detection.rooms. JSON stays the default.
+
+Layout (little-endian; every column starts 4-byte aligned, so clients can
+map them without copying, e.g. numpy.frombuffer):
+
+    header    magic b'RDB1', u8 flags (1: polygons), 3 pad bytes,
+              u32 rooms, u32 polygon vertices, u32 metadata bytes
+    ids       u32 per room            number of the 'room_NNN' id
+    offsets   u32 per room + 1        first vertex of each polygon (if polygons)
+    boxes     4 x i16 per room        x_min, y_min, x_max, y_max (0-1000)
+    vertices  2 x i16 per vertex      x, y (0-1000) (if polygons)
+    classes   i16 per room            index into metadata 'classes', -1 for none
+    scores    u8 per room             confidence x 100 (results carry 2 decimals)
+    metadata  UTF-8 JSON              every other result field, plus 'classes'
+"""
+import json
+import struct
+import sys
+from array import array
+from itertools import chain
+from typing import Any, Dict, List, Optional
+
+ROOMS_MEDIA_TYPE = 'application/vnd.room-detection.rooms'
+ROOMS_MAGIC = b'RDB1'
+HEADER = struct.Struct('<4sB3xIII')
+FLAG_POLYGONS = 1
+
+
+def _pack(typecode: str, values: Any) -> bytes:
+    """Pack values as a little-endian array, padded to a 4-byte boundary"""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    data = packed.tobytes()
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _unpack(typecode: str, data: memoryview, offset: int, count: int) -> array:
+    """Read count little-endian values of a column starting at offset"""
+    unpacked = array(typecode)
+    unpacked.frombytes(data[offset:offset + count * unpacked.itemsize])
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    """
+    Content negotiation: whether a client asked for the binary encoding
+
+    Args:
+        accept: Accept header value
+
+    Returns:
+        True when ROOMS_MEDIA_TYPE is accepted at least as strongly as JSON
+    """
+    weights = {}
+    for media_range in (accept or '').split(','):
+        media_type, *params = (part.strip() for part in media_range.split(';'))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[media_type.lower()] = weight
+    binary = weights.get(ROOMS_MEDIA_TYPE, 0.0)
+    return binary > 0 and binary >= weights.get('application/json', 0.0)
+
+
+def encode_rooms(result: Dict[str, Any]) -> bytes:
+    """
+    Encode a detection result (rooms plus metadata) in the binary layout
+
+    Args:
+        result: Result dict with 'rooms' in the API format; rooms carry a
+            'polygon' when detected with obb/polygon geometry
+
+    Returns:
+        Encoded bytes
+    """
+    rooms: List[Dict[str, Any]] = result['rooms']
+    polygons = bool(rooms) and 'polygon' in rooms[0]
+
+    classes: Dict[str, int] = {}
+    class_indices = [
+        -1 if room.get('name_hint') is None else classes.setdefault(room['name_hint'], len(classes))
+        for room in rooms
+    ]
+    metadata = {key: value for key, value in result.items() if key != 'rooms'}
+    metadata['classes'] = list(classes)
+    metadata_bytes = json.dumps(metadata).encode('utf-8')
+
+    columns = [_pack('I', [int(room['id'].rpartition('_')[2]) for room in rooms])]
+    vertex_count = 0
+    if polygons:
+        offsets = [0]
+        for room in rooms:
+            offsets.append(offsets[-1] + len(room['polygon']) // 2)
+        vertex_count = offsets[-1]
+        columns.append(_pack('I', offsets))
+    columns.append(_pack('h', chain.from_iterable(room['bounding_box'] for room in rooms)))
+    if polygons:
+        columns.append(_pack('h', chain.from_iterable(room['polygon'] for room in rooms)))
+    columns.append(_pack('h', class_indices))
+    columns.append(_pack('B', [round(room['confidence'] * 100) for room in rooms]))
+
+    flags = FLAG_POLYGONS if polygons else 0
+    header = HEADER.pack(ROOMS_MAGIC, flags, len(rooms), vertex_count, len(metadata_bytes))
+    return b''.join([header, *columns, metadata_bytes])
+
+
+def decode_rooms(data: bytes) -> Dict[str, Any]:
+    """
+    Decode the binary layout back into a detection result
+
+    Args:
+        data: Bytes from encode_rooms
+
+    Returns:
+        Result dict equal to the JSON response
+
+    Raises:
+        ValueError: If the data is not in the binary layout
+    """
+    data = memoryview(data)
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated room encoding")
+    magic, flags, count, vertex_count, metadata_size = HEADER.unpack_from(data)
+    if magic != ROOMS_MAGIC:
+        raise ValueError("Not a room encoding")
+
+    def padded(size: int) -> int:
+        return size + (-size % 4)
+
+    offset = HEADER.size
+    ids = _unpack('I', data, offset, count)
+    offset += padded(4 * count)
+    if flags & FLAG_POLYGONS:
+        vertex_offsets = _unpack('I', data, offset, count + 1)
+        offset += padded(4 * (count + 1))
+    boxes = _unpack('h', data, offset, 4 * count)
+    offset += padded(8 * count)
+    if flags & FLAG_POLYGONS:
+        vertices = _unpack('h', data, offset, 2 * vertex_count)
+        offset += padded(4 * vertex_count)
+    class_indices = _unpack('h', data, offset, count)
+    offset += padded(2 * count)
+    scores = _unpack('B', data, offset, count)
+    offset += padded(count)
+
+    metadata = json.loads(bytes(data[offset:offset + metadata_size]))
+    classes = metadata.pop('classes')
+
+    rooms = []
+    for index in range(count):
+        room = {
+            'id': f'room_{ids[index]:03d}',
+            'bounding_box': boxes[4 * index:4 * index + 4].tolist(),
+            'confidence': scores[index] / 100,
+            'name_hint': classes[class_indices[index]] if class_indices[index] >= 0 else None,
+        }
+        if flags & FLAG_POLYGONS:
+            room['polygon'] = vertices[2 * vertex_offsets[index]:2 * vertex_offsets[index + 1]].tolist()
+        rooms.append(room)
+
+    return {'rooms': rooms, **metadata}
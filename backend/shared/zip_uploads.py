@@ -0,0 +1,76 @@
+"""
+ZIP archives of blueprint images for batch detection
+Lists the images in an uploaded archive and reads each one only when a
+worker asks for it, so the archive is never extracted as a whole
+"""
+import os
+import zipfile
+import logging
+from io import BytesIO
+from typing import Any, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through the environment
+BATCH_MAX_IMAGES = int(os.getenv('BATCH_MAX_IMAGES', '200'))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', str(1024 * 1024 * 1024)))  # Total uncompressed size
+ZIP_SIGNATURE = b'PK\x03\x04'
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.webp', '.gif')
+IMAGE_EXTENSIONS = RASTER_EXTENSIONS + ('.pdf',)  # For services that rasterize PDF members
+
+
+def is_zip(data: Any) -> bool:
+    """
+    Check whether an upload is a ZIP archive
+
+    Args:
+        data: Upload as bytes or a memoryview
+
+    Returns:
+        True when the data starts with a local file header
+    """
+    return bytes(data[:4]) == ZIP_SIGNATURE
+
+
+def open_zip_images(
+    data: Any,
+    max_images: int = BATCH_MAX_IMAGES,
+    max_bytes: int = BATCH_MAX_BYTES,
+    extensions: Tuple[str, ...] = IMAGE_EXTENSIONS
+) -> List[Tuple[str, Callable[[], bytes]]]:
+    """
+    List the images in a ZIP archive
+
+    Directories, hidden files, macOS resource forks and files without one
+    of the given extensions are skipped.
+
+    Args:
+        data: ZIP archive as bytes, a memoryview or a seekable binary file
+            (read lazily, so it must stay open while loaders run)
+        max_images: Archives with more images are rejected
+        max_bytes: Archives whose images expand beyond this are rejected
+        extensions: Member extensions to detect; RASTER_EXTENSIONS leaves
+            out PDFs for callers that only decode images
+
+    Returns:
+        List of (file name, loader returning the file bytes), in archive order
+    """
+    archive = zipfile.ZipFile(BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data)
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and not os.path.basename(info.filename).startswith('.')
+        and info.filename.lower().endswith(extensions)
+    ]
+
+    if len(entries) > max_images:
+        raise ValueError(f"Archive has {len(entries)} images, the limit is {max_images}")
+    total = sum(info.file_size for info in entries)
+    if total > max_bytes:
+        raise ValueError(f"Archive expands to {total} bytes, the limit is {max_bytes}")
+
+    logger.info(f"ZIP archive with {len(entries)} images, {total} bytes uncompressed")
+
+    # ZipFile serializes reads of the shared file, so loaders may run in any thread
+    return [(info.filename, lambda info=info: archive.read(info)) for info in entries]
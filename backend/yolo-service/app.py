@@ -3,15 +3,38 @@ YOLO Room Detection Service - FastAPI Application
 Uses Roboflow Direct API for room detection (lightweight, no SDK)
 """
 import os
+import sys
 import io
+import json
 import time
+import random
+import asyncio
 import logging
 import base64
-from typing import List, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from contextlib import ExitStack, asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from PIL import Image
-import requests
+import httpx
+
+from batching import MicroBatcher, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS
+from onnx_backend import OnnxBackend, ONNX_MODEL_PATH, ONNX_CONFIDENCE, flatten_image
+# Modules shared with the Lambda live in backend/shared; the image copies them next to this file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
+from pdf_pages import PdfPages, PDF_DPI, NDJSON_MEDIA_TYPE, is_pdf
+from zip_uploads import BATCH_MAX_IMAGES, RASTER_EXTENSIONS, is_zip, open_zip_images
+from result_cache import cache_from_env, content_digest, make_cache_key
+from room_encoding import ROOMS_MEDIA_TYPE, accepts_binary, encode_rooms
+from single_flight import SingleFlightCache
+from upload_limits import UploadLimitMiddleware, open_upload, upload_buffer
+from metrics import (
+    CACHE_LOOKUPS, IMAGE_SIDE, PREDICTION_LOOKUPS, UPLOAD_BYTES, UPSTREAM_IN_FLIGHT, UPSTREAM_RESPONSES,
+    MetricsMiddleware, render_metrics, timed,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -20,13 +43,499 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Constants
+NORMALIZED_RANGE = 1000
+ROBOFLOW_API_KEY = os.getenv("ROBOFLOW_API_KEY", "S6mAH8NfqXgodc6InODR")
+ROBOFLOW_MODEL_ID = "room-detection-r0fta/1"
+ROBOFLOW_API_URL = os.getenv("ROBOFLOW_API_URL", f"https://detect.roboflow.com/{ROBOFLOW_MODEL_ID}")
+ROBOFLOW_CONFIDENCE = 25  # Minimum prediction confidence (percent)
+
+# Room geometry: 'box' reports axis-aligned boxes only; 'obb' and 'polygon' add a flat
+# [x1, y1, x2, y2, ...] 'polygon' per room (the model's outline points when it returns
+# them, as OBB and segmentation models do, else the box corners)
+GEOMETRY_MODES = ("box", "obb", "polygon")
+GEOMETRY_PATTERN = f"^({'|'.join(GEOMETRY_MODES)})$"
+
+# Inference backend: "roboflow" (hosted API) or "onnx" (local model, see onnx_backend.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "roboflow")
+
+# Upload preparation: images larger than this (longest side) are downscaled before upload
+MODEL_INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", "640"))
+UPLOAD_JPEG_QUALITY = 90
+
+# PDF sets: pages detected at once per request (rendering itself is serialized)
+PDF_PAGE_CONCURRENCY = int(os.getenv("PDF_PAGE_CONCURRENCY", "4"))
+
+# Batch requests: images detected at once per request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Upstream HTTP client settings
+ROBOFLOW_TIMEOUT = float(os.getenv("ROBOFLOW_TIMEOUT", "10"))  # Seconds per attempt
+ROBOFLOW_MAX_CONCURRENCY = int(os.getenv("ROBOFLOW_MAX_CONCURRENCY", "16"))  # In-flight calls per worker
+ROBOFLOW_MAX_RETRIES = int(os.getenv("ROBOFLOW_MAX_RETRIES", "2"))
+ROBOFLOW_RETRY_BACKOFF = float(os.getenv("ROBOFLOW_RETRY_BACKOFF", "0.25"))  # Seconds, doubled per retry
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Shared keep-alive client and concurrency limit, created on first use
+http_client: Optional[httpx.AsyncClient] = None
+upstream_slots: Optional[asyncio.Semaphore] = None
+
+# Local ONNX model, loaded at startup when INFERENCE_BACKEND=onnx, and its batcher
+onnx_model: Optional[OnnxBackend] = None
+onnx_batcher: Optional[MicroBatcher] = None
+
+# Detection results keyed by image content, model and parameters
+result_cache = cache_from_env()
+
+# Roboflow predictions, shared by concurrent identical uploads and reused for a TTL
+prediction_cache = SingleFlightCache()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared connection-pooled client, creating it on first use"""
+    global http_client, upstream_slots
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=ROBOFLOW_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=ROBOFLOW_MAX_CONCURRENCY,
+                max_keepalive_connections=ROBOFLOW_MAX_CONCURRENCY,
+            ),
+        )
+        upstream_slots = asyncio.Semaphore(ROBOFLOW_MAX_CONCURRENCY)
+    return http_client
+
+
+def get_onnx_model() -> OnnxBackend:
+    """Return the local ONNX model, loading it on first use"""
+    global onnx_model
+    if onnx_model is None:
+        onnx_model = OnnxBackend(ONNX_MODEL_PATH)
+    return onnx_model
+
+
+def backend_info() -> Tuple[str, str]:
+    """
+    Describe the configured inference backend
+    
+    Returns:
+        Tuple of (model version, service name)
+    """
+    if INFERENCE_BACKEND == "onnx":
+        return os.path.basename(ONNX_MODEL_PATH), "onnx-local"
+    return ROBOFLOW_MODEL_ID, "roboflow-direct-api"
+
+
+def detection_params() -> Dict[str, Any]:
+    """
+    Parameters that change detection output; part of the result cache key
+    
+    Returns:
+        Parameter dict for the configured backend
+    """
+    if INFERENCE_BACKEND == "onnx":
+        return {"backend": "onnx", "confidence": ONNX_CONFIDENCE}
+    return {"backend": "roboflow", "confidence": ROBOFLOW_CONFIDENCE, "input_size": MODEL_INPUT_SIZE}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the upstream client (or load the local model) at startup and clean up at shutdown"""
+    global http_client, onnx_batcher
+    if INFERENCE_BACKEND == "onnx":
+        model = await run_in_threadpool(get_onnx_model)
+        if BATCH_MAX_SIZE > 1 and model.batch_size == 1:
+            # Batches would run image by image anyway; the batcher would only add its wait
+            logger.warning("ONNX model has a fixed batch size of 1, micro-batching disabled "
+                           "(re-export with dynamic=True to enable it)")
+        elif BATCH_MAX_SIZE > 1:
+            onnx_batcher = MicroBatcher(model.infer_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+            onnx_batcher.start()
+    else:
+        get_http_client()
+    yield
+    if onnx_batcher is not None:
+        await onnx_batcher.stop()
+        onnx_batcher = None
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+def prepare_upload(image_bytes: bytes) -> Tuple[bytes, int, int, int, int]:
+    """
+    Prepare an upload for inference without a needless decode/re-encode
+    
+    Only the image header is read to get the dimensions. JPEGs that already
+    fit MODEL_INPUT_SIZE are forwarded untouched; everything else is
+    downscaled (JPEG DCT scaling first, when possible) and encoded once.
+    
+    Args:
+        image_bytes: Uploaded image as bytes, or a memory map of it (see upload_buffer)
+        
+    Returns:
+        Tuple of (JPEG bytes to send, sent width, sent height,
+        original width, original height)
+    """
+    image = Image.open(open_upload(image_bytes))
+    original_width, original_height = image.size
+    IMAGE_SIDE.observe(max(image.size))
+    
+    if image.format == 'JPEG' and max(image.size) <= MODEL_INPUT_SIZE and image.mode in ('RGB', 'L'):
+        return image_bytes, original_width, original_height, original_width, original_height
+    
+    with timed('decode'):
+        # Let the JPEG decoder skip DCT coefficients it would only throw away
+        if image.format == 'JPEG':
+            image.draft('RGB', (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+        
+        # Transparency onto white paper, 16-bit scans down to 8 bits
+        image = flatten_image(image)
+        
+        if max(image.size) > MODEL_INPUT_SIZE:
+            image.thumbnail((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        image.load()  # Decode here even when nothing above touched the pixels
+    
+    buffered = io.BytesIO()
+    with timed('encode'):
+        image.save(buffered, format="JPEG", quality=UPLOAD_JPEG_QUALITY)
+    width, height = image.size
+    return buffered.getvalue(), width, height, original_width, original_height
+
+
+async def call_roboflow(img_base64: str) -> httpx.Response:
+    """
+    Call the Roboflow Direct API with bounded concurrency and retries
+    
+    Transport errors, timeouts and 429/5xx responses are retried with
+    exponential backoff and jitter.
+    
+    Args:
+        img_base64: Base64-encoded image
+        
+    Returns:
+        Final upstream response
+    """
+    client = get_http_client()
+    
+    async with upstream_slots:
+        with UPSTREAM_IN_FLIGHT.track_inprogress(), timed('upstream'):
+            for attempt in range(ROBOFLOW_MAX_RETRIES + 1):
+                try:
+                    response = await client.post(
+                        ROBOFLOW_API_URL,
+                        params={
+                            "api_key": ROBOFLOW_API_KEY,
+                            "confidence": ROBOFLOW_CONFIDENCE,
+                        },
+                        content=img_base64,
+                        headers={
+                            "Content-Type": "application/x-www-form-urlencoded"
+                        },
+                    )
+                except httpx.TransportError as e:
+                    UPSTREAM_RESPONSES.labels('error').inc()
+                    if attempt == ROBOFLOW_MAX_RETRIES:
+                        raise
+                    logger.warning(f"Roboflow request failed (attempt {attempt + 1}): {str(e)}")
+                else:
+                    UPSTREAM_RESPONSES.labels(str(response.status_code)).inc()
+                    if response.status_code not in RETRYABLE_STATUS_CODES or attempt == ROBOFLOW_MAX_RETRIES:
+                        return response
+                    logger.warning(f"Roboflow returned {response.status_code} (attempt {attempt + 1})")
+                
+                await asyncio.sleep(ROBOFLOW_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def predict_roboflow(image_bytes: bytes) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Run detection through the Roboflow Direct API
+    
+    Args:
+        image_bytes: Uploaded image as bytes
+        
+    Returns:
+        Tuple of (predictions, width, height) in the pixel space of the sent image
+    """
+    # Validate API key
+    if not ROBOFLOW_API_KEY:
+        raise HTTPException(
+            status_code=503,
+            detail="Roboflow API key not configured"
+        )
+    
+    # Forward or downscale the upload off the event loop
+    upload_bytes, img_width, img_height, original_width, original_height = await run_in_threadpool(
+        prepare_upload, image_bytes
+    )
+    
+    logger.info(f"Image size: {original_width}x{original_height}, "
+                f"sending {img_width}x{img_height} ({len(upload_bytes)} bytes)")
+    
+    # Convert image to base64
+    with timed('encode'):
+        img_base64 = base64.b64encode(upload_bytes).decode('utf-8')
+    
+    # Call Roboflow Direct API
+    logger.info(f"Calling Roboflow API: {ROBOFLOW_MODEL_ID}")
+    response = await call_roboflow(img_base64)
+    
+    if response.status_code != 200:
+        logger.error(f"Roboflow API error: {response.status_code} - {response.text}")
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Roboflow API error: {response.text}"
+        )
+    
+    with timed('postprocess'):
+        predictions = response.json().get('predictions', [])
+    logger.info(f"Roboflow returned {len(predictions)} predictions")
+    return predictions, img_width, img_height
+
+
+async def predict_roboflow_shared(
+    image_bytes: bytes,
+    digest: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Run detection through Roboflow, coalescing identical uploads
+    
+    Concurrent requests for the same image and confidence share one upstream
+    call, and its predictions are reused for PREDICTION_CACHE_TTL seconds.
+    Unlike the result cache, this also covers requests that arrive while the
+    first is still in flight.
+    
+    Args:
+        image_bytes: Uploaded image as bytes, or a memory map of it (see upload_buffer)
+        digest: content_digest of image_bytes, when the caller already has it
+        
+    Returns:
+        Tuple of (predictions, width, height) in the pixel space of the sent image
+    """
+    if digest is None:
+        digest = await run_in_threadpool(content_digest, image_bytes)
+    key = make_cache_key(digest.encode('ascii'), ROBOFLOW_MODEL_ID, detection_params())
+    # The shared call can outlive this request and the upload map it came from, so it
+    # gets its own bytes (taken before the call is scheduled; bytes are not copied)
+    (predictions, img_width, img_height), source = await prediction_cache.get(
+        key, lambda: predict_roboflow(bytes(image_bytes))
+    )
+    PREDICTION_LOOKUPS.labels(source).inc()
+    if source != 'miss':
+        logger.info(f"Reused Roboflow predictions ({source})")
+    return predictions, img_width, img_height
+
+
+def timed_call(stage: str, function, *args):
+    """Call function(*args), observing it as one detection stage (for use through the threadpool)"""
+    with timed(stage):
+        return function(*args)
+
+
+def predict_onnx_staged(model: OnnxBackend, image_bytes: bytes) -> Tuple[List[Dict[str, Any]], int, int]:
+    """OnnxBackend.predict with each stage observed in the stage histogram"""
+    with timed('decode'):
+        tensor, meta = model.preprocess(image_bytes)
+    with timed('inference'):
+        output = model.infer_batch([tensor])[0]
+    with timed('postprocess'):
+        return model.postprocess(output, meta)
+
+
+async def predict_onnx(image_bytes: bytes, digest: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Run detection with the local ONNX model, off the event loop
+    
+    Decoding, letterboxing, box decoding and NMS run per request in the
+    threadpool; the forward pass goes through the micro-batcher when
+    batching is enabled.
+    
+    Args:
+        image_bytes: Uploaded image as bytes
+        digest: Unused; local inference is not shared between requests
+        
+    Returns:
+        Tuple of (predictions, width, height) in the pixel space of the decoded image
+    """
+    model = get_onnx_model()
+    if onnx_batcher is None:
+        predictions, img_width, img_height = await run_in_threadpool(predict_onnx_staged, model, image_bytes)
+    else:
+        tensor, meta = await run_in_threadpool(timed_call, 'decode', model.preprocess, image_bytes)
+        with timed('inference'):
+            output = await onnx_batcher.submit(tensor)  # Includes the batching wait
+        predictions, img_width, img_height = await run_in_threadpool(
+            timed_call, 'postprocess', model.postprocess, output, meta
+        )
+    logger.info(f"ONNX model returned {len(predictions)} predictions")
+    return predictions, img_width, img_height
+
+
+def normalize_points(points: List[Tuple[float, float]], img_width: int, img_height: int) -> List[int]:
+    """
+    Normalize outline points to the 0-1000 range as a flat coordinate list
+    
+    Args:
+        points: (x, y) vertices in image pixels
+        img_width: Width of the image the points refer to
+        img_height: Height of the image the points refer to
+        
+    Returns:
+        Flat list [x1, y1, x2, y2, ...]
+    """
+    flat = []
+    for x, y in points:
+        flat.append(min(max(int((x / img_width) * NORMALIZED_RANGE), 0), NORMALIZED_RANGE))
+        flat.append(min(max(int((y / img_height) * NORMALIZED_RANGE), 0), NORMALIZED_RANGE))
+    return flat
+
+
+def predictions_to_rooms(
+    predictions: List[Dict[str, Any]],
+    img_width: int,
+    img_height: int,
+    geometry: str = "box"
+) -> List[Dict[str, Any]]:
+    """
+    Convert backend predictions to the API room format
+    
+    Args:
+        predictions: Roboflow-style predictions in image pixels
+        img_width: Width of the image the predictions refer to
+        img_height: Height of the image the predictions refer to
+        geometry: 'box', or 'obb'/'polygon' to add each room's outline
+        
+    Returns:
+        Rooms with 0-1000 normalized bounding boxes, highest confidence first
+    """
+    rooms = []
+    
+    for idx, pred in enumerate(predictions):
+        # Roboflow returns: x, y (center), width, height
+        x_center = pred['x']
+        y_center = pred['y']
+        width = pred['width']
+        height = pred['height']
+        confidence = pred.get('confidence', 0.0)
+        
+        # Convert to corner coordinates
+        x1 = int(x_center - width / 2)
+        y1 = int(y_center - height / 2)
+        x2 = int(x_center + width / 2)
+        y2 = int(y_center + height / 2)
+        
+        # Normalize to 0-1000 range (predictions are in the backend's image pixels)
+        normalized_bbox = [
+            int((x1 / img_width) * NORMALIZED_RANGE),
+            int((y1 / img_height) * NORMALIZED_RANGE),
+            int((x2 / img_width) * NORMALIZED_RANGE),
+            int((y2 / img_height) * NORMALIZED_RANGE),
+        ]
+        
+        room = {
+            'id': f'room_{idx:03d}',
+            'bounding_box': normalized_bbox,
+            'confidence': round(confidence, 2),
+            'name_hint': pred.get('class', None),
+        }
+        if geometry != "box":
+            # OBB and segmentation models return their outline as points
+            points = [(point['x'], point['y']) for point in pred.get('points') or []]
+            points = points or [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            room['polygon'] = normalize_points(points, img_width, img_height)
+        rooms.append(room)
+    
+    # Sort by confidence (highest first)
+    rooms.sort(key=lambda r: r['confidence'], reverse=True)
+    return rooms
+
+
+def render_page_jpeg(pages: PdfPages, index: int) -> bytes:
+    """
+    Rasterize one PDF page into a JPEG upload for the inference backend
+    
+    Args:
+        pages: Open PDF document
+        index: Zero-based page number
+        
+    Returns:
+        JPEG bytes
+    """
+    image = pages.render(index, grayscale=False)  # BGR
+    buffer = io.BytesIO()
+    Image.fromarray(image[:, :, ::-1]).save(buffer, format='JPEG', quality=UPLOAD_JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+async def stream_pdf_pages(pages: PdfPages, model_version: str, service: str, geometry: str = "box"):
+    """
+    Detect rooms page by page and yield NDJSON lines in page order
+    
+    Up to PDF_PAGE_CONCURRENCY pages are rendered and detected at once; a
+    page is written as soon as it and every page before it are done.
+    
+    Args:
+        pages: Open PDF document, closed when the stream ends
+        model_version: Reported model version
+        service: Reported service name
+        geometry: Room geometry (see GEOMETRY_MODES)
+        
+    Yields:
+        One JSON line per page; failed pages carry error and message
+    """
+    slots = asyncio.Semaphore(PDF_PAGE_CONCURRENCY)
+    
+    async def detect_page(index: int) -> Dict[str, Any]:
+        async with slots:
+            start_time = time.time()
+            try:
+                image_bytes = await run_in_threadpool(render_page_jpeg, pages, index)
+                predictions, img_width, img_height = await INFERENCE_BACKENDS[INFERENCE_BACKEND](image_bytes)
+                with timed('postprocess'):
+                    result = {'rooms': predictions_to_rooms(predictions, img_width, img_height, geometry)}
+            except Exception as e:
+                logger.error(f"Page {index + 1} failed: {str(e)}")
+                result = {'error': 'Processing failed', 'message': str(e)}
+            return {
+                'page': index + 1,
+                'page_count': len(pages),
+                **result,
+                'processing_time_ms': int((time.time() - start_time) * 1000),
+                'model_version': model_version,
+                'service': service,
+            }
+    
+    tasks = [asyncio.create_task(detect_page(index)) for index in range(len(pages))]
+    try:
+        for task in tasks:
+            yield json.dumps(await task) + '\n'
+    finally:
+        # Client went away or the stream finished: stop pending pages, then free the document
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_in_threadpool(pages.close)
+
+
+# Backends take (image bytes, optional content digest) and return Roboflow-style
+# predictions (x, y center, width, height, confidence, class)
+INFERENCE_BACKENDS = {
+    "roboflow": predict_roboflow_shared,
+    "onnx": predict_onnx,
+}
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="YOLO Room Detection Service (Roboflow Direct API)",
     description="High-accuracy room detection using Roboflow Direct API",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Upload size cap and concurrency limit (inside CORS, so refusals still carry CORS headers)
+app.add_middleware(UploadLimitMiddleware, paths=["/detect", "/detect/batch", "/detect/pdf"])
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,60 +545,130 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Constants
-NORMALIZED_RANGE = 1000
-ROBOFLOW_API_KEY = os.getenv("ROBOFLOW_API_KEY", "S6mAH8NfqXgodc6InODR")
-ROBOFLOW_MODEL_ID = "room-detection-r0fta/1"
-ROBOFLOW_API_URL = f"https://detect.roboflow.com/{ROBOFLOW_MODEL_ID}"
+# Request latency, status and in-flight metrics (outermost, so CORS handling is timed too)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for ECS"""
+    model_version, service = backend_info()
     return {
         "status": "healthy",
-        "model": ROBOFLOW_MODEL_ID,
-        "service": "roboflow-direct-api",
-        "api_configured": bool(ROBOFLOW_API_KEY)
+        "model": model_version,
+        "service": service,
+        "api_configured": bool(ROBOFLOW_API_KEY),
+        "cache": {
+            "hits": result_cache.hits,
+            "misses": result_cache.misses,
+        } if result_cache else None,
+        "batching": onnx_batcher.stats() if onnx_batcher else None
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with service information"""
+    model_version, _ = backend_info()
     return {
         "service": "YOLO Room Detection Service (Roboflow Direct API)",
         "version": "2.0.0",
-        "model": ROBOFLOW_MODEL_ID,
-        "provider": "Roboflow Direct API",
+        "model": model_version,
+        "provider": "Local ONNX Runtime" if INFERENCE_BACKEND == "onnx" else "Roboflow Direct API",
         "endpoints": {
             "health": "/health",
-            "detect": "/detect (POST)"
+            "metrics": "/metrics",
+            "detect": "/detect (POST)",
+            "detect_batch": "/detect/batch (POST, images and/or ZIP archives)",
+            "detect_pdf": "/detect/pdf (POST, NDJSON stream)"
         }
     }
 
 
+async def detect_image(
+    image_bytes: bytes,
+    model_version: str,
+    service: str,
+    geometry: str = "box"
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run the configured backend on one image, reusing cached results
+    
+    Args:
+        image_bytes: Uploaded image as bytes, or a memory map of it (see upload_buffer)
+        model_version: Reported model version; part of the cache key
+        service: Reported service name
+        geometry: Room geometry (see GEOMETRY_MODES); part of the cache key
+        
+    Returns:
+        Tuple of (result with rooms and metadata, cache hit)
+    """
+    start_time = time.time()
+    UPLOAD_BYTES.observe(len(image_bytes))
+    
+    # One hash of the upload keys both the result cache and shared upstream calls;
+    # hashing a large upload and disk/SQLite lookups would stall the event loop
+    digest = await run_in_threadpool(content_digest, image_bytes)
+    
+    # Reuse the result of an identical earlier upload when cached
+    cache_key = None
+    if result_cache:
+        params = detection_params()
+        if geometry != "box":
+            params["geometry"] = geometry  # Box results keep their existing keys
+        cache_key = make_cache_key(digest.encode('ascii'), model_version, params)
+        cached = await run_in_threadpool(result_cache.get, cache_key)
+        CACHE_LOOKUPS.labels('miss' if cached is None else 'hit').inc()
+        if cached is not None:
+            cached['processing_time_ms'] = int((time.time() - start_time) * 1000)
+            return cached, True
+    
+    predictions, img_width, img_height = await INFERENCE_BACKENDS[INFERENCE_BACKEND](image_bytes, digest)
+    
+    # Convert predictions to our API format
+    with timed('postprocess'):
+        rooms = predictions_to_rooms(predictions, img_width, img_height, geometry)
+    
+    result = {
+        'rooms': rooms,
+        'processing_time_ms': int((time.time() - start_time) * 1000),
+        'model_version': model_version,
+        'service': service
+    }
+    if result_cache:
+        await run_in_threadpool(result_cache.set, cache_key, result)
+    
+    return result, False
+
+
 @app.post("/detect")
-async def detect_rooms(file: UploadFile = File(...)):
+async def detect_rooms(
+    file: UploadFile = File(...),
+    geometry: str = Query("box", pattern=GEOMETRY_PATTERN),
+    accept: Optional[str] = Header(None)
+):
     """
-    Detect rooms in a blueprint image using Roboflow Direct API
+    Detect rooms in a blueprint image using the configured inference backend
     
     Args:
         file: Blueprint image file (PNG, JPG, etc.)
+        geometry: 'box', or 'obb'/'polygon' to add each room's outline
+        accept: Accept header; ROOMS_MEDIA_TYPE selects the binary encoding
         
     Returns:
-        JSON response with detected rooms and metadata
+        JSON response with detected rooms and metadata, or the same result
+        as packed room columns (see room_encoding.py)
     """
-    start_time = time.time()
+    model_version, service = backend_info()
     
     try:
-        # Validate API key
-        if not ROBOFLOW_API_KEY:
-            raise HTTPException(
-                status_code=503,
-                detail="Roboflow API key not configured"
-            )
-        
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(
@@ -97,94 +676,25 @@ async def detect_rooms(file: UploadFile = File(...)):
                 detail=f"Invalid file type: {file.content_type}. Must be an image."
             )
         
-        # Read image
+        # Use the spooled upload in place rather than reading it into memory
         logger.info(f"Processing upload: {file.filename}")
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        img_width, img_height = image.size
-        
-        logger.info(f"Image size: {img_width}x{img_height}")
-        
-        # Convert image to base64
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-        
-        # Call Roboflow Direct API
-        logger.info(f"Calling Roboflow API: {ROBOFLOW_MODEL_ID}")
-        response = requests.post(
-            ROBOFLOW_API_URL,
-            params={
-                "api_key": ROBOFLOW_API_KEY,
-                "confidence": 25,
-            },
-            data=img_base64,
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded"
-            },
-            timeout=10
-        )
+        with upload_buffer(file) as image_bytes:
+            result, cache_hit = await detect_image(image_bytes, model_version, service, geometry)
         
-        if response.status_code != 200:
-            logger.error(f"Roboflow API error: {response.status_code} - {response.text}")
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Roboflow API error: {response.text}"
-            )
+        logger.info(f"Detection complete for {file.filename}: {len(result['rooms'])} rooms found "
+                    f"in {result['processing_time_ms']}ms (cache hit: {cache_hit})")
         
-        result = response.json()
-        predictions = result.get('predictions', [])
-        logger.info(f"Roboflow returned {len(predictions)} predictions")
-        
-        # Convert Roboflow predictions to our API format
-        rooms = []
-        
-        for idx, pred in enumerate(predictions):
-            # Roboflow returns: x, y (center), width, height
-            x_center = pred['x']
-            y_center = pred['y']
-            width = pred['width']
-            height = pred['height']
-            confidence = pred.get('confidence', 0.0)
-            
-            # Convert to corner coordinates
-            x1 = int(x_center - width / 2)
-            y1 = int(y_center - height / 2)
-            x2 = int(x_center + width / 2)
-            y2 = int(y_center + height / 2)
-            
-            # Normalize to 0-1000 range
-            normalized_bbox = [
-                int((x1 / img_width) * NORMALIZED_RANGE),
-                int((y1 / img_height) * NORMALIZED_RANGE),
-                int((x2 / img_width) * NORMALIZED_RANGE),
-                int((y2 / img_height) * NORMALIZED_RANGE),
-            ]
-            
-            rooms.append({
-                'id': f'room_{idx:03d}',
-                'bounding_box': normalized_bbox,
-                'confidence': round(confidence, 2),
-                'name_hint': pred.get('class', None),
-            })
-        
-        # Sort by confidence (highest first)
-        rooms.sort(key=lambda r: r['confidence'], reverse=True)
-        
-        processing_time = int((time.time() - start_time) * 1000)
-        
-        logger.info(f"Detection complete: {len(rooms)} rooms found in {processing_time}ms")
-        
-        return {
-            'rooms': rooms,
-            'processing_time_ms': processing_time,
-            'model_version': ROBOFLOW_MODEL_ID,
-            'service': 'roboflow-direct-api'
-        }
+        if accepts_binary(accept):
+            return Response(
+                content=encode_rooms({**result, 'cache_hit': cache_hit}),
+                media_type=ROOMS_MEDIA_TYPE,
+                headers={'Vary': 'Accept'},
+            )
+        return {**result, 'cache_hit': cache_hit}
         
     except HTTPException:
         raise
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Roboflow API request failed: {str(e)}")
         raise HTTPException(status_code=503, detail=f"Roboflow API unavailable: {str(e)}")
     except Exception as e:
@@ -192,6 +702,130 @@ async def detect_rooms(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 
+@app.post("/detect/batch")
+async def detect_batch(
+    files: List[UploadFile] = File(...),
+    geometry: str = Query("box", pattern=GEOMETRY_PATTERN)
+):
+    """
+    Detect rooms in many blueprint images in one call
+    
+    Each uploaded file is an image, or a ZIP archive whose images are all
+    detected. Up to BATCH_CONCURRENCY images run at once; a bad image only
+    fails its own entry.
+    
+    Args:
+        files: Blueprint images and/or ZIP archives
+        geometry: 'box', or 'obb'/'polygon' to add each room's outline
+        
+    Returns:
+        Per-image results in upload order plus aggregate counts and timing
+    """
+    start_time = time.time()
+    model_version, service = backend_info()
+    
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    # Spooled uploads are used in place and stay open until every image is detected
+    with ExitStack() as buffers:
+        # Expand archives into (file name, loader) entries; archive members are read lazily
+        uploads = []
+        for file in files:
+            data = buffers.enter_context(upload_buffer(file))
+            if is_zip(data):
+                try:
+                    # ZipFile reads members from the spooled file; PDFs (see /detect/pdf) are not picked up
+                    uploads.extend(open_zip_images(file.file, extensions=RASTER_EXTENSIONS))
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid archive {file.filename}: {str(e)}")
+            else:
+                uploads.append((file.filename, lambda data=data: data))
+        
+        if not uploads:
+            raise HTTPException(status_code=400, detail="No images found in batch request")
+        if len(uploads) > BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch has {len(uploads)} images, the limit is {BATCH_MAX_IMAGES}"
+            )
+        
+        async def detect_one(index: int) -> Dict[str, Any]:
+            filename, load = uploads[index]
+            async with slots:
+                image_start = time.time()
+                try:
+                    result, cache_hit = await detect_image(
+                        await run_in_threadpool(load), model_version, service, geometry
+                    )
+                    entry = {**result, 'cache_hit': cache_hit}
+                except Exception as e:
+                    logger.error(f"Batch image {index} ({filename}) failed: {str(e)}")
+                    entry = {'error': 'Processing failed', 'message': str(e)}
+                entry['processing_time_ms'] = int((time.time() - image_start) * 1000)
+            return {'index': index, 'filename': filename, **entry}
+        
+        results = await asyncio.gather(*(detect_one(index) for index in range(len(uploads))))
+    
+    image_times = [entry['processing_time_ms'] for entry in results]
+    failed = sum('error' in entry for entry in results)
+    logger.info(f"Batch complete: {len(results) - failed}/{len(results)} images")
+    
+    return {
+        'results': results,
+        'image_count': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'processing_time_ms': int((time.time() - start_time) * 1000),
+        'total_image_time_ms': sum(image_times),
+        'mean_image_time_ms': round(sum(image_times) / len(image_times), 1),
+        'max_image_time_ms': max(image_times),
+        'concurrency': BATCH_CONCURRENCY,
+        'model_version': model_version,
+        'service': service
+    }
+
+
+@app.post("/detect/pdf")
+async def detect_pdf(
+    file: UploadFile = File(...),
+    dpi: float = Query(PDF_DPI, gt=0, le=600),
+    geometry: str = Query("box", pattern=GEOMETRY_PATTERN)
+):
+    """
+    Detect rooms on every sheet of a multi-page PDF blueprint set
+    
+    Pages are rendered lazily and streamed back as NDJSON, one line per page
+    in page order, so the first sheet arrives before the last is rendered.
+    
+    Args:
+        file: PDF document
+        dpi: Rendering resolution (pages are also capped at MODEL_INPUT_SIZE)
+        geometry: 'box', or 'obb'/'polygon' to add each room's outline
+        
+    Returns:
+        application/x-ndjson stream of per-page results
+    """
+    model_version, service = backend_info()
+    
+    logger.info(f"Processing PDF upload: {file.filename}")
+    # PdfPages keeps its own copy of the document, so the spooled upload is only needed while opening it
+    with upload_buffer(file) as pdf_data:
+        if not is_pdf(pdf_data):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type: {file.content_type}. Must be a PDF."
+            )
+        
+        try:
+            # The model sees MODEL_INPUT_SIZE pixels, so never render pages larger than that
+            pages = await run_in_threadpool(PdfPages, pdf_data, dpi, max_side=MODEL_INPUT_SIZE)
+        except Exception as e:
+            logger.error(f"Could not open PDF {file.filename}: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {str(e)}")
+    
+    return StreamingResponse(stream_pdf_pages(pages, model_version, service, geometry), media_type=NDJSON_MEDIA_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", "8080"))
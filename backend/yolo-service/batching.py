@@ -0,0 +1,154 @@
+"""
+Dynamic micro-batching for in-process model inference
+Collects concurrent requests for a few milliseconds (or until a batch is full),
+runs them as one batched call in a worker thread and fans results back out
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))  # 1 disables batching
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """Queue that groups submitted items into batches for a synchronous batch function"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS
+    ):
+        """
+        Args:
+            run_batch: Blocking function mapping a list of items to a list of results
+            max_batch_size: Largest batch passed to run_batch
+            max_wait_ms: Longest time the first item of a batch waits for company
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    def start(self) -> None:
+        """Start the batching worker on the running event loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching worker; items still queued or running fail with RuntimeError"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result
+
+        Args:
+            item: Input for run_batch
+
+        Returns:
+            The result run_batch produced for this item
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        """Wait for one item, then gather more into batch until it is full or the wait expires"""
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self) -> None:
+        batch: List[Tuple[Any, asyncio.Future, float]] = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                await self._run_batch(batch)
+        except asyncio.CancelledError:
+            # Stopped: fail the batch being collected or run and everything still queued
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            error = RuntimeError("Batching worker stopped")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            raise
+
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        """Run one collected batch and resolve its futures"""
+        loop = asyncio.get_running_loop()
+
+        # Callers that gave up (e.g. client disconnected) are dropped from the batch
+        batch[:] = [entry for entry in batch if not entry[1].cancelled()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            delay = started - enqueued
+            self.total_queue_delay += delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = await loop.run_in_executor(None, self.run_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Batching metrics since startup
+
+        Returns:
+            Batch count, mean batch size and fill rate, queueing delay in ms
+        """
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "fill_rate": round(self.items / (self.batches * self.max_batch_size), 3) if self.batches else 0.0,
+            "mean_queue_delay_ms": round(self.total_queue_delay / self.items * 1000, 2) if self.items else 0.0,
+            "max_queue_delay_ms": round(self.max_queue_delay * 1000, 2),
+        }
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: upstream Roboflow calls with request coalescing and the prediction cache
+
+Starts a mock Roboflow endpoint that counts calls, and the YOLO service
+in-process with the result cache disabled. Several users then submit the
+same set of blueprints at the same moment, in a few waves spaced apart.
+Each configuration runs the same load:
+
+- none: every request calls upstream (predict_roboflow directly)
+- coalesce: single flight only (prediction cache TTL 0)
+- coalesce+ttl: single flight plus the TTL prediction cache
+
+Reports upstream calls, the reduction against none, throughput and latency.
+
+Usage:
+    python benchmarks/bench_coalescing.py --users 8 --blueprints 10 --waves 3 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from load_test import MOCK_PORT, SERVICE_PORT, start_server  # noqa: E402
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_counting_mock(latency: float):
+    """Mock inference server answering after a fixed delay; returns (app, call counter)"""
+    mock = FastAPI()
+    calls = {"count": 0}
+
+    @mock.post("/{model:path}")
+    async def infer(model: str, request: Request):
+        await request.body()
+        calls["count"] += 1
+        await asyncio.sleep(latency)
+        return {"predictions": [{"x": 320, "y": 240, "width": 200, "height": 150, "confidence": 0.91, "class": "room"}]}
+
+    return mock, calls
+
+
+def make_blueprint(index: int) -> bytes:
+    """A distinct small JPEG per index"""
+    image = Image.new("RGB", (640, 480), "white")
+    ImageDraw.Draw(image).rectangle([20 + index, 20, 400, 300 + index], outline="black", width=4)
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+async def run_waves(users: int, blueprints, waves: int, gap: float, connections: int):
+    """Every user submits every blueprint at once, waves times; return latencies, wall time and errors"""
+    url = f"http://127.0.0.1:{SERVICE_PORT}/detect"
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=connections)) as client:
+        async def one(image_bytes: bytes):
+            nonlocal errors
+            start = time.perf_counter()
+            response = await client.post(url, files={"file": ("plan.jpg", image_bytes, "image/jpeg")})
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+        start = time.perf_counter()
+        for wave in range(waves):
+            if wave:
+                await asyncio.sleep(gap)
+            await asyncio.gather(*(one(image_bytes) for image_bytes in blueprints for _ in range(users)))
+        wall = time.perf_counter() - start
+
+    return latencies, wall, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstream calls with and without request coalescing")
+    parser.add_argument("--users", type=int, default=8, help="Users submitting each blueprint at once")
+    parser.add_argument("--blueprints", type=int, default=10, help="Distinct blueprints per wave")
+    parser.add_argument("--waves", type=int, default=3, help="Rounds of identical submissions")
+    parser.add_argument("--gap", type=float, default=1.0, help="Seconds between waves")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock upstream latency in seconds")
+    parser.add_argument("--connections", type=int, default=32, help="Client connections (requests beyond wait)")
+    args = parser.parse_args()
+
+    # Point the service at the mock and disable the result cache, so only upstream sharing is measured
+    os.environ["ROBOFLOW_API_URL"] = f"http://127.0.0.1:{MOCK_PORT}/room-detection-r0fta/1"
+    os.environ["RESULT_CACHE_BACKEND"] = "none"
+    sys.path.insert(0, str(SERVICE_DIR))
+    import logging
+    logging.disable(logging.INFO)
+    import app as service
+    from single_flight import SingleFlightCache
+
+    mock, calls = make_counting_mock(args.latency)
+    start_server(mock, MOCK_PORT)
+    start_server(service.app, SERVICE_PORT)
+
+    blueprints = [make_blueprint(index) for index in range(args.blueprints)]
+    requests = args.users * args.blueprints * args.waves
+    print(f"{args.users} users x {args.blueprints} blueprints x {args.waves} waves ({requests} requests), "
+          f"upstream latency {args.latency * 1000:.0f}ms")
+    print(f"{'mode':<13} {'upstream':>9} {'reduction':>10} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+
+    modes = {
+        "none": (lambda image_bytes, digest=None: service.predict_roboflow(image_bytes), None),
+        "coalesce": (service.predict_roboflow_shared, SingleFlightCache(ttl=0)),
+        "coalesce+ttl": (service.predict_roboflow_shared, SingleFlightCache()),
+    }
+    baseline = None
+    for mode, (backend, cache) in modes.items():
+        service.INFERENCE_BACKENDS["roboflow"] = backend
+        service.prediction_cache = cache
+        calls["count"] = 0
+        latencies, wall, errors = asyncio.run(
+            run_waves(args.users, blueprints, args.waves, args.gap, args.connections)
+        )
+        baseline = baseline or calls["count"]
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{mode:<13} {calls['count']:>9} {1 - calls['count'] / baseline:>10.1%} "
+              f"{len(latencies) / wall:>7.1f} {statistics.median(latencies) * 1000:>8.0f} "
+              f"{p99 * 1000:>8.0f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
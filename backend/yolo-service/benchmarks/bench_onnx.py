@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the local ONNX inference backend
+
+Runs an exported YOLOv8 ONNX model over the bundled validation images and
+reports per-stage latency (decode + letterbox, inference, decode + NMS)
+and end-to-end percentiles.
+
+Usage:
+    python benchmarks/bench_onnx.py --model ../../training/room_detection/yolov8_rooms_v1/weights/best.onnx
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from onnx_backend import OnnxBackend  # noqa: E402
+
+DATASET_DIR = (
+    Path(__file__).resolve().parents[3] / 'training' / 'Room Detection.v2-version-2.yolov8-obb'
+)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the local ONNX backend')
+    parser.add_argument('--model', required=True, help='Path to the exported ONNX model')
+    parser.add_argument('--split', default='valid', choices=['train', 'valid', 'test'])
+    parser.add_argument('--limit', type=int, default=100, help='Max images to process')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed runs before measuring')
+    args = parser.parse_args()
+
+    backend = OnnxBackend(args.model)
+    paths = sorted((DATASET_DIR / args.split / 'images').glob('*.jpg'))[:args.limit]
+    if not paths:
+        raise SystemExit(f"No images found under {DATASET_DIR / args.split}")
+
+    images = [path.read_bytes() for path in paths]
+    for image_bytes in images[:args.warmup]:
+        backend.predict(image_bytes)
+
+    stages = {'preprocess': [], 'inference': [], 'postprocess': [], 'total': []}
+    detections = 0
+
+    for image_bytes in images:
+        start = time.perf_counter()
+        tensor, meta = backend.preprocess(image_bytes)
+        prepared = time.perf_counter()
+
+        output = backend.infer_batch([tensor])[0]
+        inferred = time.perf_counter()
+
+        predictions, _, _ = backend.postprocess(output, meta)
+        done = time.perf_counter()
+
+        detections += len(predictions)
+        stages['preprocess'].append(prepared - start)
+        stages['inference'].append(inferred - prepared)
+        stages['postprocess'].append(done - inferred)
+        stages['total'].append(done - start)
+
+    print(f"{len(images)} images from '{args.split}', model {backend.model_version} "
+          f"({backend.input_size}px), {detections} detections")
+    print(f"{'stage':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, values in stages.items():
+        print(f"{stage:<12} {statistics.mean(values) * 1000:>9.1f} "
+              f"{percentile(values, 0.5) * 1000:>9.1f} {percentile(values, 0.95) * 1000:>9.1f}")
+    print(f"throughput: {len(images) / sum(stages['total']):.1f} images/s on 1 worker")
+
+
+if __name__ == '__main__':
+    main()
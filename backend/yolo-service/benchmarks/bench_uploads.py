@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: service memory under concurrent large uploads
+
+Starts a mock Roboflow endpoint in-process and the YOLO service as a
+uvicorn subprocess (so its memory is measured on its own), then fires
+concurrent large PNG uploads at /detect. Repeats for each UPLOAD_CONCURRENCY
+setting (0 disables the limiter) and reports the service's peak RSS
+(VmHWM), throughput, latency and responses by status.
+
+Linux only (reads /proc/<pid>/status).
+
+Usage:
+    python benchmarks/bench_uploads.py --requests 32 --clients 32 --side 4000 --limits 0 2 8
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from load_test import MOCK_PORT, SERVICE_PORT, make_mock_app, start_server  # noqa: E402
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+
+def make_upload(side: int) -> bytes:
+    """A noisy (barely compressible) PNG blueprint stand-in, side x side pixels"""
+    rng = np.random.default_rng(0)
+    pixels = np.full((side, side, 3), 255, dtype=np.uint8)
+    pixels[::2] = rng.integers(0, 255, (side // 2 + side % 2, side, 3), dtype=np.uint8)
+    buffered = io.BytesIO()
+    Image.fromarray(pixels).save(buffered, format="PNG", compress_level=1)
+    return buffered.getvalue()
+
+
+def peak_rss_mb(pid: int) -> float:
+    """Peak resident set size of a process, in MB"""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_service(limit: int, max_bytes: int) -> subprocess.Popen:
+    """Run the service with the given upload limits and wait until it answers /health"""
+    env = {
+        **os.environ,
+        "ROBOFLOW_API_URL": f"http://127.0.0.1:{MOCK_PORT}/room-detection-r0fta/1",
+        "RESULT_CACHE_BACKEND": "none",
+        "UPLOAD_CONCURRENCY": str(limit),
+        "UPLOAD_MAX_BYTES": str(max_bytes),
+        "UPLOAD_QUEUE_TIMEOUT": "300",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(SERVICE_PORT), "--log-level", "warning"],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    while True:
+        try:
+            if httpx.get(f"http://127.0.0.1:{SERVICE_PORT}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+
+async def run_uploads(total: int, clients: int, image_bytes: bytes):
+    """Send total uploads from clients concurrent connections; return latencies, wall time and statuses"""
+    url = f"http://127.0.0.1:{SERVICE_PORT}/detect"
+    slots = asyncio.Semaphore(clients)
+    latencies, statuses = [], Counter()
+
+    async with httpx.AsyncClient(timeout=600, limits=httpx.Limits(max_connections=clients)) as client:
+        async def one():
+            async with slots:
+                start = time.perf_counter()
+                response = await client.post(url, files={"file": ("plan.png", image_bytes, "image/png")})
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - start
+
+    return latencies, wall, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service memory under concurrent large uploads")
+    parser.add_argument("--requests", type=int, default=32, help="Total uploads per run")
+    parser.add_argument("--clients", type=int, default=32, help="Uploads sent at once")
+    parser.add_argument("--side", type=int, default=4000, help="Upload image side in pixels")
+    parser.add_argument("--limits", type=int, nargs="+", default=[0, 2, 8], help="UPLOAD_CONCURRENCY settings")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock upstream latency in seconds")
+    args = parser.parse_args()
+
+    image_bytes = make_upload(args.side)
+    start_server(make_mock_app(args.latency), MOCK_PORT)
+
+    print(f"{args.requests} uploads of {len(image_bytes) / 2 ** 20:.1f} MB ({args.side}px PNG), "
+          f"{args.clients} clients, upstream latency {args.latency * 1000:.0f}ms")
+    print(f"{'limit':>6} {'peak RSS MB':>12} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for limit in args.limits:
+        process = start_service(limit, max_bytes=2 * len(image_bytes))
+        try:
+            baseline = peak_rss_mb(process.pid)
+            latencies, wall, statuses = asyncio.run(run_uploads(args.requests, args.clients, image_bytes))
+            peak = peak_rss_mb(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{limit or 'none':>6} {peak:>12.0f} {len(latencies) / wall:>7.1f} "
+              f"{statistics.median(latencies) * 1000:>8.0f} {p99 * 1000:>8.0f}  {dict(statuses)} "
+              f"(idle {baseline:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent /detect throughput against a local mock inference server
+
+Starts a mock Roboflow endpoint (fixed latency, canned predictions) and the
+YOLO service in-process, then fires concurrent uploads at /detect. Runs the
+service twice: once with a blocking upstream call that reproduces the old
+requests.post path ("before") and once with the pooled async client ("after").
+
+Usage:
+    python benchmarks/load_test.py --requests 200 --concurrency 32 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from PIL import Image
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+MOCK_PORT = 18081
+SERVICE_PORT = 18080
+
+
+def make_mock_app(latency: float) -> FastAPI:
+    """Mock inference server answering every POST after a fixed delay"""
+    mock = FastAPI()
+
+    @mock.post("/{model:path}")
+    async def infer(model: str, request: Request):
+        await request.body()
+        await asyncio.sleep(latency)
+        return {
+            "predictions": [
+                {"x": 320, "y": 240, "width": 200, "height": 150, "confidence": 0.91, "class": "room"},
+                {"x": 120, "y": 100, "width": 80, "height": 60, "confidence": 0.62, "class": "room"},
+            ]
+        }
+
+    return mock
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    """Run a uvicorn server in a background thread and wait until it is up"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def blocking_call_roboflow(service):
+    """The previous upstream call: a blocking HTTP request inside the event loop"""
+    async def call(img_base64: str) -> httpx.Response:
+        url = (f"{service.ROBOFLOW_API_URL}?api_key={service.ROBOFLOW_API_KEY}"
+               f"&confidence={service.ROBOFLOW_CONFIDENCE}")
+        request = urllib.request.Request(
+            url,
+            data=img_base64.encode("utf-8"),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        with urllib.request.urlopen(request, timeout=10) as upstream:
+            return httpx.Response(upstream.status, content=upstream.read())
+    return call
+
+
+async def run_load(total: int, concurrency: int, image_bytes: bytes):
+    """Send total uploads with at most concurrency in flight; return latencies and wall time"""
+    url = f"http://127.0.0.1:{SERVICE_PORT}/detect"
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one():
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                response = await client.post(url, files={"file": ("plan.jpg", image_bytes, "image/jpeg")})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - start
+
+    return latencies, wall, errors
+
+
+def report(label: str, latencies, wall: float, errors: int):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{label:<8} {len(latencies) / wall:>10.1f} {p50:>10.0f} {p99:>10.0f} {errors:>7}")
+    return len(latencies) / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /detect load test against a mock upstream")
+    parser.add_argument("--requests", type=int, default=200, help="Total uploads per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Uploads in flight at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock upstream latency in seconds")
+    args = parser.parse_args()
+
+    # Point the service at the mock and disable result caching before importing it
+    os.environ["ROBOFLOW_API_URL"] = f"http://127.0.0.1:{MOCK_PORT}/room-detection-r0fta/1"
+    os.environ["RESULT_CACHE_BACKEND"] = "none"
+    os.environ.setdefault("ROBOFLOW_MAX_CONCURRENCY", str(args.concurrency))
+    sys.path.insert(0, str(SERVICE_DIR))
+    import logging
+    logging.disable(logging.INFO)
+    import app as service
+
+    buffered = io.BytesIO()
+    Image.new("RGB", (640, 480), "white").save(buffered, format="JPEG")
+    image_bytes = buffered.getvalue()
+
+    start_server(make_mock_app(args.latency), MOCK_PORT)
+    start_server(service.app, SERVICE_PORT)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency * 1000:.0f}ms")
+    print(f"{'client':<8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>7}")
+
+    async_call = service.call_roboflow
+    service.call_roboflow = blocking_call_roboflow(service)
+    before = report("before", *asyncio.run(run_load(args.requests, args.concurrency, image_bytes)))
+
+    service.call_roboflow = async_call
+    after = report("after", *asyncio.run(run_load(args.requests, args.concurrency, image_bytes)))
+
+    print(f"throughput gain: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Prometheus metrics for the YOLO service
+Request and per-stage latency histograms, in-flight gauges, upstream status
+codes, cache hits and upload sizes, exposed at /metrics.
+
+Every update is a lock and a few additions on in-process counters, so the
+metrics stay on in production. Values are per process (the service runs
+one uvicorn worker per container).
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Bucket bounds: seconds, bytes and pixels
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UPLOAD_BYTES_BUCKETS = tuple(2 ** power * 1024 for power in range(4, 17, 2))  # 16 KB .. 64 MB
+IMAGE_SIDE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384)
+
+REQUEST_SECONDS = Histogram(
+    'yolo_request_duration_seconds', 'HTTP request latency, until the response body is sent',
+    ['method', 'path'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter('yolo_requests_total', 'HTTP requests by response status', ['method', 'path', 'status'])
+REQUESTS_IN_FLIGHT = Gauge('yolo_requests_in_flight', 'HTTP requests being handled', ['path'])
+
+STAGE_SECONDS = Histogram(
+    'yolo_stage_duration_seconds',
+    'Detection stage latency (decode, encode, upstream, inference, postprocess)',
+    ['stage'], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge('yolo_upstream_in_flight', 'Roboflow calls holding an upstream slot')
+UPSTREAM_RESPONSES = Counter(
+    'yolo_upstream_responses_total', 'Roboflow attempts by status code (error: no response)', ['status'],
+)
+CACHE_LOOKUPS = Counter('yolo_cache_lookups_total', 'Result cache lookups', ['result'])
+PREDICTION_LOOKUPS = Counter(
+    'yolo_prediction_lookups_total', 'Roboflow prediction lookups (hit, coalesced, miss: upstream call)', ['result'],
+)
+
+UPLOAD_BYTES = Histogram('yolo_upload_bytes', 'Size of images sent for detection', buckets=UPLOAD_BYTES_BUCKETS)
+IMAGE_SIDE = Histogram('yolo_image_side_pixels', 'Longest side of uploaded images', buckets=IMAGE_SIDE_BUCKETS)
+UPLOADS_WAITING = Gauge('yolo_uploads_waiting', 'Uploads waiting for an upload slot before their body is read')
+UPLOAD_REJECTIONS = Counter(
+    'yolo_upload_rejections_total', 'Uploads refused by the upload limits (too_large, busy)', ['reason'],
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the enclosed block in the stage latency histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Current metrics in the Prometheus text format
+
+    Returns:
+        Tuple of (payload bytes, content type)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight count per route
+
+    Paths are labelled by route template; anything else counts as "other",
+    which keeps label cardinality bounded. Streaming responses are timed
+    until their last chunk is sent.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self._paths: Optional[Set[str]] = None
+
+    def route_path(self, scope: Dict[str, Any]) -> str:
+        if self._paths is None:
+            self._paths = {route.path for route in scope['app'].routes}
+        return scope['path'] if scope['path'] in self._paths else 'other'
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        path = self.route_path(scope)
+        status = 500  # Reported if the app fails before starting a response
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        in_flight = REQUESTS_IN_FLIGHT.labels(path)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_SECONDS.labels(scope['method'], path).observe(time.perf_counter() - start)
+            REQUESTS.labels(scope['method'], path, str(status)).inc()
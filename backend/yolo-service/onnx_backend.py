@@ -0,0 +1,262 @@
+"""
+Local ONNX inference backend for the YOLO service
+Runs the model exported by training/scripts/train_yolo.py (model.export(format='onnx'))
+in-process on CPU with onnxruntime
+"""
+import os
+import io
+import ast
+import logging
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "models/best.onnx")
+ONNX_CONFIDENCE = float(os.getenv("ONNX_CONFIDENCE", "0.25"))  # Same default as the Roboflow call
+ONNX_IOU_THRESHOLD = float(os.getenv("ONNX_IOU_THRESHOLD", "0.45"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 lets onnxruntime pick
+LETTERBOX_COLOR = (114, 114, 114)  # Ultralytics padding value
+
+
+def flatten_image(image: Image.Image) -> Image.Image:
+    """
+    Bring an uploaded image to 8-bit RGB or grayscale the way a printed sheet looks
+
+    Transparency is flattened onto white paper instead of black, and 16-bit
+    scans keep their top 8 bits rather than being clipped at 255.
+
+    Args:
+        image: Opened (possibly not yet decoded) image
+
+    Returns:
+        Image in mode RGB or L
+    """
+    if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode in ('I', 'I;16', 'I;16B', 'I;16L'):
+        return image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    if image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+
+def letterbox(image: Image.Image, size: int) -> Tuple[np.ndarray, float, int, int]:
+    """
+    Resize keeping aspect ratio and pad to a square model input
+
+    Args:
+        image: RGB image
+        size: Model input side length
+
+    Returns:
+        Tuple of (CHW float32 array in 0-1, scale ratio, x padding, y padding)
+    """
+    width, height = image.size
+    ratio = min(size / width, size / height)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.Resampling.BILINEAR)
+
+    pad_x = int(round((size - new_width) / 2 - 0.1))
+    pad_y = int(round((size - new_height) / 2 - 0.1))
+    canvas = Image.new('RGB', (size, size), LETTERBOX_COLOR)
+    canvas.paste(image, (pad_x, pad_y))
+
+    tensor = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return tensor, ratio, pad_x, pad_y
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy NMS over xyxy boxes
+
+    Args:
+        boxes: Array of shape (n, 4) with (x1, y1, x2, y2) rows
+        scores: Array of shape (n,)
+        iou_threshold: Boxes overlapping a kept box above this IoU are dropped
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    order = np.argsort(-scores, kind='stable')
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+
+        inter_w = np.clip(np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-9)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_predictions(
+    output: np.ndarray,
+    ratio: float,
+    pad_x: int,
+    pad_y: int,
+    image_size: Tuple[int, int],
+    class_names: Dict[int, str],
+    confidence: float = ONNX_CONFIDENCE,
+    iou_threshold: float = ONNX_IOU_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Decode one YOLOv8 detection output into Roboflow-style predictions
+
+    Args:
+        output: Raw output of shape (4 + num_classes, num_anchors)
+        ratio: Letterbox scale ratio
+        pad_x: Letterbox x padding
+        pad_y: Letterbox y padding
+        image_size: Size of the image before letterboxing (width, height)
+        class_names: Class index to name mapping
+        confidence: Minimum class score
+        iou_threshold: Per-class NMS IoU threshold
+
+    Returns:
+        Predictions with x, y (center), width, height in image pixels,
+        confidence and class
+    """
+    rows = output.T  # (num_anchors, 4 + num_classes)
+    class_scores = rows[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(rows)), class_ids]
+
+    mask = scores > confidence
+    if not mask.any():
+        return []
+    rows, class_ids, scores = rows[mask], class_ids[mask], scores[mask]
+
+    # Center format in letterboxed pixels -> corners in image pixels
+    width, height = image_size
+    cx, cy, w, h = rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    boxes -= (pad_x, pad_y, pad_x, pad_y)
+    boxes /= ratio
+    boxes = np.clip(boxes, 0, (width, height, width, height))
+
+    # Per-class NMS by offsetting each class into its own coordinate range
+    offsets = class_ids[:, None].astype(np.float64) * (max(width, height) + 1)
+    keep = non_max_suppression(boxes + offsets, scores, iou_threshold)
+
+    return [
+        {
+            'x': float((boxes[i, 0] + boxes[i, 2]) / 2),
+            'y': float((boxes[i, 1] + boxes[i, 3]) / 2),
+            'width': float(boxes[i, 2] - boxes[i, 0]),
+            'height': float(boxes[i, 3] - boxes[i, 1]),
+            'confidence': float(scores[i]),
+            'class': class_names.get(int(class_ids[i]), str(int(class_ids[i]))),
+        }
+        for i in keep
+    ]
+
+
+class OnnxBackend:
+    """YOLOv8 ONNX model running on CPU with onnxruntime"""
+
+    def __init__(self, model_path: str = ONNX_MODEL_PATH):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.model_version = os.path.basename(model_path)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        side = model_input.shape[2]
+        self.input_size = side if isinstance(side, int) else 640
+
+        # Exports without dynamic=True have a fixed batch dimension of 1
+        batch = model_input.shape[0]
+        self.batch_size = batch if isinstance(batch, int) else None
+
+        # Ultralytics stores class names as a dict literal in the model metadata
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        self.class_names = ast.literal_eval(names) if names else {0: 'room'}
+
+        logger.info(f"Loaded ONNX model {model_path}: input {self.input_size}px, "
+                    f"batch {self.batch_size or 'dynamic'}, classes {self.class_names}")
+
+    def preprocess(self, image_bytes: bytes) -> Tuple[np.ndarray, Tuple[float, int, int, Tuple[int, int]]]:
+        """
+        Decode and letterbox an uploaded image
+
+        Args:
+            image_bytes: Uploaded image as bytes
+
+        Returns:
+            Tuple of (CHW input tensor, (ratio, pad_x, pad_y, decoded image size))
+        """
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.format == 'JPEG':
+            # Decode at reduced size when the model will downscale anyway
+            image.draft('RGB', (self.input_size, self.input_size))
+        image = flatten_image(image).convert('RGB')
+
+        tensor, ratio, pad_x, pad_y = letterbox(image, self.input_size)
+        return tensor, (ratio, pad_x, pad_y, image.size)
+
+    def infer_batch(self, tensors: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Run one forward pass over several preprocessed images
+
+        Models exported with a fixed batch size of 1 are run image by image.
+
+        Args:
+            tensors: CHW input tensors from preprocess
+
+        Returns:
+            Raw outputs of shape (4 + num_classes, num_anchors), one per tensor
+        """
+        if self.batch_size == 1:
+            return [self.session.run(None, {self.input_name: tensor[None]})[0][0] for tensor in tensors]
+        return list(self.session.run(None, {self.input_name: np.stack(tensors)})[0])
+
+    def postprocess(
+        self,
+        output: np.ndarray,
+        meta: Tuple[float, int, int, Tuple[int, int]]
+    ) -> Tuple[List[Dict[str, Any]], int, int]:
+        """
+        Decode a raw output into predictions
+
+        Args:
+            output: Raw output from infer_batch
+            meta: Letterbox metadata from preprocess
+
+        Returns:
+            Tuple of (predictions in decoded image pixels, decoded width, decoded height)
+        """
+        ratio, pad_x, pad_y, (width, height) = meta
+        return decode_predictions(output, ratio, pad_x, pad_y, (width, height), self.class_names), width, height
+
+    def predict(self, image_bytes: bytes) -> Tuple[List[Dict[str, Any]], int, int]:
+        """
+        Run detection on an uploaded image
+
+        Args:
+            image_bytes: Uploaded image as bytes
+
+        Returns:
+            Tuple of (predictions in decoded image pixels, decoded width, decoded height)
+        """
+        tensor, meta = self.preprocess(image_bytes)
+        return self.postprocess(self.infer_batch([tensor])[0], meta)
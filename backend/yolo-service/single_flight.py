@@ -0,0 +1,87 @@
+"""
+Request coalescing with a short-lived result cache
+Concurrent calls for the same key share one in-flight fetch (single flight),
+and successful results are kept for a TTL so repeats shortly after skip the
+fetch entirely. Used in front of the Roboflow upstream, where several users
+submitting the same blueprint would otherwise each pay for a call.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))  # Seconds, 0 disables caching
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "256"))
+
+
+class SingleFlightCache:
+    """Coalesces concurrent fetches per key and caches their results for a TTL"""
+
+    def __init__(self, ttl: float = PREDICTION_CACHE_TTL, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            ttl: Seconds a result is reused; 0 only coalesces concurrent calls
+            max_entries: Cached results kept, least recently used evicted first
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def _cached(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, value: Any) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Return the result for key, fetching it at most once at a time
+
+        The fetch runs as its own task, so a caller that disconnects does
+        not cancel it for the others waiting on it. Failures reach every
+        waiter and are not cached.
+
+        Args:
+            key: Identity of the result (e.g. from make_cache_key)
+            fetch: Coroutine function producing the result
+
+        Returns:
+            Tuple of (result, source): source is 'hit' (cached), 'coalesced'
+            (shared another caller's fetch) or 'miss' (fetched)
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            return entry[1], 'hit'
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), 'coalesced'
+
+        task = asyncio.ensure_future(fetch())
+        self._in_flight[key] = task
+
+        def finish(done: asyncio.Task) -> None:
+            self._in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                self._store(key, done.result())
+
+        task.add_done_callback(finish)
+        return await asyncio.shield(task), 'miss'
@@ -0,0 +1,166 @@
+"""
+Bounded memory for image uploads
+An ASGI middleware caps upload size and the number of uploads handled at
+once, and upload_buffer hands the spooled upload to detection without
+reading it into memory.
+
+Starlette already spools multipart files to a SpooledTemporaryFile, which
+moves to disk past 1 MB; the limits make sure only UPLOAD_CONCURRENCY
+bodies (and their decoded images) are held at a time. Uploads waiting for a
+slot are not read, so TCP flow control pushes back on the clients.
+"""
+import io
+import os
+import json
+import mmap
+import asyncio
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Sequence, Union
+
+from fastapi import UploadFile
+
+from metrics import UPLOAD_REJECTIONS, UPLOADS_WAITING
+
+# Configuration
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))  # Whole request body
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))  # Uploads handled at once, 0 for no limit
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "30"))  # Seconds to wait for a slot
+
+# Smaller uploads are read into memory; larger ones are memory-mapped from the spool file
+MMAP_MIN_BYTES = 1024 * 1024
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware limiting request body size and concurrency on upload routes
+
+    A Content-Length over the cap is refused with 413 before the body is
+    read; bodies without one are counted as they arrive and refused once
+    they pass it. Each request holds a slot until its response is sent;
+    requests that cannot get one within the queue timeout get 503.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        paths: Sequence[str],
+        max_bytes: int = UPLOAD_MAX_BYTES,
+        concurrency: int = UPLOAD_CONCURRENCY,
+        queue_timeout: float = UPLOAD_QUEUE_TIMEOUT
+    ):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+        self.queue_timeout = queue_timeout
+        self.slots = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope['headers'])
+        try:
+            content_length = int(headers.get(b'content-length', 0))
+        except ValueError:
+            await send_error(send, 400, "Invalid Content-Length header")
+            return
+        if content_length > self.max_bytes:
+            UPLOAD_REJECTIONS.labels('too_large').inc()
+            await send_error(send, 413, f"Upload of {content_length} bytes exceeds the {self.max_bytes} byte limit")
+            return
+
+        if self.slots is None:
+            await self.limit_body(scope, receive, send)
+            return
+
+        UPLOADS_WAITING.inc()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            UPLOAD_REJECTIONS.labels('busy').inc()
+            await send_error(send, 503, "Too many uploads in progress", {'Retry-After': '1'})
+            return
+        finally:
+            UPLOADS_WAITING.dec()
+        try:
+            await self.limit_body(scope, receive, send)
+        finally:
+            self.slots.release()
+
+    async def limit_body(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        """Run the app, answering 413 instead once the body grows past the cap"""
+        received = 0
+        too_large = False
+        started = False
+
+        async def counted_receive() -> Dict[str, Any]:
+            nonlocal received, too_large
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    too_large = True
+                    return {'type': 'http.disconnect'}  # Stops the body parser
+            return message
+
+        async def guarded_send(message: Dict[str, Any]) -> None:
+            nonlocal started
+            if too_large and not started:
+                return  # Drop the app's error for the cut-off body; the 413 follows
+            started = started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            await self.app(scope, counted_receive, guarded_send)
+        except Exception:
+            if not too_large or started:
+                raise
+        if too_large and not started:
+            UPLOAD_REJECTIONS.labels('too_large').inc()
+            await send_error(send, 413, f"Upload exceeds the {self.max_bytes} byte limit")
+
+
+async def send_error(send: Callable, status: int, detail: str, headers: Optional[Dict[str, str]] = None) -> None:
+    """Send a JSON error response shaped like FastAPI's HTTPException responses"""
+    body = json.dumps({'detail': detail}).encode('utf-8')
+    response_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    response_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+@contextmanager
+def upload_buffer(upload: UploadFile) -> Iterator[Union[bytes, mmap.mmap]]:
+    """
+    The contents of an uploaded file, without copying large uploads
+
+    Args:
+        upload: Parsed multipart file
+
+    Yields:
+        bytes for small uploads, or a read-only memory map of the spool file
+        (bytes-like, so it hashes, base64-encodes and opens like bytes)
+    """
+    file = upload.file
+    size = upload.size
+    if size is None:
+        size = file.seek(0, io.SEEK_END)
+    file.seek(0)
+    if size < MMAP_MIN_BYTES:
+        yield file.read()
+        return
+
+    view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        view.close()
+
+
+def open_upload(data: Union[bytes, mmap.mmap]) -> BinaryIO:
+    """Seekable file over upload contents; memory maps are read in place rather than copied"""
+    if isinstance(data, mmap.mmap):
+        data.seek(0)
+        return data
+    return io.BytesIO(data)
@@ -121,7 +121,8 @@ def train_yolo(
     
     # Export model
     print(f"\n📤 Exporting model...")
-    export_path = model.export(format='onnx')
+    # Dynamic axes let the YOLO service batch concurrent requests (BATCH_MAX_SIZE)
+    export_path = model.export(format='onnx', dynamic=True)
     print(f"  - ONNX model: {export_path}")
     
     # Save path